@@ -2,8 +2,27 @@
 """
 Demo script để test API endpoints với JWT authentication
 Chạy script này để test các API endpoints sau khi setup xong
+
+    python api_demo.py                       # demo tuần tự như trước
+    python api_demo.py load --users 50 --duration 30 --json run.json
+    python api_demo.py load --compare run_cu.json --json run_moi.json
+
+Chế độ ``load`` chạy N user ảo đồng thời (mỗi user một thread và một
+``requests.Session``), mỗi user đăng ký/đăng nhập rồi gọi ngẫu nhiên các thao
+tác list, search, create, toggle, stats, refresh theo tỉ lệ ``--mix``. Kết quả
+là throughput và p50/p95/p99 cùng histogram độ trễ theo từng endpoint; ghi
+thêm file JSON (kèm commit git) để so sánh giữa các lần chạy.
 """
 
+import argparse
+import random
+import subprocess
+import sys
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 import json
 from datetime import datetime
@@ -222,5 +241,292 @@ def main():
     
     print("\n🎉 Demo hoàn thành!")
 
+# Tỉ lệ mặc định của các thao tác trong chế độ load
+DEFAULT_MIX = {
+    'list': 40,
+    'search': 15,
+    'create': 15,
+    'toggle': 15,
+    'stats': 10,
+    'refresh': 5,
+}
+
+# Cận trên (ms) của các bucket histogram độ trễ
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+SEARCH_TERMS = ["Django", "Python", "API", "bài tập", "sách"]
+
+# Thời gian tối đa (giây) chờ mọi user ảo đăng ký/đăng nhập xong (tối đa hai
+# request, mỗi request timeout 30s) trước khi bắt đầu đo
+READY_TIMEOUT = 90
+
+
+def percentile(sorted_values, p):
+    """Percentile (nearest-rank) của danh sách đã sắp xếp"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(sorted_values) + 0.4999)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LatencyRecorder:
+    """Gom độ trễ và mã trạng thái theo endpoint, dùng chung cho mọi thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.statuses = {}
+
+    def record(self, endpoint, seconds, status):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds * 1000)
+            counts = self.statuses.setdefault(endpoint, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def summary(self, elapsed):
+        result = {}
+        with self._lock:
+            for endpoint, values in sorted(self.latencies.items()):
+                values = sorted(values)
+                statuses = self.statuses[endpoint]
+                errors = sum(count for status, count in statuses.items() if not 200 <= int(status) < 400)
+                histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+                for value in values:
+                    histogram[bisect_left(LATENCY_BUCKETS_MS, value)] += 1
+                result[endpoint] = {
+                    'requests': len(values),
+                    'errors': errors,
+                    'throughput': round(len(values) / elapsed, 2),
+                    'mean_ms': round(sum(values) / len(values), 2),
+                    'p50_ms': round(percentile(values, 50), 2),
+                    'p95_ms': round(percentile(values, 95), 2),
+                    'p99_ms': round(percentile(values, 99), 2),
+                    'max_ms': round(values[-1], 2),
+                    'statuses': {str(status): count for status, count in sorted(statuses.items())},
+                    'histogram_ms': {
+                        **{f'le_{bound}': count for bound, count in zip(LATENCY_BUCKETS_MS, histogram)},
+                        'le_inf': histogram[-1],
+                    },
+                }
+        return result
+
+
+class VirtualUser:
+    """Một user ảo: một Session, một cặp token và danh sách task của riêng mình"""
+
+    def __init__(self, base_url, username, password, recorder):
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+        self.recorder = recorder
+        self.session = requests.Session()
+        self.refresh_token = None
+        self.task_ids = []
+
+    def request(self, endpoint, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=30, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            response, status = None, 0
+        self.recorder.record(endpoint, time.perf_counter() - start, status)
+        return response
+
+    def _use_tokens(self, result):
+        self.refresh_token = result.get('refresh', self.refresh_token)
+        self.session.headers['Authorization'] = f"Bearer {result['access']}"
+
+    def login(self):
+        """Đăng ký user; nếu đã tồn tại (chạy lại với cùng --prefix) thì đăng nhập"""
+        response = self.request('register', 'POST', '/auth/register/', json={
+            "username": self.username,
+            "email": f"{self.username}@example.com",
+            "password": self.password,
+            "password_confirm": self.password,
+        })
+        if response is None or response.status_code != 201:
+            response = self.request('login', 'POST', '/auth/login/', json={
+                "username": self.username,
+                "password": self.password,
+            })
+        if response is None or response.status_code not in (200, 201):
+            return False
+        self._use_tokens(response.json())
+        return True
+
+    def list(self):
+        self.request('list', 'GET', '/tasks/')
+
+    def search(self):
+        self.request('search', 'GET', '/tasks/', params={'search': random.choice(SEARCH_TERMS)})
+
+    def create(self):
+        response = self.request('create', 'POST', '/tasks/', json={
+            "title": f"{random.choice(SEARCH_TERMS)} {random.randint(1, 10 ** 6)}",
+            "note": "Tạo bởi api_demo.py load",
+            "is_done": False,
+        })
+        if response is not None and response.status_code == 201:
+            self.task_ids.append(response.json()['id'])
+
+    def toggle(self):
+        if not self.task_ids:
+            return self.create()
+        self.request('toggle', 'PATCH', f'/tasks/{random.choice(self.task_ids)}/toggle/')
+
+    def stats(self):
+        self.request('stats', 'GET', '/tasks/stats/')
+
+    def refresh(self):
+        response = self.request('refresh', 'POST', '/auth/refresh/', json={"refresh": self.refresh_token})
+        if response is not None and response.status_code == 200:
+            self._use_tokens(response.json())
+
+
+def parse_mix(text):
+    """"list=40,create=10" -> {'list': 40, 'create': 10}"""
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Thao tác không hợp lệ: {name} (chọn trong {', '.join(DEFAULT_MIX)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"Phải là số nguyên >= 1: {text}")
+    return value
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_load(args):
+    recorder = LatencyRecorder()
+    operations = list(args.mix)
+    weights = [args.mix[name] for name in operations]
+    prefix = args.prefix or f"load_{datetime.now().strftime('%H%M%S')}"
+    clock = {}
+
+    def start_clock():
+        clock['start'] = time.monotonic()
+        clock['deadline'] = clock['start'] + args.duration
+
+    # Mọi user đăng ký/đăng nhập xong rồi mới bắt đầu đo
+    ready = threading.Barrier(args.users, action=start_clock)
+
+    def virtual_user(index):
+        user = VirtualUser(args.base_url, f"{prefix}_{index}", args.password, recorder)
+        try:
+            ok = user.login()
+        except BaseException:
+            # Không để các user khác chờ mãi ở barrier
+            ready.abort()
+            raise
+        try:
+            ready.wait(timeout=READY_TIMEOUT)
+        except threading.BrokenBarrierError:
+            return 0
+        if not ok:
+            return 0
+        # Giãn thời điểm bắt đầu trong --ramp-up giây
+        time.sleep(args.ramp_up * index / args.users)
+        done = 0
+        while time.monotonic() < clock['deadline'] and (args.requests is None or done < args.requests):
+            getattr(user, random.choices(operations, weights)[0])()
+            done += 1
+            if args.think:
+                time.sleep(random.uniform(0, 2 * args.think))
+        return done
+
+    print(f"🚀 {args.users} user ảo, {args.duration}s, mix: {args.mix} -> {args.base_url}")
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        done = sum(pool.map(virtual_user, range(args.users)))
+    if 'start' not in clock:
+        raise SystemExit(f"❌ Các user ảo không đăng nhập xong trong {READY_TIMEOUT}s, không đo được")
+    elapsed = time.monotonic() - clock['start']
+
+    endpoints = recorder.summary(elapsed)
+    logins = sum(endpoints.pop(name, {}).get('requests', 0) for name in ('register', 'login'))
+    return {
+        'commit': git_commit(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'config': {
+            'base_url': args.base_url,
+            'users': args.users,
+            'duration': args.duration,
+            'requests_per_user': args.requests,
+            'think': args.think,
+            'ramp_up': args.ramp_up,
+            'mix': args.mix,
+        },
+        'logins': logins,
+        'elapsed': round(elapsed, 3),
+        'total_requests': done,
+        'throughput': round(done / elapsed, 2) if elapsed else 0,
+        'endpoints': endpoints,
+    }
+
+
+def print_report(report, baseline=None):
+    print(f"\n📊 {report['total_requests']} request trong {report['elapsed']}s "
+          f"= {report['throughput']} req/s (commit {report['commit'] or '?'})")
+    header = f"{'endpoint':<10}{'req':>7}{'lỗi':>6}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    if baseline:
+        header += f"{'Δp95':>10}"
+    print(header)
+    for endpoint, stats in report['endpoints'].items():
+        line = (f"{endpoint:<10}{stats['requests']:>7}{stats['errors']:>6}{stats['throughput']:>9}"
+                f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}{stats['max_ms']:>9}")
+        old = (baseline or {}).get('endpoints', {}).get(endpoint)
+        if old and old['p95_ms']:
+            line += f"{(stats['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100:>+9.1f}%"
+        print(line)
+    print("(độ trễ tính bằng ms; histogram đầy đủ trong file JSON)")
+
+
+def main_load(argv):
+    parser = argparse.ArgumentParser(prog='api_demo.py load', description='Chạy tải đồng thời vào API')
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--users', type=positive_int, default=20, help='Số user ảo chạy đồng thời')
+    parser.add_argument('--duration', type=float, default=30, help='Thời gian đo (giây)')
+    parser.add_argument('--requests', type=positive_int, help='Giới hạn số request mỗi user (mặc định không giới hạn)')
+    parser.add_argument('--think', type=float, default=0, help='Thời gian nghỉ trung bình giữa hai request (giây)')
+    parser.add_argument('--ramp-up', type=float, default=0, help='Giãn thời điểm bắt đầu của các user (giây)')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='Tỉ lệ thao tác, ví dụ "list=40,search=15,create=15,toggle=15,stats=10,refresh=5"')
+    parser.add_argument('--prefix', help='Tiền tố username (dùng lại để đăng nhập thay vì đăng ký mới)')
+    parser.add_argument('--password', default='testpassword123')
+    parser.add_argument('--json', help='Ghi kết quả ra file JSON')
+    parser.add_argument('--compare', help='File JSON của lần chạy trước để so sánh p95')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    report = run_load(args)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 Đã ghi {args.json}")
+
+
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:2] == ['load']:
+        main_load(sys.argv[2:])
+    else:
+        main()
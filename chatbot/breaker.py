@@ -0,0 +1,96 @@
+"""
+Circuit breaker cho upstream Gemini (trong process).
+
+- closed: gọi bình thường; ``GEMINI_BREAKER_FAILURES`` lỗi tạm thời liên tiếp
+  (timeout, lỗi kết nối, HTTP 429/5xx) thì chuyển sang open.
+- open: từ chối ngay, không gọi upstream, trong ``GEMINI_BREAKER_RESET_TIMEOUT``
+  giây.
+- half_open: hết thời gian đó thì cho tối đa ``GEMINI_BREAKER_HALF_OPEN_PROBES``
+  lời gọi thử; thành công thì về closed, lỗi thì open lại.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probes = 0
+
+    @property
+    def failure_threshold(self):
+        return getattr(settings, 'GEMINI_BREAKER_FAILURES', 5)
+
+    @property
+    def reset_timeout(self):
+        return getattr(settings, 'GEMINI_BREAKER_RESET_TIMEOUT', 30)
+
+    @property
+    def half_open_probes(self):
+        return getattr(settings, 'GEMINI_BREAKER_HALF_OPEN_PROBES', 1)
+
+    def allow(self):
+        """True nếu được gọi upstream; mỗi lần True phải kết thúc bằng record_success/record_failure/abandon."""
+        with self._lock:
+            if self.state == OPEN:
+                if self._clock() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    return False
+                self._probes += 1
+            return True
+
+    def retry_after(self):
+        """Số giây (làm tròn lên) tới khi breaker cho gọi thử lại."""
+        with self._lock:
+            if self.state != OPEN:
+                return 1
+            return max(1, int(self.reset_timeout - (self._clock() - self.opened_at)) + 1)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self._probes = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = self._clock()
+                self._probes = 0
+
+    def abandon(self):
+        """Lời gọi được ``allow`` bị huỷ trước khi có kết quả: trả lại lượt probe."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._probes = 0
+
+    def snapshot(self):
+        with self._lock:
+            return {'state': self.state, 'failures': self.failures}
+
+
+breaker = CircuitBreaker()
@@ -0,0 +1,99 @@
+"""
+Cache câu trả lời của Gemini (Django cache framework, alias ``chatbot``).
+
+Key gồm câu hỏi đã chuẩn hoá (chữ thường, gộp khoảng trắng) và hash của ngữ
+cảnh dựng từ lịch sử chat, nên cùng câu hỏi trong cùng ngữ cảnh không gọi lại
+upstream. Chỉ câu trả lời thành công được cache (lỗi là ``GeminiError``, không
+đi qua đây). TTL là ``CHATBOT_CACHE_TIMEOUT`` giây (0 = tắt); giới hạn số
+entry và evict LRU do backend đảm nhận (``MAX_ENTRIES`` với LocMemCache,
+``maxmemory-policy allkeys-lru`` với Redis).
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class ChatCacheStats:
+    """Bộ đếm hit/miss và thời gian upstream tiết kiệm được, trong process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def record_hit(self, saved_seconds):
+        with self._lock:
+            self.hits += 1
+            self.saved_seconds += saved_seconds
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'saved_seconds': self.saved_seconds,
+                'saved_seconds_per_hit': self.saved_seconds / self.hits if self.hits else 0.0,
+            }
+
+
+stats = ChatCacheStats()
+
+
+def _timeout():
+    return getattr(settings, 'CHATBOT_CACHE_TIMEOUT', 3600)
+
+
+def _cache():
+    return caches[getattr(settings, 'CHATBOT_CACHE_ALIAS', 'chatbot')]
+
+
+def normalize(message):
+    return ' '.join(message.lower().split())
+
+
+def cache_key(message, context):
+    question = hashlib.sha256(normalize(message).encode()).hexdigest()
+    context = hashlib.sha256(context.encode()).hexdigest()
+    return f'chatbot:reply:{question}:{context}'
+
+
+def _unpack(value):
+    if value is None:
+        stats.record_miss()
+        return None
+    reply, latency = value
+    stats.record_hit(latency)
+    return reply
+
+
+def get_reply(key):
+    """Câu trả lời đã cache hoặc None."""
+    if not _timeout():
+        return None
+    return _unpack(_cache().get(key))
+
+
+def set_reply(key, reply, latency):
+    """Lưu câu trả lời kèm thời gian upstream (giây) đã mất để tạo ra nó."""
+    if _timeout():
+        _cache().set(key, (reply, latency), timeout=_timeout())
+
+
+async def aget_reply(key):
+    if not _timeout():
+        return None
+    return _unpack(await _cache().aget(key))
+
+
+async def aset_reply(key, reply, latency):
+    if _timeout():
+        await _cache().aset(key, (reply, latency), timeout=_timeout())
@@ -0,0 +1,118 @@
+"""
+Dựng ngữ cảnh hội thoại cho prompt trong giới hạn token.
+
+- Các lượt gần nhất được đưa nguyên văn (mới nhất trước) cho tới khi hết
+  ``CHATBOT_CONTEXT_TOKEN_BUDGET`` token, tối đa ``CHATBOT_CONTEXT_MAX_MESSAGES``
+  lượt, lấy bằng một truy vấn ``.values()``.
+- Các lượt đã rơi khỏi cửa sổ đó được gộp dần vào ``ChatSummary`` của user
+  (mỗi lượt một dòng rút gọn) sau mỗi tin nhắn mới; bản tóm tắt giữ trong
+  ``CHATBOT_SUMMARY_TOKEN_BUDGET`` token, dòng cũ nhất bị bỏ trước.
+
+Số token được ước lượng theo số ký tự (khoảng 4 ký tự một token).
+"""
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .models import ChatMessage, ChatSummary
+
+CHARS_PER_TOKEN = 4
+# Số lượt tối đa được gộp vào bản tóm tắt mỗi lần
+FOLD_BATCH = 20
+
+
+class History(NamedTuple):
+    summary: str
+    messages: list  # dict {'id', 'message', 'response'}, mới nhất trước
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _truncate(text, tokens):
+    limit = max(tokens, 1) * CHARS_PER_TOKEN
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+
+def _budget():
+    return getattr(settings, 'CHATBOT_CONTEXT_TOKEN_BUDGET', 1500)
+
+
+def _max_messages():
+    return getattr(settings, 'CHATBOT_CONTEXT_MAX_MESSAGES', 10)
+
+
+def _fit(rows):
+    """Các lượt mới nhất vừa budget; lượt mới nhất luôn được giữ (cắt bớt nếu quá dài)."""
+    budget = _budget()
+    kept = []
+    used = 0
+    for row in rows[:_max_messages()]:
+        cost = estimate_tokens(row['message']) + estimate_tokens(row['response'])
+        if used + cost > budget:
+            if not kept:
+                kept.append({
+                    **row,
+                    'message': _truncate(row['message'], budget // 4),
+                    'response': _truncate(row['response'], budget - budget // 4),
+                })
+            break
+        kept.append(row)
+        used += cost
+    return kept
+
+
+def _recent_rows(user_id, after_id, limit):
+    # Sắp theo id như mốc ``last_message_id``: "mới nhất" ở đây và phần được
+    # gộp vào tóm tắt luôn khớp nhau, kể cả khi created_at trùng hoặc lệch thứ tự.
+    # Sau mốc chỉ còn các lượt chưa gộp nên tập cần sắp luôn nhỏ.
+    return list(
+        ChatMessage.objects.filter(user_id=user_id, id__gt=after_id)
+        .order_by('-id')
+        .values('id', 'message', 'response')[:limit]
+    )
+
+
+def load_history(user):
+    """Bản tóm tắt và các lượt nguyên văn dùng cho prompt của ``user``."""
+    summary, last_message_id = (
+        ChatSummary.objects.filter(user_id=user.pk).values_list('text', 'last_message_id').first() or ('', 0)
+    )
+    return History(summary, _fit(_recent_rows(user.pk, last_message_id, _max_messages())))
+
+
+def _summary_line(row):
+    return f"- Người dùng: {_truncate(row['message'], 30)} / Trợ lý: {_truncate(row['response'], 60)}"
+
+
+def _trim(lines):
+    budget = getattr(settings, 'CHATBOT_SUMMARY_TOKEN_BUDGET', 400)
+    kept = []
+    used = 0
+    for line in reversed(lines):
+        used += estimate_tokens(line)
+        if used > budget:
+            break
+        kept.append(line)
+    return '\n'.join(reversed(kept))
+
+
+def update_summary(user_id):
+    """Gộp các lượt đã rơi khỏi cửa sổ nguyên văn vào ChatSummary (gọi sau khi lưu tin nhắn mới)."""
+    with transaction.atomic():
+        summary, _ = ChatSummary.objects.select_for_update().get_or_create(user_id=user_id)
+        rows = _recent_rows(user_id, summary.last_message_id, _max_messages() + FOLD_BATCH)
+        older = rows[len(_fit(rows)):]
+        if not older:
+            return
+        lines = summary.text.splitlines() + [_summary_line(row) for row in reversed(older)]
+        summary.text = _trim(lines)
+        summary.last_message_id = older[0]['id']
+        summary.save(update_fields=['text', 'last_message_id', 'updated_at'])
+
+
+aload_history = sync_to_async(load_history)
+aupdate_summary = sync_to_async(update_summary)
@@ -0,0 +1,513 @@
+"""
+Client gọi Gemini API.
+
+- Bản sync (``generate``) dùng lại một ``requests.Session`` cho mỗi thread:
+  kết nối HTTP được giữ lại (keep-alive) giữa các lần gọi.
+- Bản async (``agenerate``) dùng một ``httpx.AsyncClient`` chung cho mỗi event
+  loop (connection pool giới hạn bởi ``GEMINI_MAX_CONNECTIONS``, đóng khi loop
+  tắt) và có deadline tổng ``GEMINI_TIMEOUT`` giây cho mỗi lần gọi. Không có
+  httpx thì chạy bản sync trong thread.
+- ``stream_generate`` / ``astream_generate`` gọi streamGenerateContent (SSE) và
+  trả về từng đoạn text ngay khi upstream gửi tới.
+- Mọi lời gọi đi qua circuit breaker (chatbot/breaker.py); lỗi tạm thời được
+  thử lại tối đa ``GEMINI_RETRIES`` lần với backoff có jitter, trong deadline
+  tổng ``GEMINI_TIMEOUT``. Bản async có thể hedge (``GEMINI_HEDGE_DELAY``).
+
+Lỗi được báo bằng ``GeminiError`` (message hiển thị được cho người dùng);
+``GeminiUnavailable`` là lỗi tạm thời, ``CircuitOpen`` là breaker đang mở.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+import weakref
+
+import requests
+import urllib3
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from todo_project.metrics import timed
+
+from . import cache as reply_cache
+from .breaker import breaker
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+NO_REPLY = "Xin lỗi, tôi không thể tạo phản hồi cho câu hỏi này."
+TIMEOUT_REPLY = "Xin lỗi, yêu cầu đã hết thời gian chờ. Vui lòng thử lại."
+CIRCUIT_OPEN_REPLY = "Xin lỗi, trợ lý AI đang tạm thời gián đoạn. Vui lòng thử lại sau ít phút."
+SYSTEM_PROMPT = "Bạn là một trợ lý AI thông minh và hữu ích. Hãy trả lời bằng tiếng Việt một cách ngắn gọn và dễ hiểu."
+DEFAULT_API_URL = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash'
+
+
+class GeminiError(Exception):
+    """Lỗi khi gọi Gemini; ``str(error)`` là câu trả lời hiển thị cho người dùng."""
+
+
+class GeminiUnavailable(GeminiError):
+    """Lỗi tạm thời (timeout, lỗi kết nối, HTTP 429/5xx): được thử lại và tính vào circuit breaker."""
+
+
+class CircuitOpen(GeminiUnavailable):
+    """Circuit breaker đang mở: từ chối ngay, không gọi upstream."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def build_context(history=None):
+    """System prompt, bản tóm tắt và các lượt gần đây (``History`` từ chatbot/context.py)."""
+    context = SYSTEM_PROMPT
+
+    if history and history.summary:
+        context += "\n\nTóm tắt các trao đổi trước đó (từ cũ đến mới):\n" + history.summary
+
+    if history and history.messages:
+        context += "\n\nLịch sử cuộc trò chuyện gần đây (từ mới nhất đến cũ nhất):"
+        for msg in history.messages:
+            context += f"\nNguời dùng: {msg['message']}"
+            context += f"\nTrợ lý: {msg['response']}"
+    return context
+
+
+def build_prompt(message, history=None, context=None):
+    """Prompt gồm ngữ cảnh (``build_context``) và câu hỏi hiện tại."""
+    if context is None:
+        context = build_context(history)
+    return context + f"\n\nCâu hỏi hiện tại: {message}"
+
+
+def _api_url(method):
+    base = getattr(settings, 'GEMINI_API_URL', DEFAULT_API_URL).rstrip('/')
+    return f"{base}:{method}"
+
+
+def _timeout():
+    return getattr(settings, 'GEMINI_TIMEOUT', 30)
+
+
+def _request_kwargs(prompt):
+    api_key = settings.GEMINI_API_KEY
+    if not api_key:
+        raise GeminiError("Xin lỗi, API key chưa được cấu hình.")
+    return {
+        'params': {'key': api_key},
+        'headers': {'Content-Type': 'application/json'},
+        'json': {"contents": [{"parts": [{"text": prompt}]}]},
+    }
+
+
+def _status_error(status_code, text):
+    message = f"Lỗi API: {status_code} - {text}"
+    if status_code == 429 or status_code >= 500:
+        return GeminiUnavailable(message)
+    return GeminiError(message)
+
+
+def _parse_response(status_code, text, json_loader):
+    if status_code != 200:
+        raise _status_error(status_code, text)
+    result = json_loader()
+    if 'candidates' in result and len(result['candidates']) > 0:
+        return result['candidates'][0]['content']['parts'][0]['text']
+    raise GeminiError(NO_REPLY)
+
+
+def _chunk_text(line):
+    """Text trong một dòng SSE ``data: {...}`` của streamGenerateContent ('' nếu không có)."""
+    if not line or not line.startswith('data:'):
+        return ''
+    result = json.loads(line[5:])
+    try:
+        return ''.join(part.get('text', '') for part in result['candidates'][0]['content']['parts'])
+    except (KeyError, IndexError):
+        return ''
+
+
+def _backoff(attempt):
+    # Exponential backoff với full jitter
+    base = getattr(settings, 'GEMINI_RETRY_BACKOFF', 0.3)
+    return random.uniform(0, base * 2 ** attempt)
+
+
+def _admit():
+    if not breaker.allow():
+        raise CircuitOpen(CIRCUIT_OPEN_REPLY, retry_after=breaker.retry_after())
+
+
+def _record(error=None):
+    # Upstream đã trả lời (kể cả lỗi 4xx) là còn sống; chỉ lỗi tạm thời mới tính là hỏng
+    if isinstance(error, GeminiUnavailable):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def _retrying(attempt_fn):
+    """
+    Gọi ``attempt_fn(remaining_seconds)`` qua circuit breaker, thử lại tối đa
+    ``GEMINI_RETRIES`` lần khi lỗi tạm thời, trong deadline tổng ``GEMINI_TIMEOUT``.
+    """
+    deadline = time.monotonic() + _timeout()
+    retries = getattr(settings, 'GEMINI_RETRIES', 2)
+    for attempt in range(retries + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise GeminiUnavailable(TIMEOUT_REPLY)
+        _admit()
+        try:
+            result = attempt_fn(remaining)
+        except GeminiError as e:
+            _record(e)
+            if not isinstance(e, GeminiUnavailable) or attempt == retries:
+                raise
+        except BaseException:
+            # Bị ngắt giữa chừng (KeyboardInterrupt, SystemExit, ...): không kết luận gì về upstream
+            breaker.abandon()
+            raise
+        else:
+            _record()
+            return result
+        time.sleep(min(_backoff(attempt), max(deadline - time.monotonic(), 0)))
+
+
+async def _aretrying(attempt_fn):
+    """Bản async của ``_retrying``: ``attempt_fn`` trả về coroutine."""
+    deadline = time.monotonic() + _timeout()
+    retries = getattr(settings, 'GEMINI_RETRIES', 2)
+    for attempt in range(retries + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise GeminiUnavailable(TIMEOUT_REPLY)
+        _admit()
+        try:
+            result = await attempt_fn(remaining)
+        except GeminiError as e:
+            _record(e)
+            if not isinstance(e, GeminiUnavailable) or attempt == retries:
+                raise
+        except BaseException:
+            # Bị huỷ giữa chừng: không kết luận gì về upstream
+            breaker.abandon()
+            raise
+        else:
+            _record()
+            return result
+        await asyncio.sleep(min(_backoff(attempt), max(deadline - time.monotonic(), 0)))
+
+
+_local = threading.local()
+
+
+def _session():
+    # requests.Session không đảm bảo thread-safe: mỗi thread một session
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def _post_once(prompt, timeout):
+    kwargs = _request_kwargs(prompt)
+    try:
+        response = _session().post(_api_url('generateContent'), timeout=timeout, **kwargs)
+        return _parse_response(response.status_code, response.text, response.json)
+    except GeminiError:
+        raise
+    except requests.exceptions.Timeout as e:
+        raise GeminiUnavailable(TIMEOUT_REPLY) from e
+    except requests.exceptions.RequestException as e:
+        raise GeminiUnavailable(f"Lỗi kết nối: {str(e)}") from e
+    except Exception as e:
+        raise GeminiError(f"Lỗi không xác định: {str(e)}") from e
+
+
+def generate(prompt):
+    """Gọi generateContent (blocking), trả về text hoặc raise ``GeminiError``."""
+    with timed('gemini'):
+        return _retrying(lambda remaining: _post_once(prompt, remaining))
+
+
+def _open_stream(prompt, timeout):
+    kwargs = _request_kwargs(prompt)
+    kwargs['params']['alt'] = 'sse'
+    try:
+        response = _session().post(_api_url('streamGenerateContent'), timeout=timeout, stream=True, **kwargs)
+    except requests.exceptions.Timeout as e:
+        raise GeminiUnavailable(TIMEOUT_REPLY) from e
+    except requests.exceptions.RequestException as e:
+        raise GeminiUnavailable(f"Lỗi kết nối: {str(e)}") from e
+    if response.status_code != 200:
+        with response:
+            raise _status_error(response.status_code, response.text)
+    return response
+
+
+def _set_read_timeout(response, seconds):
+    # timeout của requests tính cho từng lần đọc socket, không phải cả stream:
+    # trước mỗi lần đọc thu lại còn đúng phần deadline còn lại. Khi upstream gửi
+    # "Connection: close", http.client bỏ ``connection.sock`` nhưng vẫn đọc qua
+    # file của socket (``fp.raw._sock``).
+    sock = getattr(response.raw.connection, 'sock', None)
+    if sock is None:
+        fp = getattr(getattr(response.raw, '_fp', None), 'fp', None)
+        sock = getattr(getattr(fp, 'raw', None), '_sock', None)
+    if sock is not None:
+        sock.settimeout(seconds)
+
+
+def _iter_lines(response, deadline):
+    """
+    Từng dòng SSE ngay khi upstream gửi tới (``iter_lines`` của requests chờ đầy
+    buffer 512 byte), mỗi lần đọc không quá ``deadline``.
+    """
+    buffer = b''
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.exceptions.Timeout()
+        _set_read_timeout(response, remaining)
+        data = response.raw.read1(8192)
+        if not data:
+            if buffer:
+                yield buffer.decode()
+            return
+        *lines, buffer = (buffer + data).split(b'\n')
+        for line in lines:
+            yield line.rstrip(b'\r').decode()
+
+
+def stream_generate(prompt):
+    """
+    Gọi streamGenerateContent (SSE), trả về từng đoạn text khi upstream gửi tới.
+    Chỉ thử lại khi chưa nhận được đoạn nào; deadline ``GEMINI_TIMEOUT`` tính
+    cho cả stream.
+    """
+    deadline = time.monotonic() + _timeout()
+    with timed('gemini'):
+        response = _retrying(lambda remaining: _open_stream(prompt, remaining))
+    with response:
+        empty = True
+        try:
+            for line in _iter_lines(response, deadline):
+                text = _chunk_text(line)
+                if text:
+                    empty = False
+                    yield text
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+            breaker.record_failure()
+            timed_out = isinstance(e, (requests.exceptions.Timeout, urllib3.exceptions.TimeoutError))
+            raise GeminiUnavailable(TIMEOUT_REPLY if timed_out else f"Lỗi kết nối: {str(e)}") from e
+        except ValueError as e:
+            raise GeminiError(f"Lỗi không xác định: {str(e)}") from e
+        if empty:
+            raise GeminiError(NO_REPLY)
+
+
+_async_clients = weakref.WeakKeyDictionary()  # loop -> (client, guard)
+
+
+async def _close_with_loop(client):
+    # Async generator dừng ở ``yield`` tới khi loop tắt: asyncio.run (cũng là
+    # cách async_to_sync chạy mỗi lần gọi dưới WSGI) gọi loop.shutdown_asyncgens()
+    # trước khi đóng loop, khi đó khối finally đóng connection pool của client
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+def _async_client():
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        max_connections = getattr(settings, 'GEMINI_MAX_CONNECTIONS', 100)
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(_timeout(), connect=min(_timeout(), 5)),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        guard = _close_with_loop(client)
+        # Lần gọi __anext__ đầu tiên đăng ký generator với loop đang chạy; generator
+        # yield ngay nên chạy tới yield được mà không cần await
+        try:
+            guard.__anext__().send(None)
+        except StopIteration:
+            pass
+        entry = _async_clients[loop] = (client, guard)
+    return entry[0]
+
+
+async def _apost_once(prompt, timeout):
+    kwargs = _request_kwargs(prompt)
+    try:
+        response = await asyncio.wait_for(_async_client().post(_api_url('generateContent'), **kwargs), timeout)
+        return _parse_response(response.status_code, response.text, response.json)
+    except GeminiError:
+        raise
+    except (asyncio.TimeoutError, httpx.TimeoutException) as e:
+        raise GeminiUnavailable(TIMEOUT_REPLY) from e
+    except httpx.HTTPError as e:
+        raise GeminiUnavailable(f"Lỗi kết nối: {str(e)}") from e
+    except Exception as e:
+        raise GeminiError(f"Lỗi không xác định: {str(e)}") from e
+
+
+async def _apost_hedged(prompt, timeout):
+    """
+    Nếu request chưa xong sau ``GEMINI_HEDGE_DELAY`` giây thì gửi thêm một
+    request nữa và lấy kết quả thành công đến trước (0 = tắt).
+    """
+    hedge_delay = getattr(settings, 'GEMINI_HEDGE_DELAY', 0)
+    if not hedge_delay or hedge_delay >= timeout:
+        return await _apost_once(prompt, timeout)
+
+    first = asyncio.ensure_future(_apost_once(prompt, timeout))
+    pending = {first}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+        if not done:
+            pending.add(asyncio.ensure_future(_apost_once(prompt, timeout - hedge_delay)))
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def agenerate(prompt):
+    """Bản async của ``generate``, có thể hedge (``GEMINI_HEDGE_DELAY``)."""
+    if httpx is None:
+        return await sync_to_async(generate, thread_sensitive=False)(prompt)
+    with timed('gemini'):
+        return await _aretrying(lambda remaining: _apost_hedged(prompt, remaining))
+
+
+async def _aopen_stream(prompt, timeout):
+    kwargs = _request_kwargs(prompt)
+    kwargs['params']['alt'] = 'sse'
+    client = _async_client()
+    request = client.build_request('POST', _api_url('streamGenerateContent'), **kwargs)
+    try:
+        response = await asyncio.wait_for(client.send(request, stream=True), timeout)
+    except (asyncio.TimeoutError, httpx.TimeoutException) as e:
+        raise GeminiUnavailable(TIMEOUT_REPLY) from e
+    except httpx.HTTPError as e:
+        raise GeminiUnavailable(f"Lỗi kết nối: {str(e)}") from e
+    if response.status_code != 200:
+        body = await response.aread()
+        await response.aclose()
+        raise _status_error(response.status_code, body.decode(errors='replace'))
+    return response
+
+
+async def astream_generate(prompt):
+    """Bản async của ``stream_generate``; deadline ``GEMINI_TIMEOUT`` tính cho cả stream."""
+    if httpx is None:
+        yield await agenerate(prompt)
+        return
+
+    deadline = time.monotonic() + _timeout()
+    with timed('gemini'):
+        response = await _aretrying(lambda remaining: _aopen_stream(prompt, remaining))
+    try:
+        empty = True
+        lines = response.aiter_lines()
+        while True:
+            try:
+                line = await asyncio.wait_for(lines.__anext__(), deadline - time.monotonic())
+            except StopAsyncIteration:
+                break
+            except (asyncio.TimeoutError, httpx.HTTPError) as e:
+                breaker.record_failure()
+                raise GeminiUnavailable(TIMEOUT_REPLY if isinstance(e, asyncio.TimeoutError) else f"Lỗi kết nối: {str(e)}") from e
+            try:
+                text = _chunk_text(line)
+            except ValueError as e:
+                raise GeminiError(f"Lỗi không xác định: {str(e)}") from e
+            if text:
+                empty = False
+                yield text
+        if empty:
+            raise GeminiError(NO_REPLY)
+    finally:
+        await response.aclose()
+
+
+def call_gemini_api(message, history=None):
+    """
+    Gọi Gemini API để lấy phản hồi với ngữ cảnh; lỗi raise ``GeminiError``.
+    Câu trả lời thành công được cache, xem chatbot/cache.py.
+    """
+    context = build_context(history)
+    key = reply_cache.cache_key(message, context)
+    reply = reply_cache.get_reply(key)
+    if reply is not None:
+        return reply
+
+    start = time.perf_counter()
+    reply = generate(build_prompt(message, context=context))
+    reply_cache.set_reply(key, reply, time.perf_counter() - start)
+    return reply
+
+
+async def acall_gemini_api(message, history=None):
+    """Bản async của ``call_gemini_api``"""
+    context = build_context(history)
+    key = reply_cache.cache_key(message, context)
+    reply = await reply_cache.aget_reply(key)
+    if reply is not None:
+        return reply
+
+    start = time.perf_counter()
+    reply = await agenerate(build_prompt(message, context=context))
+    await reply_cache.aset_reply(key, reply, time.perf_counter() - start)
+    return reply
+
+
+def stream_gemini_api(message, history=None):
+    """
+    Như ``call_gemini_api`` nhưng trả về từng đoạn câu trả lời; lỗi raise
+    ``GeminiError``. Câu trả lời chỉ được cache khi stream chạy hết.
+    """
+    context = build_context(history)
+    key = reply_cache.cache_key(message, context)
+    reply = reply_cache.get_reply(key)
+    if reply is not None:
+        yield reply
+        return
+
+    start = time.perf_counter()
+    chunks = []
+    for chunk in stream_generate(build_prompt(message, context=context)):
+        chunks.append(chunk)
+        yield chunk
+    reply_cache.set_reply(key, ''.join(chunks), time.perf_counter() - start)
+
+
+async def astream_gemini_api(message, history=None):
+    """Bản async của ``stream_gemini_api``"""
+    context = build_context(history)
+    key = reply_cache.cache_key(message, context)
+    reply = await reply_cache.aget_reply(key)
+    if reply is not None:
+        yield reply
+        return
+
+    start = time.perf_counter()
+    chunks = []
+    async for chunk in astream_generate(build_prompt(message, context=context)):
+        chunks.append(chunk)
+        yield chunk
+    await reply_cache.aset_reply(key, ''.join(chunks), time.perf_counter() - start)
@@ -0,0 +1,321 @@
+"""
+Bảo vệ upstream (Gemini) và worker khi có nhiều lời gọi chat cùng lúc.
+
+- ``flights``: gộp các request giống hệt nhau đang chạy của cùng một user
+  (bấm gửi hai lần, client retry) thành một lần xử lý; các request đến sau chờ
+  và nhận cùng kết quả.
+- ``chat_limiter``: giới hạn số lời gọi upstream đồng thời của mỗi user
+  (``CHATBOT_MAX_CONCURRENT_PER_USER``) và của cả process
+  (``CHATBOT_MAX_CONCURRENT``). Khi hết chỗ, request chờ trong hàng đợi có giới
+  hạn (``CHATBOT_MAX_QUEUED``, tối đa ``CHATBOT_QUEUE_TIMEOUT`` giây); hàng đợi
+  đầy hoặc chờ quá lâu thì raise ``Overloaded`` để view trả 429 ngay.
+
+Cả hai dùng được từ view sync (thread) lẫn view async (event loop) và có phạm
+vi trong một process.
+"""
+import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+
+
+class Overloaded(Exception):
+    """Hết chỗ chạy và hàng đợi đã đầy (hoặc chờ quá lâu)."""
+
+
+class _Waiter:
+    def __init__(self, loop=None):
+        self.granted = False
+        if loop is None:
+            self.event = threading.Event()
+            self.future = None
+        else:
+            self.loop = loop
+            self.future = loop.create_future()
+
+    def notify(self):
+        if self.future is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Limiter:
+    """Semaphore có hàng đợi giới hạn, dùng chung cho thread và asyncio."""
+
+    def __init__(self, limit, max_waiting):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.holders = 0  # số lời gọi đang dùng limiter này (chạy hoặc chờ), do ChatLimiter quản lý
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def _enter_or_queue(self, waiter):
+        # Gọi khi đang giữ self._lock
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.max_waiting:
+            raise Overloaded
+        self._waiters.append(waiter)
+        return False
+
+    def _give_up(self, waiter):
+        """Waiter hết thời gian chờ: True nếu thực ra vừa được cấp chỗ."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def acquire(self, timeout):
+        waiter = _Waiter()
+        with self._lock:
+            if self._enter_or_queue(waiter):
+                return
+        if not waiter.event.wait(timeout) and not self._give_up(waiter):
+            raise Overloaded
+
+    async def aacquire(self, timeout):
+        waiter = _Waiter(asyncio.get_running_loop())
+        with self._lock:
+            if self._enter_or_queue(waiter):
+                return
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if not self._give_up(waiter):
+                raise Overloaded
+        except BaseException:
+            # Bị huỷ trong lúc chờ: trả lại chỗ nếu đã được cấp
+            if self._give_up(waiter):
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # Chuyển thẳng chỗ cho waiter đầu hàng đợi
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.notify()
+            else:
+                self.active -= 1
+
+
+class ChatLimiter:
+    """Giới hạn toàn process và theo từng user, xem docstring của module."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._global = None
+        self._users = {}
+
+    def _global_limiter(self):
+        with self._lock:
+            if self._global is None:
+                self._global = Limiter(
+                    getattr(settings, 'CHATBOT_MAX_CONCURRENT', 20),
+                    getattr(settings, 'CHATBOT_MAX_QUEUED', 50),
+                )
+            return self._global
+
+    def _user_limiter(self, user_id):
+        with self._lock:
+            limiter = self._users.get(user_id)
+            if limiter is None:
+                per_user = getattr(settings, 'CHATBOT_MAX_CONCURRENT_PER_USER', 2)
+                limiter = self._users[user_id] = Limiter(per_user, per_user)
+            limiter.holders += 1
+            return limiter
+
+    def _forget(self, user_id, limiter):
+        # Bỏ limiter của user khỏi bộ nhớ khi không còn lời gọi nào dùng nó
+        with self._lock:
+            limiter.holders -= 1
+            if not limiter.holders:
+                del self._users[user_id]
+
+    def _timeout(self):
+        return getattr(settings, 'CHATBOT_QUEUE_TIMEOUT', 10)
+
+    def acquire(self, user_id):
+        """Chiếm một chỗ cho ``user_id``; trả về hàm release (gọi nhiều lần vẫn an toàn)."""
+        user_limiter = self._user_limiter(user_id)
+        global_limiter = self._global_limiter()
+        try:
+            user_limiter.acquire(self._timeout())
+        except BaseException:
+            self._forget(user_id, user_limiter)
+            raise
+        try:
+            global_limiter.acquire(self._timeout())
+        except BaseException:
+            user_limiter.release()
+            self._forget(user_id, user_limiter)
+            raise
+        return self._releaser(user_id, user_limiter, global_limiter)
+
+    async def aacquire(self, user_id):
+        user_limiter = self._user_limiter(user_id)
+        global_limiter = self._global_limiter()
+        try:
+            await user_limiter.aacquire(self._timeout())
+        except BaseException:
+            self._forget(user_id, user_limiter)
+            raise
+        try:
+            await global_limiter.aacquire(self._timeout())
+        except BaseException:
+            user_limiter.release()
+            self._forget(user_id, user_limiter)
+            raise
+        return self._releaser(user_id, user_limiter, global_limiter)
+
+    def _releaser(self, user_id, user_limiter, global_limiter):
+        released = threading.Event()
+
+        def release():
+            if released.is_set():
+                return
+            released.set()
+            global_limiter.release()
+            user_limiter.release()
+            self._forget(user_id, user_limiter)
+        return release
+
+    def snapshot(self):
+        """Số lời gọi đang chạy và đang chờ (giới hạn toàn process), cho /metrics."""
+        limiter = self._global
+        if limiter is None:
+            return {'active': 0, 'queued': 0}
+        with limiter._lock:
+            return {'active': limiter.active, 'queued': len(limiter._waiters)}
+
+    @contextmanager
+    def slot(self, user_id):
+        release = self.acquire(user_id)
+        try:
+            yield
+        finally:
+            release()
+
+    @asynccontextmanager
+    async def aslot(self, user_id):
+        release = await self.aacquire(user_id)
+        try:
+            yield
+        finally:
+            release()
+
+
+chat_limiter = ChatLimiter()
+
+
+class _Call:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._futures = []
+        self.result = None
+        self.error = None
+
+    def finish(self, result=None, error=None):
+        with self._lock:
+            self.result, self.error = result, error
+            self._event.set()
+            futures, self._futures = self._futures, []
+        for loop, future in futures:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def outcome(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def wait(self):
+        self._event.wait()
+        return self.outcome()
+
+    async def await_(self):
+        with self._lock:
+            if not self._event.is_set():
+                loop = asyncio.get_running_loop()
+                future = loop.create_future()
+                self._futures.append((loop, future))
+            else:
+                future = None
+        if future is not None:
+            await asyncio.shield(future)
+        return self.outcome()
+
+
+class _Abandoned(Exception):
+    """Lời gọi dẫn đầu bị huỷ (client ngắt kết nối): lời gọi đang chờ tự chạy lại."""
+
+
+class SingleFlight:
+    """Chạy ``fn`` một lần cho mỗi ``key`` đang xử lý; các lời gọi trùng key nhận cùng kết quả."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def _join(self, key):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = self._calls[key] = _Call()
+            return call, True
+
+    def _done(self, key, call, result=None, error=None):
+        with self._lock:
+            del self._calls[key]
+        call.finish(result, error)
+
+    def do(self, key, fn):
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return call.wait()
+            except _Abandoned:
+                continue
+        try:
+            result = fn()
+        except BaseException as e:
+            self._done(key, call, error=e if isinstance(e, Exception) else _Abandoned())
+            raise
+        self._done(key, call, result=result)
+        return result
+
+    async def ado(self, key, fn):
+        """Bản async: ``fn`` là hàm trả về coroutine."""
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return await call.await_()
+            except _Abandoned:
+                continue
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._done(key, call, error=e if isinstance(e, Exception) else _Abandoned())
+            raise
+        self._done(key, call, result=result)
+        return result
+
+
+flights = SingleFlight()
@@ -0,0 +1,55 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from chatbot.models import ChatMessage, ChatMessageArchive, ChatSummary
+
+
+class Command(BaseCommand):
+    help = (
+        'Chuyển tin nhắn chat cũ hơn N ngày sang bảng ChatMessageArchive, theo lô. Chỉ chuyển '
+        'tin nhắn đã được gộp vào ChatSummary (id <= last_message_id) để ngữ cảnh chat không mất lượt nào'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'CHATBOT_RETENTION_DAYS', 90),
+            help='Giữ lại tin nhắn của N ngày gần nhất trong ChatMessage',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Số tin nhắn mỗi lô')
+        parser.add_argument('--compress', action='store_true', help='Nén nội dung (zlib) trong bảng archive')
+        parser.add_argument('--sleep', type=float, default=0, help='Nghỉ (giây) giữa các lô')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        moved = 0
+        # Lượt chưa gộp vào tóm tắt (hoặc user chưa có ChatSummary) vẫn nằm trong
+        # ngữ cảnh prompt dù cũ đến đâu, xem chatbot/context.py
+        folded_up_to = ChatSummary.objects.filter(user_id=OuterRef('user_id')).values('last_message_id')
+
+        while True:
+            # Mỗi lô một transaction ngắn: copy sang archive rồi xoá theo primary key
+            with transaction.atomic():
+                rows = list(
+                    ChatMessage.objects.filter(created_at__lt=cutoff, id__lte=Subquery(folded_up_to))
+                    .order_by('pk')
+                    .values('id', 'user_id', 'created_at', 'message', 'response')[:batch_size]
+                )
+                if not rows:
+                    break
+                ChatMessageArchive.objects.bulk_create(
+                    [ChatMessageArchive.from_row(row, compress=options['compress']) for row in rows],
+                    ignore_conflicts=True,
+                )
+                ChatMessage.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+            moved += len(rows)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Đã chuyển {moved} tin nhắn cũ hơn {options["days"]} ngày sang archive'))
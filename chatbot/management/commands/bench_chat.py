@@ -0,0 +1,77 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from chatbot import views
+from chatbot.stub import GeminiStub
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'So sánh throughput chat đồng thời: view sync (N worker như WSGI) và view async '
+        '(một event loop), gọi tới server giả lập Gemini (dữ liệu được xoá sau khi chạy)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=4, help='Số worker sync (giống số worker WSGI)')
+        parser.add_argument('--concurrency', type=int, default=50, help='Số request async chạy đồng thời')
+        parser.add_argument('--delay', type=float, default=0.2, help='Độ trễ (giây) của upstream giả lập')
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        user = User.objects.create_user(username=f'bench_chat_{time.time_ns()}', password=None)
+        factory = RequestFactory()
+
+        def make_request(i):
+            request = factory.post(
+                '/chatbot/message/', data=json.dumps({'message': f'Câu hỏi {i}'}), content_type='application/json'
+            )
+            request.user = user
+
+            async def auser():
+                return user
+            request.auser = auser
+            return request
+
+        def run_sync():
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                return list(pool.map(lambda i: views.chat_message(make_request(i)).status_code, range(total)))
+
+        async def run_async():
+            semaphore = asyncio.Semaphore(options['concurrency'])
+
+            async def one(i):
+                async with semaphore:
+                    return (await views.chat_message_async(make_request(i))).status_code
+            return await asyncio.gather(*(one(i) for i in range(total)))
+
+        try:
+            # Một user cho mọi request: nới giới hạn đồng thời để đo throughput thay vì nhận 429
+            limit = max(options['workers'], options['concurrency'])
+            with GeminiStub(delay=options['delay']) as stub, \
+                    override_settings(
+                        GEMINI_API_URL=stub.url, GEMINI_API_KEY='stub',
+                        CHATBOT_MAX_CONCURRENT=limit, CHATBOT_MAX_CONCURRENT_PER_USER=limit,
+                    ):
+                self.stdout.write(f'{total} request, upstream trễ {options["delay"]}s')
+                cases = [
+                    (f'sync, {options["workers"]} worker', run_sync),
+                    (f'async, {options["concurrency"]} đồng thời', lambda: asyncio.run(run_async())),
+                ]
+                for label, run in cases:
+                    start = time.perf_counter()
+                    statuses = run()
+                    elapsed = time.perf_counter() - start
+                    ok = sum(1 for status in statuses if status == 200)
+                    self.stdout.write(f'  {label:<24} {total / elapsed:8.1f} req/s  ({elapsed:.2f}s, {ok}/{total} OK)')
+        finally:
+            user.delete()
@@ -0,0 +1,69 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from chatbot import views
+from chatbot.stub import GeminiStub
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Đo time-to-first-byte của chat_message (chờ cả câu trả lời) và chat_message_stream '
+        '(NDJSON) với server giả lập Gemini (dữ liệu được xoá sau khi chạy)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--delay', type=float, default=0.3, help='Thời gian (giây) tới token đầu tiên')
+        parser.add_argument('--chunk-delay', type=float, default=0.05, help='Thời gian (giây) sinh mỗi đoạn')
+        parser.add_argument('--words', type=int, default=20)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        user = User.objects.create_user(username=f'bench_chat_{time.time_ns()}', password=None)
+        factory = RequestFactory()
+        counter = iter(range(10 ** 9))
+
+        def make_request(path):
+            # Mỗi lần một câu hỏi khác nhau để không trúng cache câu trả lời
+            body = json.dumps({'message': f'Câu hỏi {next(counter)}'})
+            request = factory.post(path, data=body, content_type='application/json')
+            request.user = user
+            return request
+
+        def run_full():
+            start = time.perf_counter()
+            response = views.chat_message(make_request('/chatbot/message/'))
+            elapsed = time.perf_counter() - start
+            return elapsed, elapsed, response.status_code == 200
+
+        def run_stream():
+            start = time.perf_counter()
+            response = views.chat_message_stream(make_request('/chatbot/message/stream/'))
+            content = iter(response.streaming_content)
+            next(content)
+            first_byte = time.perf_counter() - start
+            lines = list(content)
+            return first_byte, time.perf_counter() - start, b'"success": true' in lines[-1]
+
+        try:
+            with GeminiStub(delay=options['delay'], chunk_delay=options['chunk_delay'], words=options['words']) as stub, \
+                    override_settings(GEMINI_API_URL=stub.url, GEMINI_API_KEY='stub'):
+                self.stdout.write(
+                    f'{repeat} lần, token đầu sau {options["delay"]}s, '
+                    f'{options["words"]} đoạn x {options["chunk_delay"]}s'
+                )
+                for label, run in (('chat_message', run_full), ('chat_message_stream', run_stream)):
+                    results = [run() for _ in range(repeat)]
+                    ttfb = sum(r[0] for r in results) / repeat * 1000
+                    total = sum(r[1] for r in results) / repeat * 1000
+                    ok = sum(1 for r in results if r[2])
+                    self.stdout.write(f'  {label:<20} TTFB {ttfb:8.1f} ms   tổng {total:8.1f} ms  ({ok}/{repeat} OK)')
+        finally:
+            user.delete()
@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from chatbot import gemini
+from chatbot.breaker import breaker
+from chatbot.stub import GeminiStub
+
+
+class Command(BaseCommand):
+    help = (
+        'Chạy lần lượt các tình huống lỗi với server giả lập Gemini để kiểm tra retry, '
+        'circuit breaker (closed/open/half-open) và hedged request'
+    )
+
+    def handle(self, *args, **options):
+        self.failed = False
+        with GeminiStub(hang_seconds=5, slow_seconds=1.5) as stub, override_settings(
+            GEMINI_API_URL=stub.url, GEMINI_API_KEY='stub', GEMINI_TIMEOUT=1,
+            GEMINI_RETRIES=0, GEMINI_RETRY_BACKOFF=0.01, GEMINI_HEDGE_DELAY=0,
+            GEMINI_BREAKER_FAILURES=3, GEMINI_BREAKER_RESET_TIMEOUT=0.5, GEMINI_BREAKER_HALF_OPEN_PROBES=1,
+        ):
+            self.stub = stub
+            breaker.reset()
+
+            self.step('closed: gọi thành công', [], 'ok', 'closed', upstream=1)
+            self.step('closed: lỗi 503 chưa tới ngưỡng', [503, 503], 'GeminiUnavailable', 'closed', upstream=1, repeat=2)
+            self.step('open: lỗi thứ 3 liên tiếp mở breaker', [503], 'GeminiUnavailable', 'open', upstream=1)
+            self.step('open: từ chối ngay, không gọi upstream', [], 'CircuitOpen', 'open', upstream=0)
+            time.sleep(0.6)
+            self.step('half-open: probe lỗi thì open lại', [503], 'GeminiUnavailable', 'open', upstream=1)
+            time.sleep(0.6)
+            self.step('half-open: probe thành công thì closed', [], 'ok', 'closed', upstream=1)
+            self.step('lỗi 400 không tính vào breaker', [400], 'GeminiError', 'closed', upstream=1)
+            self.step('timeout theo deadline GEMINI_TIMEOUT', ['hang'], 'GeminiUnavailable', 'closed', upstream=1)
+
+            with override_settings(GEMINI_RETRIES=2):
+                breaker.reset()
+                self.step('retry: 503, reset rồi thành công', [503, 'reset'], 'ok', 'closed', upstream=3)
+
+            with override_settings(GEMINI_HEDGE_DELAY=0.2):
+                breaker.reset()
+                self.step('hedge: request đầu chậm, request hedge trả về trước', ['slow'], 'ok', 'closed',
+                          upstream=2, run=lambda: asyncio.run(gemini.agenerate('Câu hỏi hiện tại: hedge')), max_seconds=1)
+
+            breaker.reset()
+
+        if self.failed:
+            self.stderr.write(self.style.ERROR('Có tình huống không như mong đợi'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Mọi tình huống đều như mong đợi'))
+
+    def step(self, label, faults, expected, expected_state, upstream, repeat=1, run=None, max_seconds=None):
+        run = run or (lambda: gemini.generate('Câu hỏi hiện tại: kiểm tra'))
+        self.stub.inject(*faults)
+        before = self.stub.requests
+        start = time.perf_counter()
+        for _ in range(repeat):
+            try:
+                run()
+                outcome = 'ok'
+            except gemini.GeminiError as e:
+                outcome = type(e).__name__
+        elapsed = time.perf_counter() - start
+        calls = self.stub.requests - before
+
+        ok = (
+            outcome == expected and breaker.state == expected_state and calls == upstream * repeat
+            and (max_seconds is None or elapsed <= max_seconds)
+        )
+        self.failed = self.failed or not ok
+        mark = self.style.SUCCESS('OK  ') if ok else self.style.ERROR('SAI ')
+        self.stdout.write(
+            f'{mark} {label:<52} {outcome:<18} breaker={breaker.state:<9} upstream={calls}  {elapsed * 1000:.0f} ms'
+        )
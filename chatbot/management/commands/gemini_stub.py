@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from chatbot.stub import GeminiStub
+
+
+class Command(BaseCommand):
+    help = 'Chạy server giả lập Gemini API (dùng với GEMINI_API_URL khi thử nghiệm)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--delay', type=float, default=0.5, help='Thời gian (giây) tới token đầu tiên')
+        parser.add_argument('--chunk-delay', type=float, default=0.0, help='Thời gian (giây) sinh mỗi đoạn')
+        parser.add_argument('--words', type=int, default=20, help='Số đoạn mỗi câu trả lời')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Tỉ lệ request trả lỗi --fail-status')
+        parser.add_argument('--fail-status', type=int, default=503)
+        parser.add_argument('--slow-rate', type=float, default=0.0, help='Tỉ lệ request bị chậm thêm --slow-seconds')
+        parser.add_argument('--slow-seconds', type=float, default=2.0)
+
+    def handle(self, *args, **options):
+        stub = GeminiStub(
+            delay=options['delay'], chunk_delay=options['chunk_delay'], words=options['words'], port=options['port'],
+            failure_rate=options['failure_rate'], fail_status=options['fail_status'],
+            slow_rate=options['slow_rate'], slow_seconds=options['slow_seconds'],
+        )
+        self.stdout.write(f'GEMINI_API_URL={stub.url}  (Ctrl+C để dừng)')
+        try:
+            stub.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stub.stop()
@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+from todo_project.db import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY không chạy được bên trong transaction
+    atomic = False
+
+    dependencies = [
+        ('chatbot', '0002_chatsummary'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='chatmessage',
+            index=models.Index(fields=['user', '-created_at'], name='chatmsg_user_created_idx'),
+        ),
+    ]
@@ -1,3 +1,6 @@
+import json
+import zlib
+
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -9,6 +12,65 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Lịch sử / ngữ cảnh chat của một user, mới nhất trước
+            models.Index(fields=['user', '-created_at'], name='chatmsg_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username}: {self.message[:50]}..."
+
+
+class ChatSummary(models.Model):
+    """
+    Tóm tắt các lượt chat cũ của user (mọi tin nhắn có id <= ``last_message_id``),
+    được cập nhật dần khi tin nhắn rơi khỏi cửa sổ ngữ cảnh, xem chatbot/context.py.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='chat_summary')
+    text = models.TextField(blank=True, default='')
+    last_message_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username}: {self.text[:50]}..."
+
+
+class ChatMessageArchive(models.Model):
+    """
+    Tin nhắn cũ đã chuyển khỏi ChatMessage (giữ nguyên id và created_at), xem
+    lệnh ``archive_chat_messages``. Khi lưu nén, ``message``/``response`` để
+    trống và nội dung nằm trong ``compressed`` (JSON nén zlib).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    message = models.TextField(blank=True)
+    response = models.TextField(blank=True)
+    compressed = models.BinaryField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='chatarchive_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.content()[0][:50]}..."
+
+    @classmethod
+    def from_row(cls, row, compress=False):
+        """``row``: dict có id, user_id, created_at, message, response."""
+        archive = cls(id=row['id'], user_id=row['user_id'], created_at=row['created_at'])
+        if compress:
+            payload = json.dumps([row['message'], row['response']], ensure_ascii=False).encode()
+            archive.compressed = zlib.compress(payload, 9)
+        else:
+            archive.message, archive.response = row['message'], row['response']
+        return archive
+
+    def content(self):
+        """(message, response), giải nén nếu cần."""
+        if self.compressed is not None:
+            return tuple(json.loads(zlib.decompress(bytes(self.compressed))))
+        return self.message, self.response
@@ -0,0 +1,156 @@
+"""
+Server giả lập Gemini API chạy trong process, dùng cho benchmark và thử nghiệm
+(không cần API key, không gọi ra ngoài).
+
+    with GeminiStub(delay=0.5) as stub:
+        with override_settings(GEMINI_API_URL=stub.url, GEMINI_API_KEY='stub'):
+            ...
+"""
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _candidate(text):
+    return {'candidates': [{'content': {'parts': [{'text': text}]}}]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # giữ kết nối (keep-alive) như Gemini thật
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        stub = self.server.stub
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        stub.record_request()
+        fault = stub.next_fault()
+        if fault == 'reset':
+            # Đóng kết nối không trả lời (lỗi kết nối phía client)
+            self.close_connection = True
+            return
+        if fault == 'hang':
+            time.sleep(stub.hang_seconds)
+        elif fault == 'slow':
+            time.sleep(stub.slow_seconds)
+        elif isinstance(fault, int):
+            self._send_json(fault, {'error': {'code': fault, 'message': 'lỗi giả lập'}})
+            return
+        chunks = stub.reply_chunks(payload['contents'][0]['parts'][0]['text'])
+
+        if self.path.split('?', 1)[0].endswith(':streamGenerateContent'):
+            self._stream(stub, chunks)
+            return
+
+        # Không stream: trả về sau khi "sinh" xong toàn bộ câu trả lời
+        time.sleep(stub.delay + stub.chunk_delay * len(chunks))
+        self._send_json(200, _candidate(''.join(chunks)))
+
+    def _stream(self, stub, chunks):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        time.sleep(stub.delay)
+        try:
+            for chunk in chunks:
+                time.sleep(stub.chunk_delay)
+                self.wfile.write(f'data: {json.dumps(_candidate(chunk))}\r\n\r\n'.encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client đã bỏ đi (timeout, hedge)
+
+
+class GeminiStub:
+    """
+    ``delay``: thời gian tới token đầu tiên; ``chunk_delay``: thời gian sinh mỗi
+    đoạn (``words`` đoạn mỗi câu trả lời). Bản không stream trả về sau
+    ``delay + chunk_delay * số đoạn``; bản stream (streamGenerateContent,
+    ``alt=sse``) gửi từng đoạn ngay khi "sinh" xong.
+
+    Lỗi giả lập: ``inject(...)`` xếp lỗi cho các request kế tiếp (mỗi request
+    lấy một phần tử), hoặc ``failure_rate``/``slow_rate`` cho lỗi ngẫu nhiên.
+    Mỗi lỗi là một HTTP status (``503``, ``429``, ``400``, ...), ``'reset'``
+    (đóng kết nối), ``'hang'`` (chờ ``hang_seconds``), ``'slow'`` (chờ
+    ``slow_seconds`` rồi trả lời bình thường) hoặc ``'ok'``.
+    """
+
+    def __init__(self, delay=0.0, chunk_delay=0.0, words=20, host='127.0.0.1', port=0,
+                 failure_rate=0.0, fail_status=503, slow_rate=0.0, slow_seconds=2.0, hang_seconds=60.0):
+        self.delay = delay
+        self.chunk_delay = chunk_delay
+        self.words = words
+        self.failure_rate = failure_rate
+        self.fail_status = fail_status
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        self.hang_seconds = hang_seconds
+        self.requests = 0
+        self._faults = deque()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v1beta/models/stub'
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def inject(self, *faults):
+        with self._lock:
+            self._faults.extend(faults)
+
+    def next_fault(self):
+        with self._lock:
+            if self._faults:
+                return self._faults.popleft()
+        if random.random() < self.failure_rate:
+            return self.fail_status
+        if random.random() < self.slow_rate:
+            return 'slow'
+        return 'ok'
+
+    def reply_chunks(self, prompt):
+        question = prompt.rsplit('Câu hỏi hiện tại:', 1)[-1].strip()
+        return [f'Trả lời cho: {question}.'] + [f' từ{i}' for i in range(1, self.words)]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
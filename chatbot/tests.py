@@ -1,3 +1,473 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import threading
+import time
+from datetime import timedelta
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from tasks.testing import PerfTestMixin, clear_caches
+
+from . import gemini
+from .breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, breaker
+from .context import load_history, update_summary
+from .limits import ChatLimiter, Limiter, Overloaded, SingleFlight
+from .models import ChatMessage, ChatMessageArchive, ChatSummary
+from .stub import GeminiStub
+
+User = get_user_model()
+
+MESSAGES_PER_USER = 60
+
+
+class ChatViewPerformanceTests(PerfTestMixin, TestCase):
+    """Số truy vấn của chat_message (Gemini giả lập trong process) và chat_history."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = GeminiStub(words=30).start()
+        cls.addClassCleanup(cls.stub.stop)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('chat', 'chat@example.com', 'testpassword123')
+        other = User.objects.create_user('other', 'other@example.com', 'testpassword123')
+        ChatMessage.objects.bulk_create(
+            ChatMessage(user=user, message=f'Câu hỏi {i} về Django', response=f'Trả lời {i} ' * 20)
+            for user in (cls.user, other)
+            for i in range(MESSAGES_PER_USER)
+        )
+
+    def setUp(self):
+        clear_caches()
+        breaker.reset()
+        self.client.force_login(self.user)
+
+    def test_chat_message(self):
+        url = reverse('chatbot:chat_message')
+        body = json.dumps({'message': 'Làm sao để tối ưu truy vấn Django?'})
+        with override_settings(GEMINI_API_URL=self.stub.url, GEMINI_API_KEY='stub', GEMINI_RETRIES=0):
+            # Lượt đầu tạo ChatSummary; đo các lượt sau (đường thường gặp)
+            self.client.post(url, json.dumps({'message': 'Xin chào'}), content_type='application/json')
+            response = self.assertRequestQueries(
+                lambda: self.client.post(url, body, content_type='application/json'), queries=10,
+            )
+        self.assertTrue(response.json()['success'])
+
+    def test_chat_history(self):
+        url = reverse('chatbot:chat_history') + '?limit=20'
+        response = self.assertRequestQueries(lambda: self.client.get(url), queries=4)
+        self.assertEqual(len(response.json()['history']), 20)
+
+    def test_chat_history_next_page(self):
+        first = self.client.get(reverse('chatbot:chat_history') + '?limit=20').json()
+        url = reverse('chatbot:chat_history') + f'?limit=20&cursor={first["next"]}'
+        self.assertRequestQueries(lambda: self.client.get(url), queries=4)
+
+
+@override_settings(CHATBOT_CONTEXT_MAX_MESSAGES=3, CHATBOT_CONTEXT_TOKEN_BUDGET=10000)
+class ChatContextTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('context', 'context@example.com', 'testpassword123')
+        cls.ids = [
+            ChatMessage.objects.create(user=cls.user, message=f'Câu hỏi {i}', response=f'Trả lời {i}').pk
+            for i in range(5)
+        ]
+        # created_at lệch thứ tự với id (đồng hồ lùi, import dữ liệu, ...)
+        now = timezone.now()
+        for offset, pk in enumerate(cls.ids):
+            ChatMessage.objects.filter(pk=pk).update(created_at=now - timedelta(minutes=offset))
+
+    def test_recent_turns_and_summary_follow_id_watermark(self):
+        history = load_history(self.user)
+        self.assertEqual([row['id'] for row in history.messages], self.ids[:1:-1])
+
+        update_summary(self.user.pk)
+        summary = ChatSummary.objects.get(user=self.user)
+        self.assertEqual(summary.last_message_id, self.ids[1])
+        self.assertEqual(summary.text.count('Câu hỏi'), 2)
+        self.assertIn('Câu hỏi 0', summary.text.splitlines()[0])
+        history = load_history(self.user)
+        self.assertEqual([row['id'] for row in history.messages], self.ids[:1:-1])
+
+
+class ArchiveChatMessagesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('archive', 'archive@example.com', 'testpassword123')
+        cls.idle = User.objects.create_user('idle', 'idle@example.com', 'testpassword123')
+        cls.ids = [
+            ChatMessage.objects.create(user=cls.user, message=f'Câu hỏi {i}', response=f'Trả lời {i}').pk
+            for i in range(5)
+        ]
+        cls.idle_id = ChatMessage.objects.create(user=cls.idle, message='Cũ', response='Cũ').pk
+        ChatMessage.objects.update(created_at=timezone.now() - timedelta(days=365))
+        ChatSummary.objects.create(user=cls.user, text='- ...', last_message_id=cls.ids[1])
+
+    def test_only_folded_turns_are_archived(self):
+        call_command('archive_chat_messages', days=90, stdout=io.StringIO())
+        self.assertEqual(
+            sorted(ChatMessageArchive.objects.values_list('id', flat=True)), self.ids[:2],
+        )
+        self.assertEqual(
+            sorted(ChatMessage.objects.values_list('id', flat=True)), sorted([*self.ids[2:], self.idle_id]),
+        )
+
+
+def _wait_until(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError('Hết thời gian chờ điều kiện')
+        time.sleep(0.001)
+
+
+class LimiterTests(SimpleTestCase):
+    def test_bounds_concurrency(self):
+        limiter = Limiter(2, 10)
+        lock = threading.Lock()
+        running, peak = 0, 0
+
+        def work():
+            nonlocal running, peak
+            limiter.acquire(timeout=5)
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+            limiter.release()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(peak, 2)
+        self.assertEqual(limiter.active, 0)
+
+    def test_full_queue_rejects_immediately(self):
+        limiter = Limiter(1, 1)
+        limiter.acquire(timeout=1)
+        waiter = threading.Thread(target=limiter.acquire, args=(5,))
+        waiter.start()
+        _wait_until(lambda: len(limiter._waiters) == 1)
+        start = time.monotonic()
+        with self.assertRaises(Overloaded):
+            limiter.acquire(timeout=5)
+        self.assertLess(time.monotonic() - start, 1)
+        limiter.release()  # chuyển chỗ cho thread đang chờ
+        waiter.join()
+        self.assertEqual(limiter.active, 1)
+        limiter.release()
+        self.assertEqual(limiter.active, 0)
+
+    def test_queue_timeout(self):
+        limiter = Limiter(1, 5)
+        limiter.acquire(timeout=1)
+        with self.assertRaises(Overloaded):
+            limiter.acquire(timeout=0.02)
+        self.assertEqual(len(limiter._waiters), 0)
+        limiter.release()
+        self.assertEqual(limiter.active, 0)
+
+    def test_async_cancel_while_waiting(self):
+        limiter = Limiter(1, 5)
+
+        async def main():
+            await limiter.aacquire(timeout=1)
+            waiting = asyncio.ensure_future(limiter.aacquire(timeout=5))
+            await asyncio.sleep(0)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+            limiter.release()
+
+        asyncio.run(main())
+        self.assertEqual((limiter.active, len(limiter._waiters)), (0, 0))
+
+    def test_async_cancel_after_grant_returns_slot(self):
+        limiter = Limiter(1, 5)
+
+        async def main():
+            await limiter.aacquire(timeout=1)
+            waiting = asyncio.ensure_future(limiter.aacquire(timeout=5))
+            await asyncio.sleep(0)
+            limiter.release()  # chỗ được chuyển cho waiter, nhưng waiter bị huỷ trước khi chạy tiếp
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+
+        asyncio.run(main())
+        self.assertEqual((limiter.active, len(limiter._waiters)), (0, 0))
+
+
+class ChatLimiterTests(SimpleTestCase):
+    @override_settings(CHATBOT_MAX_CONCURRENT_PER_USER=1, CHATBOT_MAX_CONCURRENT=5, CHATBOT_QUEUE_TIMEOUT=0.02)
+    def test_per_user_limit(self):
+        limiter = ChatLimiter()
+        release = limiter.acquire(1)
+        with self.assertRaises(Overloaded):
+            limiter.acquire(1)
+        other = limiter.acquire(2)  # user khác không bị ảnh hưởng
+        release()
+        release()  # gọi lại vẫn an toàn
+        other()
+        self.assertEqual(limiter.snapshot(), {'active': 0, 'queued': 0})
+        self.assertEqual(limiter._users, {})
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_duplicate_calls_share_one_run(self):
+        flight, started, proceed = SingleFlight(), threading.Event(), threading.Event()
+        calls, results = [], []
+
+        def fn():
+            calls.append(1)
+            started.set()
+            proceed.wait(5)
+            return 'kết quả'
+
+        leader = threading.Thread(target=lambda: results.append(flight.do('k', fn)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do('k', fn))) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        time.sleep(0.02)
+        proceed.set()
+        for thread in [leader, *followers]:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['kết quả'] * 4)
+        self.assertEqual(flight.do('k', lambda: 'lần sau'), 'lần sau')
+
+    def test_leader_error_propagates(self):
+        flight, started, proceed = SingleFlight(), threading.Event(), threading.Event()
+        errors = []
+
+        def fail():
+            started.set()
+            proceed.wait(5)
+            raise ValueError('upstream lỗi')
+
+        def call():
+            try:
+                flight.do('k', fail)
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call)]
+        threads[0].start()
+        started.wait(5)
+        threads.append(threading.Thread(target=call))
+        threads[1].start()
+        time.sleep(0.02)
+        proceed.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 2)
+        self.assertIs(errors[0], errors[1])
+
+    def test_cancelled_leader_hands_over(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def main():
+            blocker = asyncio.Event()
+
+            async def fn():
+                calls.append(1)
+                if len(calls) == 1:
+                    await blocker.wait()
+                return 'follower tự chạy'
+
+            leader = asyncio.ensure_future(flight.ado('k', fn))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flight.ado('k', fn))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        self.assertEqual(asyncio.run(main()), 'follower tự chạy')
+        self.assertEqual(len(calls), 2)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@override_settings(GEMINI_BREAKER_FAILURES=3, GEMINI_BREAKER_RESET_TIMEOUT=10, GEMINI_BREAKER_HALF_OPEN_PROBES=1)
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        self.breaker = CircuitBreaker(clock=self.clock)
+
+    def fail(self, times):
+        for _ in range(times):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.fail(2)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()  # thành công xen giữa: đếm lại từ đầu
+        self.fail(2)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.fail(1)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.clock.now = 4.5
+        self.assertEqual(self.breaker.retry_after(), 6)
+
+    def test_half_open_probe_success_closes(self):
+        self.fail(3)
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertFalse(self.breaker.allow())  # chỉ một probe
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.snapshot(), {'state': CLOSED, 'failures': 0})
+        self.assertTrue(self.breaker.allow())
+
+    def test_half_open_probe_failure_reopens(self):
+        self.fail(3)
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.clock.now = 19
+        self.assertFalse(self.breaker.allow())
+        self.clock.now = 20
+        self.assertTrue(self.breaker.allow())
+
+    def test_abandon_returns_probe(self):
+        self.fail(3)
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.breaker.abandon()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+
+
+class _Interrupted(BaseException):
+    pass
+
+
+@override_settings(GEMINI_API_KEY='stub', GEMINI_RETRIES=2, GEMINI_RETRY_BACKOFF=0, GEMINI_TIMEOUT=5,
+                   GEMINI_BREAKER_FAILURES=5, GEMINI_BREAKER_RESET_TIMEOUT=30, GEMINI_BREAKER_HALF_OPEN_PROBES=1)
+class GeminiClientTests(SimpleTestCase):
+    """Thử lại, circuit breaker, deadline stream và hedge trên Gemini giả lập."""
+
+    def setUp(self):
+        self.stub = GeminiStub(words=5).start()
+        self.addCleanup(self.stub.stop)
+        settings_override = override_settings(GEMINI_API_URL=self.stub.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        breaker.reset()
+        self.addCleanup(breaker.reset)
+
+    def test_transient_errors_are_retried(self):
+        self.stub.inject(503, 'reset')
+        self.assertTrue(gemini.generate('Xin chào').startswith('Trả lời cho'))
+        self.assertEqual(self.stub.requests, 3)
+        self.assertEqual(breaker.snapshot(), {'state': CLOSED, 'failures': 0})
+
+    def test_client_error_is_not_retried(self):
+        self.stub.inject(400)
+        with self.assertRaises(gemini.GeminiError) as raised:
+            gemini.generate('Xin chào')
+        self.assertNotIsInstance(raised.exception, gemini.GeminiUnavailable)
+        self.assertEqual(self.stub.requests, 1)
+        self.assertEqual(breaker.snapshot()['failures'], 0)
+
+    @override_settings(GEMINI_RETRIES=0, GEMINI_BREAKER_FAILURES=2)
+    def test_open_breaker_rejects_without_calling_upstream(self):
+        self.stub.inject(503, 503)
+        for _ in range(2):
+            with self.assertRaises(gemini.GeminiUnavailable):
+                gemini.generate('Xin chào')
+        with self.assertRaises(gemini.CircuitOpen):
+            gemini.generate('Xin chào')
+        self.assertEqual(self.stub.requests, 2)
+
+    def test_interrupted_attempt_returns_half_open_probe(self):
+        for attempt_fn, run in (
+            (self._interrupt, gemini._retrying),
+            (self._ainterrupt, lambda fn: asyncio.run(gemini._aretrying(fn))),
+        ):
+            with self.subTest(run=run):
+                breaker.reset()
+                breaker.state, breaker.opened_at = OPEN, time.monotonic() - 60
+                with self.assertRaises(_Interrupted):
+                    run(attempt_fn)
+                self.assertEqual(breaker.state, HALF_OPEN)
+                self.assertTrue(breaker.allow())
+
+    @staticmethod
+    def _interrupt(remaining):
+        raise _Interrupted
+
+    @staticmethod
+    async def _ainterrupt(remaining):
+        raise _Interrupted
+
+    @override_settings(GEMINI_TIMEOUT=0.5)
+    def test_stream_deadline_covers_whole_stream(self):
+        # Mỗi đoạn tới trong 0.2s (dưới timeout mỗi lần đọc), cả stream mất 1s
+        self.stub.chunk_delay = 0.2
+        for stream in (
+            lambda: list(gemini.stream_generate('Xin chào')),
+            lambda: asyncio.run(self._collect(gemini.astream_generate('Xin chào'))),
+        ):
+            with self.subTest(stream=stream):
+                breaker.reset()
+                start = time.monotonic()
+                with self.assertRaises(gemini.GeminiUnavailable) as raised:
+                    stream()
+                self.assertLess(time.monotonic() - start, 0.9)
+                self.assertEqual(str(raised.exception), gemini.TIMEOUT_REPLY)
+                self.assertEqual(breaker.snapshot()['failures'], 1)
+
+    @staticmethod
+    async def _collect(chunks):
+        return [chunk async for chunk in chunks]
+
+    def test_async_client_closed_with_its_loop(self):
+        async def call():
+            reply = await gemini.agenerate('Xin chào')
+            return reply, gemini._async_client()
+
+        # asyncio.run: như ASGI server/lệnh quản lý; async_to_sync: như view sync dưới WSGI
+        for name, run in (('asyncio.run', lambda: asyncio.run(call())), ('async_to_sync', async_to_sync(call))):
+            with self.subTest(run=name):
+                reply, client = run()
+                self.assertTrue(reply.startswith('Trả lời cho'))
+                self.assertTrue(client.is_closed)
+
+    @override_settings(GEMINI_HEDGE_DELAY=0.1)
+    def test_hedged_request_wins(self):
+        self.stub.slow_seconds = 2
+        self.stub.inject('slow')
+        start = time.monotonic()
+        self.assertTrue(asyncio.run(gemini.agenerate('Xin chào')).startswith('Trả lời cho'))
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(self.stub.requests, 2)
+        self.assertEqual(breaker.snapshot(), {'state': CLOSED, 'failures': 0})
@@ -1,9 +1,19 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'chatbot'
 
 urlpatterns = [
-    path('message/', views.chat_message, name='chat_message'),
+    # CHATBOT_ASYNC = True khi chạy qua ASGI: /chatbot/message/ và /chatbot/message/stream/ dùng bản async
+    path('message/', views.chat_message_async if settings.CHATBOT_ASYNC else views.chat_message, name='chat_message'),
+    path('message/async/', views.chat_message_async, name='chat_message_async'),
+    path(
+        'message/stream/',
+        views.chat_message_stream_async if settings.CHATBOT_ASYNC else views.chat_message_stream,
+        name='chat_message_stream',
+    ),
+    path('message/stream/async/', views.chat_message_stream_async, name='chat_message_stream_async'),
     path('history/', views.chat_history, name='chat_history'),
+    path('cache/stats/', views.cache_stats, name='cache_stats'),
 ]
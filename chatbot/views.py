@@ -1,34 +1,125 @@
+from django.conf import settings
+from django.db.models import Q
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
-from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+import asyncio
+import base64
+import hashlib
 import json
-import requests
+from . import cache as reply_cache
+from .context import aload_history, aupdate_summary, load_history, update_summary
+from .cache import normalize
+from .gemini import CircuitOpen, GeminiError, GeminiUnavailable, acall_gemini_api, astream_gemini_api, call_gemini_api, stream_gemini_api
+from .limits import Overloaded, chat_limiter, flights
 from .models import ChatMessage
 
+HISTORY_MAX_LIMIT = 100
+
+
+class _BadRequest(Exception):
+    pass
+
+
+def _read_message(request):
+    data = json.loads(request.body)
+    user_message = data.get('message', '')
+    if not user_message:
+        raise _BadRequest('Tin nhắn không được để trống')
+    return user_message
+
+
+def _busy():
+    response = JsonResponse({'error': 'Hệ thống đang bận, vui lòng thử lại sau.'}, status=429)
+    response['Retry-After'] = '1'
+    return response
+
+
+def _upstream_error(error):
+    """Lỗi từ Gemini: trả cho client nhưng không lưu thành ChatMessage."""
+    status = 503 if isinstance(error, GeminiUnavailable) else 502
+    response = JsonResponse({'error': str(error), 'success': False}, status=status)
+    if isinstance(error, CircuitOpen):
+        response['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def _answer(user, user_message):
+    """Gọi Gemini và lưu tin nhắn, trong giới hạn đồng thời của user/process."""
+    with chat_limiter.slot(user.pk):
+        # Ngữ cảnh: bản tóm tắt + các lượt gần nhất vừa token budget (xem chatbot/context.py)
+        history = load_history(user)
+
+        # Gọi Gemini API với ngữ cảnh
+        gemini_response = call_gemini_api(user_message, history)
+
+        # Lưu vào database
+        ChatMessage.objects.create(
+            user=user,
+            message=user_message,
+            response=gemini_response
+        )
+        update_summary(user.pk)
+    return gemini_response
+
+
+async def _aanswer(user, user_message):
+    async with chat_limiter.aslot(user.pk):
+        history = await aload_history(user)
+
+        gemini_response = await acall_gemini_api(user_message, history)
+
+        await _asave_message(user, user_message, gemini_response)
+    return gemini_response
+
+
 @csrf_exempt
 @login_required
 def chat_message(request):
     if request.method == 'POST':
         try:
-            data = json.loads(request.body)
-            user_message = data.get('message', '')
+            user_message = _read_message(request)
 
-            if not user_message:
-                return JsonResponse({'error': 'Tin nhắn không được để trống'}, status=400)
+            # Request giống hệt đang chạy (bấm gửi hai lần, retry) thì chờ và dùng chung kết quả
+            gemini_response = flights.do(
+                (request.user.pk, normalize(user_message)), lambda: _answer(request.user, user_message)
+            )
 
-            # Lấy lịch sử chat gần đây để tạo ngữ cảnh (3 tin nhắn gần nhất)
-            recent_messages = ChatMessage.objects.filter(user=request.user).order_by('-created_at')[:3]
+            return JsonResponse({
+                'response': gemini_response,
+                'success': True
+            })
 
-            # Gọi Gemini API với ngữ cảnh
-            gemini_response = call_gemini_api(user_message, recent_messages)
+        except _BadRequest as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Overloaded:
+            return _busy()
+        except GeminiError as e:
+            return _upstream_error(e)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
 
-            # Lưu vào database
-            chat_message = ChatMessage.objects.create(
-                user=request.user,
-                message=user_message,
-                response=gemini_response
+    return JsonResponse({'error': 'Phương thức không được hỗ trợ'}, status=405)
+
+
+@csrf_exempt
+@login_required
+async def chat_message_async(request):
+    """
+    Bản async của chat_message (chạy qua todo_project/asgi.py): chờ Gemini
+    không chiếm worker, ORM dùng API async của Django.
+    """
+    if request.method == 'POST':
+        try:
+            user_message = _read_message(request)
+            user = await request.auser()
+
+            gemini_response = await flights.ado(
+                (user.pk, normalize(user_message)), lambda: _aanswer(user, user_message)
             )
 
             return JsonResponse({
@@ -36,72 +127,230 @@ def chat_message(request):
                 'success': True
             })
 
+        except _BadRequest as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Overloaded:
+            return _busy()
+        except GeminiError as e:
+            return _upstream_error(e)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
     return JsonResponse({'error': 'Phương thức không được hỗ trợ'}, status=405)
 
-def call_gemini_api(message, recent_messages=None):
-    """Gọi Gemini API để lấy phản hồi với ngữ cảnh"""
-    try:
-        api_key = settings.GEMINI_API_KEY
-        if not api_key:
-            return "Xin lỗi, API key chưa được cấu hình."
 
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={api_key}"
+async def _asave_message(user, message, response):
+    await ChatMessage.objects.acreate(user=user, message=message, response=response)
+    await aupdate_summary(user.pk)
 
-        headers = {
-            'Content-Type': 'application/json',
-        }
 
-        # Tạo ngữ cảnh từ lịch sử chat
-        context = "Bạn là một trợ lý AI thông minh và hữu ích. Hãy trả lời bằng tiếng Việt một cách ngắn gọn và dễ hiểu."
+def _ndjson(data):
+    return json.dumps(data, ensure_ascii=False) + '\n'
 
-        if recent_messages and recent_messages.exists():
-            context += "\n\nLịch sử cuộc trò chuyện gần đây (từ mới nhất đến cũ nhất):"
-            for msg in recent_messages:
-                context += f"\nNguời dùng: {msg.message}"
-                context += f"\nTrợ lý: {msg.response}"
 
-        context += f"\n\nCâu hỏi hiện tại: {message}"
+class _ReleaseOnClose:
+    """
+    Bọc stream để trả chỗ của chat_limiter khi Django đóng response, kể cả khi
+    stream chưa từng được đọc (generator chưa chạy thì finally không chạy).
+    """
 
-        data = {
-            "contents": [{
-                "parts": [{
-                    "text": context
-                }]
-            }]
-        }
+    def __init__(self, events, release):
+        self.events = events
+        self.release = release
 
-        response = requests.post(url, headers=headers, json=data, timeout=30)
+    def __iter__(self):
+        return self.events
 
-        if response.status_code == 200:
-            result = response.json()
-            if 'candidates' in result and len(result['candidates']) > 0:
-                return result['candidates'][0]['content']['parts'][0]['text']
-            else:
-                return "Xin lỗi, tôi không thể tạo phản hồi cho câu hỏi này."
-        else:
-            return f"Lỗi API: {response.status_code} - {response.text}"
-
-    except requests.exceptions.Timeout:
-        return "Xin lỗi, yêu cầu đã hết thời gian chờ. Vui lòng thử lại."
-    except requests.exceptions.RequestException as e:
-        return f"Lỗi kết nối: {str(e)}"
+    def close(self):
+        try:
+            self.events.close()
+        finally:
+            self.release()
+
+
+class _AsyncReleaseOnClose:
+    def __init__(self, events, release):
+        self.events = events
+        self.release = release
+
+    def __aiter__(self):
+        return self.events
+
+    def close(self):
+        self.release()
+
+
+def _stream_response(events):
+    response = StreamingHttpResponse(events, content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: không gom buffer
+    return response
+
+
+@csrf_exempt
+@login_required
+def chat_message_stream(request):
+    """
+    Như chat_message nhưng trả về NDJSON từng dòng: ``{"delta": ...}`` cho mỗi
+    đoạn câu trả lời, ``{"error": ...}`` khi lỗi, cuối cùng ``{"done": true}``.
+    ChatMessage được lưu khi stream kết thúc hoặc bị huỷ giữa chừng.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Phương thức không được hỗ trợ'}, status=405)
+    try:
+        user_message = _read_message(request)
+    except _BadRequest as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        return f"Lỗi không xác định: {str(e)}"
+        return JsonResponse({'error': str(e)}, status=500)
+
+    user = request.user
+    try:
+        release = chat_limiter.acquire(user.pk)
+    except Overloaded:
+        return _busy()
+    try:
+        history = load_history(user)
+    except BaseException:
+        release()
+        raise
+
+    def events():
+        chunks = []
+        error = None
+        try:
+            for chunk in stream_gemini_api(user_message, history):
+                chunks.append(chunk)
+                yield _ndjson({'delta': chunk})
+        except GeminiError as e:
+            error = str(e)
+            yield _ndjson({'error': error})
+        finally:
+            # Chỉ lưu phần câu trả lời đã gửi tới người dùng, không lưu thông báo lỗi
+            response = ''.join(chunks)
+            if response:
+                ChatMessage.objects.create(user=user, message=user_message, response=response)
+                update_summary(user.pk)
+            release()
+        yield _ndjson({'done': True, 'success': error is None})
+
+    return _stream_response(_ReleaseOnClose(events(), release))
+
+
+@csrf_exempt
+@login_required
+async def chat_message_stream_async(request):
+    """Bản async của chat_message_stream (chạy qua todo_project/asgi.py)"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Phương thức không được hỗ trợ'}, status=405)
+    try:
+        user_message = _read_message(request)
+    except _BadRequest as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+    user = await request.auser()
+    try:
+        release = await chat_limiter.aacquire(user.pk)
+    except Overloaded:
+        return _busy()
+    try:
+        history = await aload_history(user)
+    except BaseException:
+        release()
+        raise
+
+    async def events():
+        chunks = []
+        error = None
+        try:
+            async for chunk in astream_gemini_api(user_message, history):
+                chunks.append(chunk)
+                yield _ndjson({'delta': chunk})
+        except GeminiError as e:
+            error = str(e)
+            yield _ndjson({'error': error})
+        finally:
+            # Chỉ lưu phần câu trả lời đã gửi tới người dùng, không lưu thông báo lỗi
+            response = ''.join(chunks)
+            if response:
+                # shield: client ngắt kết nối thì task bị cancel nhưng vẫn phải lưu
+                await asyncio.shield(_asave_message(user, user_message, response))
+            release()
+        yield _ndjson({'done': True, 'success': error is None})
+
+    return _stream_response(_AsyncReleaseOnClose(events(), release))
+
+
+def _encode_cursor(row):
+    position = [row['created_at'].isoformat(), row['id']]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(encoded):
+    padded = encoded + '=' * (-len(encoded) % 4)
+    created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    created_at = parse_datetime(created_at)
+    if created_at is None:
+        raise ValueError
+    return created_at, int(pk)
+
 
 @login_required
 def chat_history(request):
-    """Lấy lịch sử chat của user"""
-    messages = ChatMessage.objects.filter(user=request.user).order_by('-created_at')[:5]  # 5 tin nhắn gần nhất
-
-    history = []
-    for msg in messages:
-        history.append({
-            'message': msg.message,
-            'response': msg.response,
-            'created_at': msg.created_at.strftime('%H:%M %d/%m/%Y')
-        })
-
-    return JsonResponse({'history': history})
+    """
+    Lịch sử chat của user, mới nhất trước, phân trang bằng cursor trên
+    (created_at, id): ``?limit=`` (mặc định CHATBOT_HISTORY_PAGE_SIZE) và
+    ``?cursor=`` lấy từ ``next`` của trang trước. ETag theo id tin nhắn mới
+    nhất nên mở lại khung chat khi chưa có tin mới sẽ nhận 304.
+    """
+    messages = ChatMessage.objects.filter(user=request.user).order_by('-created_at', '-id')
+
+    newest_id = messages.values_list('id', flat=True).first()
+    etag = f'W/"{request.user.pk}-{newest_id or 0}-{hashlib.md5(request.get_full_path().encode()).hexdigest()[:16]}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = _history_page(request, messages)
+        if response.status_code == 200:
+            response.headers['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def _history_page(request, messages):
+    default = getattr(settings, 'CHATBOT_HISTORY_PAGE_SIZE', 5)
+    try:
+        limit = max(1, min(int(request.GET.get('limit', default)), HISTORY_MAX_LIMIT))
+    except ValueError:
+        return JsonResponse({'error': 'limit không hợp lệ'}, status=400)
+
+    encoded = request.GET.get('cursor')
+    if encoded:
+        try:
+            created_at, pk = _decode_cursor(encoded)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            return JsonResponse({'error': 'Cursor không hợp lệ'}, status=400)
+        messages = messages.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    # Lấy dư một dòng để biết còn trang sau hay không
+    rows = list(messages.values('id', 'message', 'response', 'created_at')[:limit + 1])
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+
+    history = [
+        {
+            'id': row['id'],
+            'message': row['message'],
+            'response': row['response'],
+            'created_at': row['created_at'].isoformat(),
+        }
+        for row in rows[:limit]
+    ]
+    return JsonResponse({'history': history, 'next': next_cursor})
+
+
+@staff_member_required
+def cache_stats(request):
+    """Hit ratio và thời gian upstream tiết kiệm được của cache câu trả lời (trong process này)"""
+    return JsonResponse(reply_cache.stats.snapshot())
@@ -1,8 +1,14 @@
 from django.contrib import admin
-from .models import Task
+from .models import Task, TaskStats
 
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
     list_display = ("title", "owner", "is_done", "due_at", "created_at")
     list_filter = ("is_done",)
     search_fields = ("title", "note", "owner__username")
+
+    def delete_queryset(self, request, queryset):
+        # Xoá hàng loạt không đi qua Task.delete() nên phải đếm lại thống kê
+        owner_ids = set(queryset.values_list("owner_id", flat=True))
+        super().delete_queryset(request, queryset)
+        TaskStats.objects.rebuild(owner_ids)
@@ -1,22 +1,44 @@
+from django.conf import settings
 from django.urls import path
-from rest_framework_simplejwt.views import TokenRefreshView
-from . import api_views
+from . import api_views, async_api_views
 
 app_name = "tasks_api"
 
+if settings.TASKS_API_ASYNC:
+    task_views = {
+        'list': async_api_views.task_list_create,
+        'detail': async_api_views.task_detail,
+        'toggle': async_api_views.task_toggle,
+        'stats': async_api_views.task_stats,
+    }
+else:
+    task_views = {
+        'list': api_views.TaskListCreateView.as_view(),
+        'detail': api_views.TaskDetailView.as_view(),
+        'toggle': api_views.TaskToggleView.as_view(),
+        'stats': api_views.task_stats,
+    }
+
 urlpatterns = [
     # Authentication endpoints
     path('auth/login/', api_views.CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/refresh/', api_views.CustomTokenRefreshView.as_view(), name='token_refresh'),
     path('auth/register/', api_views.UserRegistrationView.as_view(), name='register'),
     path('auth/logout/', api_views.logout_view, name='logout'),
     
     # User endpoints
     path('user/profile/', api_views.UserProfileView.as_view(), name='user_profile'),
     
-    # Task endpoints
-    path('tasks/', api_views.TaskListCreateView.as_view(), name='task_list_create'),
-    path('tasks/<int:pk>/', api_views.TaskDetailView.as_view(), name='task_detail'),
-    path('tasks/<int:pk>/toggle/', api_views.TaskToggleView.as_view(), name='task_toggle'),
-    path('tasks/stats/', api_views.task_stats, name='task_stats'),
+    # Task endpoints (TASKS_API_ASYNC = True khi chạy qua ASGI: dùng bản async trong tasks/async_api_views.py)
+    path('tasks/', task_views['list'], name='task_list_create'),
+    path('tasks/batch/', api_views.TaskBatchView.as_view(), name='task_batch'),
+    path('tasks/<int:pk>/', task_views['detail'], name='task_detail'),
+    path('tasks/<int:pk>/toggle/', task_views['toggle'], name='task_toggle'),
+    path('tasks/stats/', task_views['stats'], name='task_stats'),
+
+    # Luôn là bản async (so sánh với bản sync ở trên)
+    path('async/tasks/', async_api_views.task_list_create, name='task_list_create_async'),
+    path('async/tasks/<int:pk>/', async_api_views.task_detail, name='task_detail_async'),
+    path('async/tasks/<int:pk>/toggle/', async_api_views.task_toggle, name='task_toggle_async'),
+    path('async/tasks/stats/', async_api_views.task_stats, name='task_stats_async'),
 ]
@@ -1,14 +1,22 @@
 from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.views import TokenObtainPairView
-from django.contrib.auth import authenticate, get_user_model
-from django.db.models import Q
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from django.contrib.auth import get_user_model
+from . import cache as task_cache
+from .authentication import CACHED_AUTHENTICATION_CLASSES
+from .batch import TaskBatch
+from .conditional import ConditionalTaskGetMixin, conditional_payload_response
 from .models import Task
+from .pagination import TaskCursorPagination, is_cursor_request, reject_search_with_cursor
+from .search import search_tasks
+from .stats import get_task_stats
+from .tokens import SingleUseRefreshToken, SingleUseTokenRefreshSerializer
 from .serializers import (
-    TaskSerializer, 
+    CustomTokenObtainPairSerializer,
+    FastTaskSerializer,
     TaskCreateUpdateSerializer, 
     UserSerializer, 
     UserRegistrationSerializer
@@ -18,18 +26,13 @@ User = get_user_model()
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
-    """Custom JWT token view với thông tin user"""
-    
-    def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
-        if response.status_code == 200:
-            user = authenticate(
-                username=request.data.get('username'),
-                password=request.data.get('password')
-            )
-            if user:
-                response.data['user'] = UserSerializer(user).data
-        return response
+    """Custom JWT token view với thông tin user (chỉ hash mật khẩu một lần mỗi lần login)"""
+    serializer_class = CustomTokenObtainPairSerializer
+
+
+class CustomTokenRefreshView(TokenRefreshView):
+    """Refresh JWT; refresh token cũ chỉ đổi được một lần (xem tasks/tokens.py)"""
+    serializer_class = SingleUseTokenRefreshSerializer
 
 
 class UserRegistrationView(generics.CreateAPIView):
@@ -63,25 +66,45 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 
-class TaskListCreateView(generics.ListCreateAPIView):
-    """API endpoint cho danh sách và tạo task"""
+class TaskListCreateView(ConditionalTaskGetMixin, generics.ListCreateAPIView):
+    """
+    API endpoint cho danh sách và tạo task.
+
+    Mặc định phân trang theo số trang; gửi ``?pagination=cursor`` (hoặc một
+    ``?cursor=``) để dùng keyset pagination không COUNT/OFFSET. Cursor không đi
+    cùng ``?search=``/``?q=`` (400): kết quả tìm kiếm xếp theo độ liên quan.
+    GET hỗ trợ ETag/Last-Modified (xem tasks/conditional.py).
+    """
+    authentication_classes = CACHED_AUTHENTICATION_CLASSES
     permission_classes = [permissions.IsAuthenticated]
     
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if is_cursor_request(self.request.query_params):
+                self._paginator = TaskCursorPagination()
+            else:
+                self._paginator = self.pagination_class() if self.pagination_class else None
+        return self._paginator
+    
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return TaskCreateUpdateSerializer
-        return TaskSerializer
+        return FastTaskSerializer
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['owner'] = self.request.user
+        context['compact'] = self.is_compact()
+        return context
+    
+    def is_compact(self):
+        """``?compact=1``: owner trong mỗi task chỉ là id, thông tin user gửi một lần ở envelope"""
+        return self.request.query_params.get('compact') in ('1', 'true')
     
     def get_queryset(self):
         queryset = Task.objects.filter(owner=self.request.user)
         
-        # Tìm kiếm
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) | Q(note__icontains=search)
-            )
-        
         # Lọc theo trạng thái
         status_filter = self.request.query_params.get('status', None)
         if status_filter == 'done':
@@ -89,17 +112,45 @@ class TaskListCreateView(generics.ListCreateAPIView):
         elif status_filter == 'pending':
             queryset = queryset.filter(is_done=False)
         
-        return queryset.order_by('is_done', '-created_at')
+        # Tìm kiếm full-text (nhận cả ?search= và ?q= như giao diện web)
+        search = self.request.query_params.get('search') or self.request.query_params.get('q')
+        if search:
+            queryset = search_tasks(queryset, search)
+        else:
+            queryset = queryset.order_by('is_done', '-created_at')
+        
+        # Chỉ lấy đúng các cột cần serialize, dạng dict thay vì model instance
+        return queryset.values(*FastTaskSerializer.fields)
+    
+    def list(self, request, *args, **kwargs):
+        reject_search_with_cursor(request.query_params)
+        cache_parts = ('api-list', request.get_full_path())
+        data = task_cache.get_cached(request.user.pk, cache_parts)
+        if data is not None:
+            return Response(data, headers={'X-Cache': 'HIT'})
+        
+        response = super().list(request, *args, **kwargs)
+        if self.is_compact() and isinstance(response.data, dict):
+            response.data['owner'] = UserSerializer(request.user).data
+        task_cache.set_cached(request.user.pk, cache_parts, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
 
 
-class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):
+class TaskDetailView(ConditionalTaskGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """API endpoint cho chi tiết, cập nhật và xóa task"""
+    authentication_classes = CACHED_AUTHENTICATION_CLASSES
     permission_classes = [permissions.IsAuthenticated]
     
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
             return TaskCreateUpdateSerializer
-        return TaskSerializer
+        return FastTaskSerializer
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['owner'] = self.request.user
+        return context
     
     def get_queryset(self):
         return Task.objects.filter(owner=self.request.user)
@@ -113,10 +164,10 @@ class TaskToggleView(APIView):
         try:
             task = Task.objects.get(pk=pk, owner=request.user)
             task.is_done = not task.is_done
-            task.save(update_fields=['is_done'])
+            task.save(update_fields=['is_done', 'updated_at'])
             
             return Response({
-                'task': TaskSerializer(task).data,
+                'task': FastTaskSerializer(task, context={'owner': request.user}).data,
                 'message': f'Task đã được {"hoàn thành" if task.is_done else "đánh dấu chưa xong"}'
             })
         except Task.DoesNotExist:
@@ -126,19 +177,30 @@ class TaskToggleView(APIView):
             )
 
 
+class TaskBatchView(APIView):
+    """
+    API endpoint áp dụng nhiều thao tác task trong một request/transaction
+    (dùng cho client đồng bộ thay đổi offline). Xem tasks/batch.py.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        operations = request.data.get('operations') if isinstance(request.data, dict) else request.data
+        batch = TaskBatch(request.user, operations)
+        if batch.is_valid():
+            batch.apply()
+        if batch.errors:
+            return Response({'applied': False, 'results': batch.results}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'applied': True, 'results': batch.results})
+
+
 @api_view(['GET'])
+@authentication_classes(CACHED_AUTHENTICATION_CLASSES)
 @permission_classes([permissions.IsAuthenticated])
 def task_stats(request):
-    """API endpoint cho thống kê task"""
-    user_tasks = Task.objects.filter(owner=request.user)
-    
-    stats = {
-        'total': user_tasks.count(),
-        'completed': user_tasks.filter(is_done=True).count(),
-        'pending': user_tasks.filter(is_done=False).count(),
-    }
-    
-    return Response(stats)
+    """API endpoint cho thống kê task (total, completed, pending, overdue, due_today)"""
+    stats = get_task_stats(request.user)
+    return conditional_payload_response(request, Response(stats), *sorted(stats.items()))
 
 
 @api_view(['POST'])
@@ -148,7 +210,7 @@ def logout_view(request):
     try:
         refresh_token = request.data.get('refresh')
         if refresh_token:
-            token = RefreshToken(refresh_token)
+            token = SingleUseRefreshToken(refresh_token)
             token.blacklist()
         
         return Response({'message': 'Đăng xuất thành công'})
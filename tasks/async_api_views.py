@@ -0,0 +1,239 @@
+"""
+Bản async (view Django async, chạy qua todo_project/asgi.py) của các endpoint
+task trong tasks/api_views.py, cùng URL và cùng JSON.
+
+- Xác thực: JWT có cache user (``CachedJWTAuthentication.aauthenticate``) rồi
+  tới session (``request.auser()``, có kiểm tra CSRF như DRF).
+- Đọc (list, detail, stats, ETag/304, cache response) dùng ORM/cache async
+  nên chờ database không chiếm thread: một worker ASGI phục vụ được nhiều
+  client cùng lúc.
+- Ghi (tạo, sửa, toggle, xoá) vẫn chạy trong thread qua ``sync_to_async`` vì
+  ``Task.save``/``delete`` cập nhật TaskStats trong ``transaction.atomic``,
+  mà Django chưa có transaction async. Mỗi thao tác ghi là một lần chuyển
+  sang thread.
+- Chỉ nhận body JSON (DRF nhận thêm form).
+"""
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, NotFound, ParseError, PermissionDenied
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import cache as task_cache
+from .authentication import CachedJWTAuthentication
+from .conditional import aconditional_task_get, conditional_payload_response
+from .models import Task
+from .pagination import TaskCursorPagination, is_cursor_request, reject_search_with_cursor
+from .search import get_backend, search_tasks
+from .serializers import FastTaskSerializer, TaskCreateUpdateSerializer, UserSerializer
+from .stats import aget_task_stats
+
+_jwt = CachedJWTAuthentication()
+
+
+def _json(data, status=200):
+    # Giống JSONRenderer của DRF: UTF-8 nguyên văn, không có khoảng trắng thừa
+    return JsonResponse(data, status=status, safe=False, json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+
+def _error(exc):
+    # Giống exception handler mặc định của DRF
+    response = _json(exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}, status=exc.status_code)
+    if isinstance(exc, (AuthenticationFailed, NotAuthenticated)):
+        response['WWW-Authenticate'] = _jwt.authenticate_header(None)
+    return response
+
+
+class _CSRFCheck(CsrfViewMiddleware):
+    def _reject(self, request, reason):
+        return reason
+
+
+async def _authenticate(request):
+    """User của request (JWT trước, session sau) hoặc raise NotAuthenticated/AuthenticationFailed."""
+    result = await _jwt.aauthenticate(request)
+    if result is not None:
+        return result[0]
+
+    user = await request.auser()
+    if not user.is_active:
+        raise NotAuthenticated
+    # Như SessionAuthentication của DRF: request ghi bằng session phải có CSRF token
+    check = _CSRFCheck(lambda request: None)
+    check.process_request(request)
+    reason = check.process_view(request, None, (), {})
+    if reason:
+        raise PermissionDenied(f'CSRF Failed: {reason}')
+    return user
+
+
+def async_api_view(methods):
+    """Decorator cho view async: kiểm tra method, xác thực, đổi APIException thành JSON."""
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                response = _json({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+                response['Allow'] = ', '.join(methods)
+                return response
+            try:
+                request.user = await _authenticate(request)
+                return await view(request, *args, **kwargs)
+            except APIException as exc:
+                return _error(exc)
+        return wrapper
+    return decorator
+
+
+def _read_json(request):
+    try:
+        return json.loads(request.body or b'{}')
+    except ValueError as exc:
+        raise ParseError(f'JSON parse error - {exc}')
+
+
+async def _get_task(request, pk):
+    try:
+        return await Task.objects.aget(pk=pk, owner=request.user)
+    except Task.DoesNotExist:
+        raise NotFound('No Task matches the given query.')
+
+
+def _task_queryset(request):
+    queryset = Task.objects.filter(owner=request.user)
+
+    # Lọc theo trạng thái
+    status_filter = request.GET.get('status')
+    if status_filter == 'done':
+        queryset = queryset.filter(is_done=True)
+    elif status_filter == 'pending':
+        queryset = queryset.filter(is_done=False)
+
+    search = request.GET.get('search') or request.GET.get('q')
+    if search:
+        queryset = search_tasks(queryset, search)
+    else:
+        queryset = queryset.order_by('is_done', '-created_at')
+    return queryset.values(*FastTaskSerializer.fields)
+
+
+async def _page(request, queryset):
+    """Như PageNumberPagination của DRF: {count, next, previous, results}."""
+    page_size = api_settings.PAGE_SIZE
+    try:
+        number = int(request.GET.get('page', 1))
+        if number < 1:
+            raise ValueError
+    except ValueError:
+        raise NotFound('Invalid page.')
+
+    count = await queryset.acount()
+    offset = (number - 1) * page_size
+    if number > 1 and offset >= count:
+        raise NotFound('Invalid page.')
+    rows = [row async for row in queryset[offset:offset + page_size]]
+
+    url = request.build_absolute_uri()
+    previous = None
+    if number == 2:
+        previous = remove_query_param(url, 'page')
+    elif number > 2:
+        previous = replace_query_param(url, 'page', number - 1)
+    return rows, {
+        'count': count,
+        'next': replace_query_param(url, 'page', number + 1) if offset + page_size < count else None,
+        'previous': previous,
+    }
+
+
+async def _list(request):
+    reject_search_with_cursor(request.GET)
+    cache_parts = ('api-list', request.get_full_path())
+    data = await task_cache.aget_cached(request.user.pk, cache_parts)
+    if data is not None:
+        response = _json(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    if request.GET.get('search') or request.GET.get('q'):
+        # Lần đầu get_backend có thể cần introspection (sync), các lần sau chỉ đọc dict
+        await sync_to_async(get_backend)()
+    compact = request.GET.get('compact') in ('1', 'true')
+    context = {'owner': request.user, 'compact': compact}
+    queryset = _task_queryset(request)
+
+    if is_cursor_request(request.GET):
+        paginator = TaskCursorPagination()
+        rows = await paginator.apaginate_queryset(queryset, request)
+        data = paginator.get_paginated_data(FastTaskSerializer(rows, many=True, context=context).data)
+    else:
+        rows, envelope = await _page(request, queryset)
+        data = {**envelope, 'results': FastTaskSerializer(rows, many=True, context=context).data}
+    if compact:
+        data['owner'] = UserSerializer(request.user).data
+
+    await task_cache.aset_cached(request.user.pk, cache_parts, data)
+    response = _json(data)
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+@async_api_view(['GET', 'POST'])
+async def task_list_create(request):
+    """Bản async của TaskListCreateView (GET có ETag/Last-Modified và cache response)."""
+    if request.method == 'GET':
+        return await aconditional_task_get(request, lambda: _list(request))
+
+    serializer = TaskCreateUpdateSerializer(data=_read_json(request), context={'request': request})
+    if not serializer.is_valid():
+        return _json(serializer.errors, status=400)
+    await sync_to_async(serializer.save)()
+    return _json(serializer.data, status=201)
+
+
+@async_api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
+async def task_detail(request, pk):
+    """Bản async của TaskDetailView."""
+    if request.method == 'GET':
+        async def get_response():
+            task = await _get_task(request, pk)
+            return _json(FastTaskSerializer(task, context={'owner': request.user}).data)
+        return await aconditional_task_get(request, get_response)
+
+    task = await _get_task(request, pk)
+    if request.method == 'DELETE':
+        await sync_to_async(task.delete)()
+        return HttpResponse(status=204)
+
+    serializer = TaskCreateUpdateSerializer(
+        task, data=_read_json(request), partial=request.method == 'PATCH', context={'request': request}
+    )
+    if not serializer.is_valid():
+        return _json(serializer.errors, status=400)
+    await sync_to_async(serializer.save)()
+    return _json(serializer.data)
+
+
+@async_api_view(['PATCH'])
+async def task_toggle(request, pk):
+    """Bản async của TaskToggleView."""
+    task = await _get_task(request, pk)
+    task.is_done = not task.is_done
+    await sync_to_async(task.save)(update_fields=['is_done', 'updated_at'])
+    return _json({
+        'task': FastTaskSerializer(task, context={'owner': request.user}).data,
+        'message': f'Task đã được {"hoàn thành" if task.is_done else "đánh dấu chưa xong"}'
+    })
+
+
+@async_api_view(['GET'])
+async def task_stats(request):
+    """Bản async của task_stats."""
+    stats = await aget_task_stats(request.user)
+    return conditional_payload_response(request, _json(stats), *sorted(stats.items()))
@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def user_cache_key(user_id):
+    return f'auth:jwt-user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication nhưng user được lấy từ cache (TTL ngắn,
+    ``JWT_USER_CACHE_TIMEOUT`` giây) thay vì truy vấn bảng user ở mỗi request.
+
+    Bản cache bị xoá ngay khi user được lưu hoặc bị xoá (đổi mật khẩu, khoá
+    tài khoản, ...), xem tasks/signals.py. Với nhiều worker cần một cache
+    backend dùng chung để việc xoá có hiệu lực ở mọi worker.
+    """
+
+    def get_user(self, validated_token):
+        timeout = getattr(settings, 'JWT_USER_CACHE_TIMEOUT', 0)
+        if not timeout:
+            return super().get_user(validated_token)
+
+        key = user_cache_key(self._user_id(validated_token))
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, timeout)
+            return user
+        return self._check_user(user, validated_token)
+
+    async def aauthenticate(self, request):
+        """
+        Bản async của ``authenticate`` cho view Django async (không qua DRF):
+        token được kiểm tra như bản sync, user lấy bằng cache/ORM async.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        timeout = getattr(settings, 'JWT_USER_CACHE_TIMEOUT', 0)
+        key = user_cache_key(user_id)
+        user = await cache.aget(key) if timeout else None
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found') from e
+            if timeout:
+                await cache.aset(key, user, timeout)
+        return self._check_user(user, validated_token)
+
+    def _user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+    def _check_user(self, user, validated_token):
+        # Các kiểm tra giống JWTAuthentication.get_user, trên bản cache
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
+
+
+# Dùng cho các endpoint đọc nhiều (gán vào authentication_classes của view)
+CACHED_AUTHENTICATION_CLASSES = [CachedJWTAuthentication, SessionAuthentication]
@@ -0,0 +1,183 @@
+"""
+Áp dụng một lô thao tác trên task (create / update / toggle / delete) trong
+một transaction, với số truy vấn cố định thay vì một request cho mỗi thao tác.
+
+Mỗi thao tác có dạng::
+
+    {"op": "create", "data": {...}}
+    {"op": "update", "id": 12, "data": {...}}   # cập nhật một phần
+    {"op": "toggle", "id": 12}
+    {"op": "delete", "id": 12}
+
+Các thao tác được xét theo đúng thứ tự gửi lên (ví dụ update rồi delete cùng
+một task là hợp lệ, delete rồi update thì không). Nếu có thao tác không hợp lệ
+thì không thao tác nào được áp dụng.
+
+``is_valid()`` kiểm tra lô không khoá gì; ``apply()`` nạp lại các task với
+``select_for_update()`` trong transaction rồi áp dụng thao tác lên bản mới nhất,
+nên chỉ các field mà lô thực sự đổi được ghi (không ghi đè thay đổi đồng thời
+vào field khác) và delta TaskStats tính từ trạng thái đang khoá.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Task, TaskStats
+from .serializers import FastTaskSerializer, TaskCreateUpdateSerializer
+
+OPERATIONS = ('create', 'update', 'toggle', 'delete')
+
+
+class TaskBatch:
+    def __init__(self, user, operations):
+        self.user = user
+        self.operations = operations
+        self.results = []
+        self.errors = False
+
+    @property
+    def max_operations(self):
+        return getattr(settings, 'TASK_BATCH_MAX_OPERATIONS', 1000)
+
+    def is_valid(self):
+        """Kiểm tra toàn bộ lô trong một lượt (một truy vấn lấy các task được tham chiếu)."""
+        if not isinstance(self.operations, list) or not self.operations:
+            self.results = [{'errors': {'operations': ['Cần một danh sách thao tác.']}}]
+            self.errors = True
+            return False
+        if len(self.operations) > self.max_operations:
+            self.results = [{'errors': {'operations': [f'Tối đa {self.max_operations} thao tác mỗi lô.']}}]
+            self.errors = True
+            return False
+
+        ids = {
+            op.get('id') for op in self.operations
+            if isinstance(op, dict) and op.get('op') != 'create' and _is_id(op.get('id'))
+        }
+        self.tasks = Task.objects.filter(owner=self.user, id__in=ids).in_bulk()
+
+        deleted = set()
+        self.validated = []
+        for index, op in enumerate(self.operations):
+            result, data = self._validate_one(index, op, deleted)
+            self.results.append(result)
+            self.validated.append(data)
+            if 'errors' in result:
+                self.errors = True
+        if self.errors:
+            self._mark_failed()
+        return not self.errors
+
+    def _mark_failed(self):
+        for result in self.results:
+            result['status'] = 'error' if 'errors' in result else 'not_applied'
+
+    def _validate_one(self, index, op, deleted):
+        result = {'index': index}
+        if not isinstance(op, dict) or op.get('op') not in OPERATIONS:
+            result['errors'] = {'op': [f'Phải là một trong: {", ".join(OPERATIONS)}.']}
+            return result, None
+        kind = result['op'] = op['op']
+
+        if kind != 'create':
+            task_id = result['id'] = op.get('id')
+            if not _is_id(task_id):
+                result['errors'] = {'id': ['Cần một số nguyên.']}
+                return result, None
+            if task_id not in self.tasks:
+                result['errors'] = {'id': ['Task không tồn tại']}
+                return result, None
+            if task_id in deleted:
+                result['errors'] = {'id': ['Task đã bị xoá ở thao tác trước trong lô']}
+                return result, None
+            if kind == 'delete':
+                deleted.add(task_id)
+
+        if kind in ('create', 'update'):
+            serializer = TaskCreateUpdateSerializer(data=op.get('data') or {}, partial=(kind == 'update'))
+            if not serializer.is_valid():
+                result['errors'] = serializer.errors
+                return result, None
+            return result, serializer.validated_data
+        return result, None
+
+    def apply(self):
+        """
+        Áp dụng lô đã kiểm tra: bulk_create + bulk_update theo nhóm field + một câu
+        DELETE + cập nhật thống kê. Trả về ``results``; nếu một task đã bị xoá từ lúc
+        kiểm tra thì không áp dụng gì và ``errors`` là True.
+        """
+        assert not self.errors, 'Gọi is_valid() trước và chỉ apply() khi hợp lệ'
+        now = timezone.now()
+
+        with transaction.atomic():
+            tasks = Task.objects.select_for_update().filter(owner=self.user, id__in=list(self.tasks)).in_bulk()
+            missing = self.tasks.keys() - tasks.keys()
+            if missing:
+                for result in self.results:
+                    if result.get('id') in missing:
+                        result['errors'] = {'id': ['Task không tồn tại']}
+                self.errors = True
+                self._mark_failed()
+                return self.results
+            was_done = {pk: task.is_done for pk, task in tasks.items()}
+
+            created, touched, deleted = [], {}, []
+            changed_fields = defaultdict(set)
+            for result, data in zip(self.results, self.validated):
+                kind = result['op']
+                if kind == 'create':
+                    task = Task(owner=self.user, **data)
+                    created.append(task)
+                    result['task'] = task
+                    continue
+
+                task = tasks[result['id']]
+                if kind == 'update':
+                    for field, value in data.items():
+                        setattr(task, field, value)
+                    changed_fields[task.pk].update(data)
+                elif kind == 'toggle':
+                    task.is_done = not task.is_done
+                    changed_fields[task.pk].add('is_done')
+                if kind == 'delete':
+                    touched.pop(task.pk, None)
+                    deleted.append(task)
+                else:
+                    task.updated_at = now
+                    touched[task.pk] = task
+                    result['task'] = task
+
+            # Mỗi nhóm task có cùng tập field thay đổi là một bulk_update riêng
+            groups = defaultdict(list)
+            for pk, task in touched.items():
+                groups[tuple(sorted(changed_fields[pk] | {'updated_at'}))].append(task)
+
+            if created:
+                Task.objects.bulk_create(created)
+            for fields, group in groups.items():
+                Task.objects.bulk_update(group, fields)
+            if deleted:
+                Task.objects.filter(owner=self.user, id__in=[task.pk for task in deleted]).delete()
+
+            done_delta = (
+                sum(task.is_done for task in created)
+                + sum(int(task.is_done) - int(was_done[task.pk]) for task in touched.values())
+                - sum(int(was_done[task.pk]) for task in deleted)
+            )
+            TaskStats.objects.record_change(self.user.pk, total=len(created) - len(deleted), done=done_delta)
+
+        context = {'owner': self.user, 'compact': True}
+        for result in self.results:
+            result['status'] = 'ok'
+            if 'task' in result:
+                result['task'] = FastTaskSerializer(result['task'], context=context).data
+            if result['op'] == 'create':
+                result['id'] = result['task']['id']
+        return self.results
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
@@ -0,0 +1,131 @@
+"""
+Cache response đọc task theo user (Django cache framework).
+
+Key gồm user, "generation" hiện tại của user và biến thể request (bộ lọc,
+trang, ...). Mọi đường ghi task đều đi qua ``TaskStats.objects.record_change``
+/ ``rebuild`` và các hàm đó gọi ``bump_generation``; sửa User (thông tin
+owner được nhúng trong response) cũng gọi ``record_change``, xem
+tasks/signals.py. Generation mới làm mọi key cũ của user không còn được đọc
+tới (chúng tự hết hạn theo timeout).
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+class ResponseCacheStats:
+    """Bộ đếm hit/miss trong process (xem cả /metrics)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+
+stats = ResponseCacheStats()
+
+
+def _timeout():
+    return getattr(settings, 'TASK_RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def _generation_key(user_id):
+    return f'tasks:gen:{user_id}'
+
+
+def _new_generation():
+    # Không dùng bộ đếm tăng dần: nếu key generation bị cache evict thì
+    # giá trị mới vẫn không được trùng với generation cũ
+    return f'{time.time_ns():x}'
+
+
+def generation(user_id):
+    key = _generation_key(user_id)
+    value = cache.get(key)
+    if value is None:
+        value = _new_generation()
+        cache.add(key, value, timeout=None)
+        value = cache.get(key, value)
+    return value
+
+
+def bump_generation(user_id):
+    """
+    Làm mất hiệu lực cache của user. Bump ngay (để chính request đang ghi
+    không đọc lại dữ liệu cũ) và bump lần nữa sau commit (để request đọc chen
+    vào trước commit không để lại bản cũ dưới generation mới).
+    """
+    if not _timeout():
+        return
+    cache.set(_generation_key(user_id), _new_generation(), timeout=None)
+    transaction.on_commit(lambda: cache.set(_generation_key(user_id), _new_generation(), timeout=None))
+
+
+async def ageneration(user_id):
+    key = _generation_key(user_id)
+    value = await cache.aget(key)
+    if value is None:
+        value = _new_generation()
+        await cache.aadd(key, value, timeout=None)
+        value = await cache.aget(key, value)
+    return value
+
+
+def _digest(parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def _key(user_id, parts):
+    return f'tasks:resp:{user_id}:{generation(user_id)}:{_digest(parts)}'
+
+
+async def _akey(user_id, parts):
+    return f'tasks:resp:{user_id}:{await ageneration(user_id)}:{_digest(parts)}'
+
+
+def get_cached(user_id, parts):
+    """Giá trị đã cache cho (user, parts) hoặc None."""
+    if not _timeout():
+        return None
+    value = cache.get(_key(user_id, parts))
+    stats.record(hit=value is not None)
+    return value
+
+
+def set_cached(user_id, parts, value):
+    if _timeout():
+        cache.set(_key(user_id, parts), value, timeout=_timeout())
+
+
+async def aget_cached(user_id, parts):
+    """Bản async của ``get_cached`` (cho tasks/async_api_views.py)."""
+    if not _timeout():
+        return None
+    value = await cache.aget(await _akey(user_id, parts))
+    stats.record(hit=value is not None)
+    return value
+
+
+async def aset_cached(user_id, parts, value):
+    if _timeout():
+        await cache.aset(await _akey(user_id, parts), value, timeout=_timeout())
@@ -0,0 +1,85 @@
+"""
+Conditional GET (ETag / Last-Modified) cho các response đọc task.
+
+Validator lấy từ ``TaskStats.version``/``changed_at`` của user (một lần tra
+theo khoá chính, tăng sau mọi thay đổi task và sau khi User được sửa, vì
+response có kèm thông tin owner), nên request có
+``If-None-Match``/``If-Modified-Since`` khớp sẽ nhận 304 trước khi chạy truy
+vấn danh sách hay serialize gì.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .models import TaskStats
+
+
+def _digest(*parts):
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()[:16]
+
+
+def task_validators(request, *extra):
+    """(etag, last_modified) cho dữ liệu task của ``request.user`` ở URL hiện tại."""
+    version, changed_at = TaskStats.objects.version_for(request.user.pk)
+    return _task_etag(request, version, extra), changed_at
+
+
+def _task_etag(request, version, extra):
+    return f'W/"{request.user.pk}-{version}-{_digest(request.get_full_path(), *extra)}"'
+
+
+def conditional_task_get(request, get_response, *extra):
+    """
+    Trả 304 nếu client đã có bản mới nhất, nếu không thì gọi ``get_response()``
+    và gắn ETag/Last-Modified. ``extra`` là những gì khác ngoài URL làm thay đổi
+    nội dung response (ví dụ CSRF token trong trang HTML).
+    """
+    etag, changed_at = task_validators(request, *extra)
+    last_modified = int(changed_at.timestamp()) if changed_at else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _with_validators(get_response(), etag, last_modified)
+    return finalize(response)
+
+
+async def aconditional_task_get(request, get_response, *extra):
+    """Bản async của ``conditional_task_get``; ``get_response`` là hàm async."""
+    version, changed_at = await TaskStats.objects.aversion_for(request.user.pk)
+    etag = _task_etag(request, version, extra)
+    last_modified = int(changed_at.timestamp()) if changed_at else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _with_validators(await get_response(), etag, last_modified)
+    return finalize(response)
+
+
+def _with_validators(response, etag, last_modified):
+    if response.status_code == 200:
+        response.headers.setdefault('ETag', etag)
+        if last_modified is not None:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+    return response
+
+
+def conditional_payload_response(request, response, *parts):
+    """ETag theo nội dung (cho response nhỏ như thống kê, vốn phụ thuộc cả thời gian)."""
+    etag = f'W/"{_digest(request.user.pk, *parts)}"'
+    response.headers['ETag'] = etag
+    return finalize(get_conditional_response(request, etag=etag, response=response))
+
+
+def finalize(response):
+    # Response riêng của từng user: chỉ cache ở client và luôn hỏi lại server
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization', 'Cookie'))
+    return response
+
+
+class ConditionalTaskGetMixin:
+    """Mixin cho view DRF đọc task của request.user: GET có ETag/Last-Modified và 304."""
+
+    def get(self, request, *args, **kwargs):
+        return conditional_task_get(request, lambda: super(ConditionalTaskGetMixin, self).get(request, *args, **kwargs))
@@ -0,0 +1,125 @@
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.utils import load_backend
+
+TABLE = 'bench_db_connections'
+
+
+class Command(BaseCommand):
+    help = (
+        'Đo chi phí kết nối database mỗi request cho từng profile (mở/đóng mỗi request, '
+        'kết nối bền, pool, SQLite tuned) theo đúng vòng đời request của Django'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--queries', type=int, default=3, help='Số truy vấn đọc mỗi request')
+        parser.add_argument('--writes', type=int, default=1, help='Số lần INSERT (autocommit) mỗi request')
+
+    def handle(self, *args, **options):
+        base = connections.settings['default']
+        with tempfile.TemporaryDirectory(prefix='bench_db_') as directory:
+            if base['ENGINE'].endswith('sqlite3'):
+                profiles = _sqlite_profiles(base, directory)
+            else:
+                profiles = _postgresql_profiles(base)
+            self.run(base, profiles, options)
+
+    def run(self, base, profiles, options):
+        self.stdout.write(
+            f"{options['requests']} request, mỗi request {options['queries']} truy vấn đọc + "
+            f"{options['writes']} lần ghi ({base['ENGINE'].rsplit('.', 1)[-1]})"
+        )
+        for label, settings_dict in profiles:
+            try:
+                result = _bench(settings_dict, options)
+            except Exception as exc:  # psycopg_pool chưa cài, ...
+                self.stdout.write(f'  {label:<34} bỏ qua: {exc}')
+                continue
+            self.stdout.write(
+                f"  {label:<34} {result['per_request']:7.3f} ms/request  "
+                f"kết nối {result['connect']:7.3f} ms/request  ({result['connects']} lần mở)"
+            )
+
+
+def _sqlite_profiles(base, directory):
+    # Mỗi profile một file riêng: journal_mode=WAL được ghi vào file, dùng chung
+    # file sẽ làm profile mặc định cũng chạy WAL
+    tuned_options = base['OPTIONS'] if 'init_command' in base['OPTIONS'] else {
+        'init_command': 'PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL;PRAGMA busy_timeout=5000',
+        'transaction_mode': 'IMMEDIATE',
+    }
+    return [
+        ('mặc định, đóng mỗi request', {
+            **base, 'NAME': os.path.join(directory, 'default.sqlite3'), 'CONN_MAX_AGE': 0, 'OPTIONS': {},
+        }),
+        ('tuned, đóng mỗi request', {
+            **base, 'NAME': os.path.join(directory, 'tuned.sqlite3'), 'CONN_MAX_AGE': 0, 'OPTIONS': tuned_options,
+        }),
+        ('tuned, kết nối bền', {
+            **base, 'NAME': os.path.join(directory, 'persistent.sqlite3'), 'CONN_MAX_AGE': 600,
+            'OPTIONS': tuned_options,
+        }),
+    ]
+
+
+def _postgresql_profiles(base):
+    options = {key: value for key, value in base['OPTIONS'].items() if key != 'pool'}
+    pool = base['OPTIONS'].get('pool') or {'min_size': 2, 'max_size': 10}
+    return [
+        ('đóng mỗi request (CONN_MAX_AGE=0)', {**base, 'CONN_MAX_AGE': 0, 'OPTIONS': options}),
+        ('kết nối bền + health check', {
+            **base, 'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': options,
+        }),
+        ('pool psycopg', {**base, 'CONN_MAX_AGE': 0, 'OPTIONS': {**options, 'pool': pool}}),
+    ]
+
+
+def _bench(settings_dict, options):
+    """Giả lập ``options['requests']`` request trên một kết nối riêng (không đụng connection ``default``)."""
+    backend = load_backend(settings_dict['ENGINE'])
+    connection = backend.DatabaseWrapper(settings_dict, alias='bench')
+    connect_times = []
+    connect = connection.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        connect()
+        connect_times.append(time.perf_counter() - start)
+    connection.connect = timed_connect
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE TABLE IF NOT EXISTS {TABLE} (value varchar(100))')
+        connection.close()
+        connect_times.clear()
+
+        durations = []
+        for i in range(options['requests']):
+            start = time.perf_counter()
+            # Như close_old_connections() ở request_started/request_finished
+            connection.close_if_unusable_or_obsolete()
+            with connection.cursor() as cursor:
+                for _ in range(options['queries']):
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+                for _ in range(options['writes']):
+                    cursor.execute(f'INSERT INTO {TABLE} (value) VALUES (%s)', [f'request {i}'])
+            connection.close_if_unusable_or_obsolete()
+            durations.append(time.perf_counter() - start)
+        return {
+            'per_request': statistics.mean(durations) * 1000,
+            'connect': sum(connect_times) / len(durations) * 1000,
+            'connects': len(connect_times),
+        }
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+        connection.close()
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
@@ -0,0 +1,70 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from tasks.api_views import CustomTokenObtainPairView
+from tasks.serializers import UserSerializer
+
+User = get_user_model()
+
+
+class LegacyTokenObtainPairView(TokenObtainPairView):
+    """Cách làm cũ: xác thực trong serializer rồi gọi authenticate() thêm một lần"""
+
+    def post(self, request, *args, **kwargs):
+        response = super().post(request, *args, **kwargs)
+        if response.status_code == 200:
+            user = authenticate(username=request.data.get('username'), password=request.data.get('password'))
+            if user:
+                response.data['user'] = UserSerializer(user).data
+        return response
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Đo throughput login JWT và số lần hash mật khẩu mỗi lần login (dữ liệu được rollback)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=10)
+
+    def handle(self, *args, **options):
+        logins = options['logins']
+        hasher_class = type(get_hasher('default'))
+        factory = APIRequestFactory()
+        results = []
+
+        try:
+            with transaction.atomic():
+                User.objects.create_user(username='bench_login', password='bench-password-123')
+                for label, view in (
+                    ('Trước (authenticate hai lần)', LegacyTokenObtainPairView.as_view()),
+                    ('Sau (CustomTokenObtainPairSerializer)', CustomTokenObtainPairView.as_view()),
+                ):
+                    with mock.patch.object(hasher_class, 'verify', autospec=True, side_effect=hasher_class.verify) as verify:
+                        start = time.perf_counter()
+                        for _ in range(logins):
+                            request = factory.post(
+                                '/api/auth/login/',
+                                {'username': 'bench_login', 'password': 'bench-password-123'},
+                                format='json',
+                            )
+                            response = view(request)
+                            assert response.status_code == 200 and 'user' in response.data, response.data
+                        elapsed = time.perf_counter() - start
+                    results.append((label, logins / elapsed, verify.call_count / logins))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f'{logins} lần login, hasher: {hasher_class.__name__}')
+        for label, throughput, hashes in results:
+            self.stdout.write(f'  {label:<40} {throughput:7.2f} login/s   {hashes:.1f} hash/login')
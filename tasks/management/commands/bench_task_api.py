@@ -0,0 +1,201 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from asgiref.sync import ThreadSensitiveContext
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from tasks.models import Task, TaskStats
+
+User = get_user_model()
+
+HOST = 'localhost'
+
+
+class Command(BaseCommand):
+    help = (
+        'So sánh API task khi chạy qua WSGI (view sync, N worker) và ASGI (view sync '
+        'hoặc async, một event loop) với nhiều client đồng thời, và số truy vấn bớt được nhờ '
+        'cache user JWT (dữ liệu được xoá sau khi chạy)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=4, help='Số worker WSGI (thread)')
+        parser.add_argument('--concurrency', type=int, default=100, help='Số client đồng thời')
+        parser.add_argument('--tasks', type=int, default=200, help='Số task của user benchmark')
+        parser.add_argument(
+            '--db-latency', type=float, default=2,
+            help='Độ trễ mạng giả lập (ms) cho mỗi truy vấn, như khi database ở máy khác',
+        )
+        parser.add_argument('--with-cache', action='store_true', help='Bật cache response task (mặc định tắt)')
+
+    def handle(self, *args, **options):
+        if getattr(settings, 'TASKS_API_ASYNC', False):
+            raise CommandError('Chạy với TASKS_API_ASYNC=False để /api/tasks/ là bản sync')
+
+        user = User.objects.create_user(username=f'bench_api_{time.time_ns()}', password=None)
+        try:
+            Task.objects.bulk_create(
+                Task(owner=user, title=f'Task {i}', note='Ghi chú', is_done=i % 3 == 0)
+                for i in range(options['tasks'])
+            )
+            TaskStats.objects.rebuild([user.pk])
+            task_id = Task.objects.filter(owner=user).values_list('pk', flat=True).first()
+            token = str(RefreshToken.for_user(user).access_token)
+
+            with ExitStack() as stack:
+                stack.enter_context(override_settings(ALLOWED_HOSTS=[HOST]))
+                if not options['with_cache']:
+                    stack.enter_context(override_settings(TASK_RESPONSE_CACHE_TIMEOUT=0))
+                if options['db_latency']:
+                    stack.enter_context(_db_latency(options['db_latency'] / 1000))
+                self.run(options, token, task_id)
+        finally:
+            user.delete()
+
+    def run(self, options, token, task_id):
+        total = options['requests']
+
+        def paths(prefix):
+            urls = [f'/api/{prefix}tasks/', f'/api/{prefix}tasks/{task_id}/', f'/api/{prefix}tasks/stats/']
+            return [urls[i % len(urls)] for i in range(total)]
+
+        self.stdout.write(
+            f'{total} request GET (list/detail/stats), {options["concurrency"]} client đồng thời, '
+            f'database trễ {options["db_latency"]} ms/truy vấn'
+        )
+        cases = [
+            (f'WSGI, view sync, {options["workers"]} worker', lambda: _run_wsgi(paths(''), token, options['workers'])),
+            ('ASGI, view sync', lambda: asyncio.run(_run_asgi(paths(''), token, options['concurrency']))),
+            ('ASGI, view async', lambda: asyncio.run(_run_asgi(paths('async/'), token, options['concurrency']))),
+        ]
+        for label, run in cases:
+            start = time.perf_counter()
+            results = run()
+            elapsed = time.perf_counter() - start
+            ok = sum(1 for status, _ in results if status == 200)
+            latencies = sorted(seconds * 1000 for _, seconds in results)
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(
+                f'  {label:<28} {total / elapsed:8.1f} req/s  p50 {statistics.median(latencies):7.1f} ms  '
+                f'p95 {p95:7.1f} ms  ({ok}/{total} OK)'
+            )
+
+        self.stdout.write('Truy vấn mỗi request GET (user JWT lấy từ cache / từ database):')
+        for label, path in (
+            ('list', '/api/tasks/'), ('detail', f'/api/tasks/{task_id}/'), ('stats', '/api/tasks/stats/'),
+        ):
+            with override_settings(JWT_USER_CACHE_TIMEOUT=60):
+                cached = _count_queries(path, token)
+            with override_settings(JWT_USER_CACHE_TIMEOUT=0):
+                plain = _count_queries(path, token)
+            self.stdout.write(f'  {label:<8} {cached} / {plain}  (bớt {plain - cached})')
+
+
+class _db_latency:
+    """Thêm ``seconds`` vào mỗi truy vấn trên mọi connection (kể cả connection tạo trong lúc chạy)."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        from django.db.backends.signals import connection_created
+        connection_created.connect(self._install)
+        for connection in connections.all(initialized_only=True):
+            self._install(connection)
+        return self
+
+    def __exit__(self, *exc_info):
+        from django.db.backends.signals import connection_created
+        connection_created.disconnect(self._install)
+        for connection in connections.all(initialized_only=True):
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+
+    def _install(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+def _count_queries(path, token):
+    """Số truy vấn của một request qua WSGI, sau một request làm nóng cache."""
+    application = WSGIHandler()
+    environ = RequestFactory().get(path, headers={'Authorization': f'Bearer {token}'}, SERVER_NAME=HOST).environ
+    for warm in (True, False):
+        with CaptureQueriesContext(connections['default']) as captured:
+            body = application(dict(environ), lambda status, headers, exc_info=None: None)
+            b''.join(body)
+            body.close()
+    return len(captured)
+
+
+def _run_wsgi(paths, token, workers):
+    """Như gunicorn với ``workers`` thread: mỗi request chiếm một thread tới khi xong."""
+    application = WSGIHandler()
+    factory = RequestFactory()
+
+    def one(path):
+        environ = factory.get(path, headers={'Authorization': f'Bearer {token}'}, SERVER_NAME=HOST).environ
+        start = time.perf_counter()
+        status = []
+        body = application(environ, lambda s, headers, exc_info=None: status.append(int(s.split()[0])))
+        b''.join(body)
+        body.close()
+        return status[0], time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(one, paths))
+
+
+async def _run_asgi(paths, token, concurrency):
+    """Như uvicorn một worker: mọi request trên một event loop, tối đa ``concurrency`` cùng lúc."""
+    application = get_asgi_application()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(path):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', HOST.encode()), (b'authorization', f'Bearer {token}'.encode())],
+            'server': (HOST, 80), 'client': ('127.0.0.1', 50000),
+        }
+        sent_body = False
+        disconnected = asyncio.Event()
+        status = []
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        async with semaphore:
+            start = time.perf_counter()
+            # Như server ASGI thật: mỗi request một ngữ cảnh thread cho code sync
+            async with ThreadSensitiveContext():
+                await application(scope, receive, send)
+            disconnected.set()
+            return status[0], time.perf_counter() - start
+
+    return await asyncio.gather(*(one(path) for path in paths))
@@ -0,0 +1,147 @@
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from tasks.models import Task
+
+User = get_user_model()
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark các index của Task: seed một bảng lớn, ghi lại EXPLAIN và độ trễ '
+        'trước/sau khi có index. Mọi dữ liệu được rollback khi kết thúc.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=50000, help='Số task của user được đo')
+        parser.add_argument('--other-users', type=int, default=20, help='Số user "hàng xóm" để bảng không chỉ có một owner')
+        parser.add_argument('--tasks-per-other-user', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=20, help='Số lần chạy mỗi truy vấn')
+        parser.add_argument('--json', dest='json_path', help='Ghi kết quả ra file JSON')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.results = {'vendor': connection.vendor, 'tasks': options['tasks'], 'phases': {}}
+        try:
+            with transaction.atomic():
+                user = self._seed()
+                indexes = list(Task._meta.indexes)
+                # Chỉ dùng editor để sinh SQL: schema_editor của SQLite không vào được
+                # bên trong transaction đang mở, còn DDL thì cả hai backend đều rollback được.
+                editor = connection.schema_editor()
+                editor.deferred_sql = []
+
+                self._execute(index.remove_sql(Task, editor) for index in indexes)
+                self._analyze()
+                self.results['phases']['before'] = self._measure(user)
+
+                self._execute(index.create_sql(Task, editor) for index in indexes)
+                self._analyze()
+                self.results['phases']['after'] = self._measure(user)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self._report()
+
+    def _seed(self):
+        opts = self.options
+        now = timezone.now()
+        rnd = random.Random(42)
+        stamp = int(time.time())
+
+        def make_tasks(owner, count):
+            return [
+                Task(
+                    owner=owner,
+                    title=f'Công việc {i}',
+                    note='Ghi chú ' * rnd.randint(0, 20),
+                    is_done=rnd.random() < 0.7,
+                    due_at=now + timedelta(hours=rnd.randint(-24 * 30, 24 * 30)) if rnd.random() < 0.5 else None,
+                )
+                for i in range(count)
+            ]
+
+        user = User.objects.create_user(username=f'bench_indexes_{stamp}', password=None)
+        for n in range(opts['other_users']):
+            other = User.objects.create_user(username=f'bench_indexes_{stamp}_{n}', password=None)
+            Task.objects.bulk_create(make_tasks(other, opts['tasks_per_other_user']), batch_size=1000)
+        Task.objects.bulk_create(make_tasks(user, opts['tasks']), batch_size=1000)
+
+        # created_at là auto_now_add nên bulk_create gán cùng một thời điểm; rải lại cho giống thực tế
+        with connection.cursor() as cursor:
+            table = connection.ops.quote_name(Task._meta.db_table)
+            for pk in Task.objects.filter(owner=user).values_list('pk', flat=True)[:5000]:
+                cursor.execute(
+                    f'UPDATE {table} SET created_at = %s WHERE id = %s',
+                    [now - timedelta(minutes=rnd.randint(0, 60 * 24 * 365)), pk],
+                )
+        return user
+
+    def _execute(self, statements):
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(str(statement))
+
+    def _analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _queries(self, user):
+        now = timezone.now()
+        end_of_day = timezone.localtime(now).replace(hour=23, minute=59, second=59)
+        base = Task.objects.filter(owner=user)
+        return {
+            'list_page': base.order_by('is_done', '-created_at')[:20],
+            'list_open_page': base.filter(is_done=False).order_by('is_done', '-created_at')[:20],
+            'list_done_page_deep': base.filter(is_done=True).order_by('is_done', '-created_at')[2000:2020],
+            'count_done': base.filter(is_done=True).order_by(),
+            'overdue': base.filter(is_done=False, due_at__lt=now).order_by(),
+            'due_today': base.filter(is_done=False, due_at__gte=now, due_at__lte=end_of_day).order_by(),
+        }
+
+    def _measure(self, user):
+        phase = {}
+        for name, qs in self._queries(user).items():
+            is_count = not qs.ordered
+            # .all() tạo queryset mới mỗi lần để không đo trúng result cache
+            run = (lambda qs=qs: qs.all().count()) if is_count else (lambda qs=qs: list(qs.all()))
+            run()  # warm-up
+            timings = []
+            for _ in range(self.options['repeat']):
+                start = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            phase[name] = {
+                'explain': qs.explain(),
+                'p50_ms': round(timings[len(timings) // 2], 3),
+                'max_ms': round(timings[-1], 3),
+            }
+        return phase
+
+    def _report(self):
+        before = self.results['phases'].get('before', {})
+        after = self.results['phases'].get('after', {})
+        for name in before:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f'  trước: {before[name]["p50_ms"]} ms (p50)')
+            self.stdout.write('    ' + before[name]['explain'].replace('\n', '\n    '))
+            self.stdout.write(f'  sau:   {after[name]["p50_ms"]} ms (p50)')
+            self.stdout.write('    ' + after[name]['explain'].replace('\n', '\n    '))
+
+        if self.options['json_path']:
+            with open(self.options['json_path'], 'w', encoding='utf-8') as fh:
+                json.dump(self.results, fh, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Đã ghi kết quả vào {self.options["json_path"]}'))
@@ -0,0 +1,51 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.models import Task
+from tasks.serializers import FastTaskSerializer, TaskSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'So sánh thời gian serialize một trang task: TaskSerializer và FastTaskSerializer (không cần database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        page_size, repeat = options['page_size'], options['repeat']
+        now = timezone.now()
+        owner = User(pk=1, username='bench', email='bench@example.com', date_joined=now)
+        tasks = [
+            Task(
+                pk=i, owner=owner, title=f'Công việc {i}', note='Ghi chú',
+                is_done=bool(i % 2), due_at=now + timedelta(days=i),
+                created_at=now, updated_at=now,
+            )
+            for i in range(page_size)
+        ]
+        rows = [{field: getattr(task, 'pk' if field == 'id' else field) for field in FastTaskSerializer.fields} for task in tasks]
+
+        cases = [
+            ('TaskSerializer (hiện tại)', lambda: TaskSerializer(tasks, many=True).data),
+            ('FastTaskSerializer, instance', lambda: FastTaskSerializer(tasks, many=True, context={'owner': owner}).data),
+            ('FastTaskSerializer, .values()', lambda: FastTaskSerializer(rows, many=True, context={'owner': owner}).data),
+            ('FastTaskSerializer, compact', lambda: FastTaskSerializer(rows, many=True, context={'owner': owner, 'compact': True}).data),
+        ]
+
+        baseline = None
+        self.stdout.write(f'{page_size} task/trang, {repeat} lần')
+        for label, run in cases:
+            run()  # warm-up
+            start = time.perf_counter()
+            for _ in range(repeat):
+                run()
+            per_page_us = (time.perf_counter() - start) / repeat * 1e6
+            baseline = baseline or per_page_us
+            self.stdout.write(f'  {label:<32} {per_page_us:9.1f} µs/trang  (x{baseline / per_page_us:.1f})')
@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from tasks.models import Task
+from tasks.testing import clear_caches
+
+User = get_user_model()
+
+MODES = [
+    ('db + FallbackStorage (mặc định)', 'django.contrib.sessions.backends.db',
+     'django.contrib.messages.storage.fallback.FallbackStorage'),
+    ('db + SessionStorage', 'django.contrib.sessions.backends.db',
+     'django.contrib.messages.storage.session.SessionStorage'),
+    ('cached_db + CookieStorage (LOW_WRITE)', 'django.contrib.sessions.backends.cached_db',
+     'django.contrib.messages.storage.cookie.CookieStorage'),
+    ('cache + CookieStorage', 'django.contrib.sessions.backends.cache',
+     'django.contrib.messages.storage.cookie.CookieStorage'),
+]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Đếm truy vấn (tổng, đọc/ghi django_session, ghi) của các thao tác web trên task '
+        'cộng request GET danh sách sau redirect, theo từng cách lưu session/message (dữ liệu được rollback)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=5, help='Số lần lặp mỗi thao tác')
+
+    def handle(self, *args, **options):
+        rounds = options['rounds']
+        self.stdout.write(f'Trung bình mỗi thao tác (POST/GET + GET danh sách sau redirect), {rounds} lần')
+        self.stdout.write(f"  {'':<38} {'':<8} {'truy vấn':>8} {'đọc sess':>9} {'ghi sess':>9} {'ghi':>5}")
+        for label, engine, storage in MODES:
+            with override_settings(SESSION_ENGINE=engine, MESSAGE_STORAGE=storage, ALLOWED_HOSTS=['testserver']):
+                for operation, counts in self.measure(rounds).items():
+                    self.stdout.write(
+                        f'  {label:<38} {operation:<8} {counts["queries"]:8.1f} {counts["session_reads"]:9.1f} '
+                        f'{counts["session_writes"]:9.1f} {counts["writes"]:5.1f}'
+                    )
+                    label = ''
+
+    def measure(self, rounds):
+        totals = {}
+        try:
+            with transaction.atomic():
+                clear_caches()
+                user = User.objects.create_user(username='bench_web_session', password=None)
+                tasks = Task.objects.bulk_create(Task(owner=user, title=f'Task {i}') for i in range(2 * rounds))
+                client = Client()
+                client.force_login(user)
+                client.get(reverse('tasks:list'))
+
+                for i in range(rounds):
+                    task, deleted = tasks[i], tasks[rounds + i]
+                    for operation, request in (
+                        ('tạo', lambda: client.post(reverse('tasks:create'), {'title': f'Mới {i}'})),
+                        ('sửa', lambda: client.post(reverse('tasks:update', args=[task.pk]), {'title': f'Sửa {i}'})),
+                        ('toggle', lambda: client.get(reverse('tasks:toggle', args=[task.pk]))),
+                        ('xoá', lambda: client.post(reverse('tasks:delete', args=[deleted.pk]))),
+                    ):
+                        counts = totals.setdefault(operation, dict.fromkeys(
+                            ('queries', 'session_reads', 'session_writes', 'writes'), 0))
+                        with CaptureQueriesContext(connection) as captured:
+                            response = request()
+                            assert response.status_code == 302, response.status_code
+                            client.get(response.url)
+                        for query in captured.captured_queries:
+                            sql = query['sql']
+                            write = sql.split(None, 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE')
+                            counts['queries'] += 1
+                            counts['writes'] += write
+                            if 'django_session' in sql:
+                                counts['session_writes' if write else 'session_reads'] += 1
+                raise _Rollback
+        except _Rollback:
+            pass
+        return {
+            operation: {key: value / rounds for key, value in counts.items()}
+            for operation, counts in totals.items()
+        }
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = 'Xoá refresh token (outstanding + blacklisted) đã hết hạn, theo lô'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Số token mỗi lô')
+        parser.add_argument('--sleep', type=float, default=0, help='Nghỉ (giây) giữa các lô')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        now = timezone.now()
+        outstanding_deleted = blacklisted_deleted = 0
+
+        while True:
+            # Mỗi lô một transaction ngắn, xoá theo primary key để không khoá lâu
+            with transaction.atomic():
+                pks = list(
+                    OutstandingToken.objects.filter(expires_at__lte=now)
+                    .order_by('pk')
+                    .values_list('pk', flat=True)[:batch_size]
+                )
+                if not pks:
+                    break
+                blacklisted_deleted += BlacklistedToken.objects.filter(token_id__in=pks).delete()[0]
+                outstanding_deleted += OutstandingToken.objects.filter(pk__in=pks).delete()[0]
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Đã xoá {outstanding_deleted} outstanding token và {blacklisted_deleted} blacklisted token'
+        ))
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tasks.models import TaskStats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Đếm lại bảng thống kê task (TaskStats) từ bảng Task, theo lô'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', help='Chỉ đếm lại cho user này (có thể lặp lại)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Số user mỗi lô')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options['usernames']:
+            user_ids = list(User.objects.filter(username__in=options['usernames']).values_list('pk', flat=True))
+        else:
+            user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+
+        written = 0
+        # Mỗi lô một transaction ngắn để không giữ khoá lâu
+        for start in range(0, len(user_ids), batch_size):
+            with transaction.atomic():
+                written += TaskStats.objects.rebuild(user_ids[start:start + batch_size], batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(f'Đã cập nhật thống kê cho {written} user'))
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+from todo_project.db import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY không chạy được bên trong transaction
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(fields=['owner', 'is_done', '-created_at'], name='task_owner_done_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_done', False)), fields=['owner', 'due_at'], name='task_owner_open_due_idx'),
+        ),
+    ]
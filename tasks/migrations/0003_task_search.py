@@ -0,0 +1,137 @@
+from django.db import migrations, transaction
+
+# Cột/bảng tìm kiếm nằm ngoài model nên Django không biết tới chúng; xem tasks/search.py.
+#
+# Lưu ý với SQLite: các migration sau này mà phải "remake" bảng tasks_task (đổi kiểu
+# cột, xoá cột, ...) sẽ làm mất trigger bên dưới, cần tạo lại trigger trong migration đó.
+
+# PostgreSQL: không dùng cột GENERATED ... STORED vì ADD COLUMN kiểu đó ghi lại toàn bộ
+# bảng dưới khoá ACCESS EXCLUSIVE. Thay vào đó: thêm cột nullable (chỉ sửa catalog),
+# trigger điền cột cho mọi lần ghi mới, backfill các dòng cũ theo lô (mỗi lô một
+# transaction), rồi build GIN index bằng CREATE INDEX CONCURRENTLY.
+POSTGRES_FORWARDS = [
+    "ALTER TABLE tasks_task ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    """
+    CREATE OR REPLACE FUNCTION tasks_task_search_vector(title text, note text) RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+               setweight(to_tsvector('simple', coalesce(note, '')), 'B')
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+    """
+    CREATE OR REPLACE FUNCTION tasks_task_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := tasks_task_search_vector(NEW.title, NEW.note);
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE TRIGGER tasks_task_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF title, note ON tasks_task
+        FOR EACH ROW EXECUTE FUNCTION tasks_task_search_vector_update()
+    """,
+]
+
+POSTGRES_BACKFILL = """
+    UPDATE tasks_task SET search_vector = tasks_task_search_vector(title, note)
+    WHERE id > %s AND id <= %s AND search_vector IS NULL
+"""
+BACKFILL_BATCH_SIZE = 5000
+
+POSTGRES_INDEX = "CREATE INDEX CONCURRENTLY IF NOT EXISTS task_search_vector_idx ON tasks_task USING GIN (search_vector)"
+
+POSTGRES_BACKWARDS = [
+    "DROP INDEX CONCURRENTLY IF EXISTS task_search_vector_idx",
+    "DROP TRIGGER IF EXISTS tasks_task_search_vector_trigger ON tasks_task",
+    "DROP FUNCTION IF EXISTS tasks_task_search_vector_update()",
+    "DROP FUNCTION IF EXISTS tasks_task_search_vector(text, text)",
+    "ALTER TABLE tasks_task DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARDS = [
+    """
+    CREATE VIRTUAL TABLE tasks_task_fts USING fts5(
+        title, note,
+        content='tasks_task', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER tasks_task_fts_ai AFTER INSERT ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts(rowid, title, note) VALUES (new.id, new.title, new.note);
+    END
+    """,
+    """
+    CREATE TRIGGER tasks_task_fts_ad AFTER DELETE ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts(tasks_task_fts, rowid, title, note) VALUES ('delete', old.id, old.title, old.note);
+    END
+    """,
+    """
+    CREATE TRIGGER tasks_task_fts_au AFTER UPDATE OF title, note ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts(tasks_task_fts, rowid, title, note) VALUES ('delete', old.id, old.title, old.note);
+        INSERT INTO tasks_task_fts(rowid, title, note) VALUES (new.id, new.title, new.note);
+    END
+    """,
+    "INSERT INTO tasks_task_fts(tasks_task_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARDS = [
+    "DROP TRIGGER IF EXISTS tasks_task_fts_ai",
+    "DROP TRIGGER IF EXISTS tasks_task_fts_ad",
+    "DROP TRIGGER IF EXISTS tasks_task_fts_au",
+    "DROP TABLE IF EXISTS tasks_task_fts",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def _backfill_postgres(schema_editor):
+    # Migration không atomic: mỗi UPDATE tự commit, khoá dòng chỉ giữ trong một lô.
+    # Dòng ghi sau khi có trigger đã có search_vector nên chỉ cần đi tới max(id) hiện tại.
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT max(id) FROM tasks_task")
+        max_id = cursor.fetchone()[0] or 0
+        for start in range(0, max_id, BACKFILL_BATCH_SIZE):
+            cursor.execute(POSTGRES_BACKFILL, [start, start + BACKFILL_BATCH_SIZE])
+
+
+def forwards(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARDS)
+        _backfill_postgres(schema_editor)
+        schema_editor.execute(POSTGRES_INDEX)
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            has_fts5 = cursor.fetchone()[0]
+        # Không có FTS5 thì tasks.search tự quay về icontains
+        if has_fts5:
+            with transaction.atomic(using=connection.alias):
+                _run(schema_editor, SQLITE_FORWARDS)
+
+
+def backwards(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_BACKWARDS)
+    elif connection.vendor == 'sqlite':
+        with transaction.atomic(using=connection.alias):
+            _run(schema_editor, SQLITE_BACKWARDS)
+
+
+class Migration(migrations.Migration):
+
+    # Backfill theo lô và CREATE INDEX CONCURRENTLY cần chạy ngoài transaction
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0002_task_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -1,5 +1,10 @@
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.db import models, transaction
+from django.db.models import Count, F, Q
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from .cache import bump_generation
 
 User = get_user_model()
 
@@ -14,6 +19,180 @@ class Task(models.Model):
 
     class Meta:
         ordering = ["is_done", "-created_at"]
+        indexes = [
+            # Danh sách task của một user, lọc theo trạng thái, sắp theo ordering mặc định
+            models.Index(
+                fields=["owner", "is_done", "-created_at"],
+                name="task_owner_done_created_idx",
+            ),
+            # Task chưa xong theo hạn (quá hạn / đến hạn hôm nay)
+            models.Index(
+                fields=["owner", "due_at"],
+                name="task_owner_open_due_idx",
+                condition=models.Q(is_done=False),
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        update_fields = kwargs.get("update_fields")
+        using = kwargs.get("using")
+        with transaction.atomic(using=using):
+            previous = None
+            if not created and (update_fields is None or {"is_done", "owner", "owner_id"} & set(update_fields)):
+                previous = self._lock_row(using, "owner_id", "is_done")
+            super().save(*args, **kwargs)
+            if created:
+                TaskStats.objects.record_change(self.owner_id, total=1, done=int(self.is_done))
+            elif previous is None and update_fields is not None:
+                TaskStats.objects.record_change(self.owner_id)
+            elif previous is None:
+                # Dòng chưa có trong DB trước lần save này (instance tự đặt pk)
+                TaskStats.objects.rebuild([self.owner_id])
+            elif previous[0] != self.owner_id:
+                TaskStats.objects.rebuild([previous[0], self.owner_id])
+            else:
+                TaskStats.objects.record_change(self.owner_id, done=int(self.is_done) - int(previous[1]))
+
+    save.alters_data = True
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get("using")
+        with transaction.atomic(using=using):
+            previous = self._lock_row(using, "is_done")
+            if previous is None:
+                # Request khác đã xoá task này: không trừ thống kê lần thứ hai
+                return 0, {}
+            result = super().delete(*args, **kwargs)
+            TaskStats.objects.record_change(self.owner_id, total=-1, done=-int(previous[0]))
+        return result
+
+    delete.alters_data = True
+
+    def _lock_row(self, using, *fields):
+        """
+        Giá trị ``fields`` đang có trong DB, khoá dòng tới hết transaction. Delta
+        TaskStats tính từ đây chứ không từ giá trị instance đã nạp: hai request
+        cùng toggle/xoá một task (bấm hai lần) vẫn cho bộ đếm đúng.
+        """
+        return Task.objects.using(using).select_for_update().filter(pk=self.pk).values_list(*fields).first()
+
+
+class TaskStatsManager(models.Manager):
+    def record_change(self, user_id, total=0, done=0):
+        """
+        Cộng delta vào bộ đếm của user (một câu UPDATE) và huỷ snapshot
+        quá hạn/đến hạn. Nên được gọi trong cùng transaction với thay đổi task.
+        """
+        updated = self.filter(pk=user_id).update(
+            total=F("total") + total,
+            done=F("done") + done,
+            snapshot_expires_at=None,
+            version=F("version") + 1,
+            changed_at=timezone.now(),
+        )
+        if not updated:
+            # Chưa có dòng thống kê: đếm lại từ bảng task (đã gồm thay đổi hiện tại)
+            self.rebuild([user_id])
+        else:
+            bump_generation(user_id)
+
+    def rebuild(self, user_ids=None, batch_size=1000):
+        """
+        Đếm lại total/done từ bảng Task cho ``user_ids`` (mặc định: mọi user)
+        và upsert theo lô. Trả về số dòng đã ghi.
+        """
+        if user_ids is None:
+            user_ids = User.objects.order_by("pk").values_list("pk", flat=True).iterator(chunk_size=batch_size)
+        written = 0
+        batch = []
+        for user_id in user_ids:
+            batch.append(user_id)
+            if len(batch) >= batch_size:
+                written += self._rebuild_batch(batch)
+                batch = []
+        if batch:
+            written += self._rebuild_batch(batch)
+        return written
+
+    def _rebuild_batch(self, user_ids):
+        counts = {
+            row["owner_id"]: row
+            for row in Task.objects.filter(owner_id__in=user_ids)
+            .order_by()
+            .values("owner_id")
+            .annotate(total=Count("id"), done=Count("id", filter=Q(is_done=True)))
+        }
+        rows = [
+            TaskStats(
+                user_id=user_id,
+                total=counts.get(user_id, {}).get("total", 0),
+                done=counts.get(user_id, {}).get("done", 0),
+                snapshot_expires_at=None,
+            )
+            for user_id in dict.fromkeys(user_ids)
+        ]
+        self.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=["total", "done", "snapshot_expires_at"],
+        )
+        # bulk_create không cộng được F(); tăng version riêng để snapshot cũ bị bỏ qua
+        self.filter(pk__in=user_ids).update(version=F("version") + 1, changed_at=timezone.now())
+        for user_id in user_ids:
+            bump_generation(user_id)
+        return len(rows)
+
+    def version_for(self, user_id):
+        """(version, changed_at) của dữ liệu task của user, dùng làm validator cho HTTP cache."""
+        row = self.filter(pk=user_id).values_list("version", "changed_at").first()
+        if row is None:
+            self.rebuild([user_id])
+            row = self.filter(pk=user_id).values_list("version", "changed_at").get()
+        return row
+
+    async def aversion_for(self, user_id):
+        row = await self.filter(pk=user_id).values_list("version", "changed_at").afirst()
+        if row is None:
+            await sync_to_async(self.rebuild)([user_id])
+            row = await self.filter(pk=user_id).values_list("version", "changed_at").aget()
+        return row
+
+
+class TaskStats(models.Model):
+    """
+    Bộ đếm task theo user, được cập nhật cùng transaction với mỗi lần
+    tạo/sửa/toggle/xoá task để ``task_stats`` chỉ cần một lần tra theo khoá chính.
+
+    ``overdue``/``due_today`` phụ thuộc thời gian nên được lưu dạng snapshot,
+    có hiệu lực tới ``snapshot_expires_at`` (lần tới một task chuyển trạng thái
+    hạn, hoặc hết ngày); ``version`` tăng sau mỗi thay đổi để snapshot tính
+    dở dang không ghi đè số liệu mới hơn.
+
+    ``version``/``changed_at`` cũng là validator (ETag/Last-Modified) cho các
+    response đọc task của user, xem tasks/conditional.py.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="task_stats")
+    total = models.IntegerField(default=0)
+    done = models.IntegerField(default=0)
+    overdue = models.IntegerField(default=0)
+    due_today = models.IntegerField(default=0)
+    snapshot_expires_at = models.DateTimeField(null=True, blank=True)
+    version = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField(null=True, blank=True)
+
+    objects = TaskStatsManager()
+
+    class Meta:
+        verbose_name_plural = "task stats"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.done}/{self.total}"
+
+    @property
+    def pending(self):
+        return self.total - self.done
@@ -0,0 +1,115 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def is_cursor_request(params):
+    """``?pagination=cursor`` hoặc có ``?cursor=``."""
+    return params.get('pagination') == 'cursor' or 'cursor' in params
+
+
+def reject_search_with_cursor(params):
+    """
+    Kết quả tìm kiếm được xếp theo độ liên quan, còn cursor đi theo khoá
+    (is_done, created_at, id): ghép hai thứ sẽ âm thầm bỏ thứ hạng, nên báo 400.
+    """
+    if is_cursor_request(params) and (params.get('search') or params.get('q')):
+        raise ValidationError({'search': [
+            'Không dùng được tìm kiếm cùng pagination=cursor; hãy dùng phân trang theo số trang (?page=).'
+        ]})
+
+
+class TaskCursorPagination(BasePagination):
+    """
+    Keyset pagination cho Task theo khoá (is_done, created_at, id).
+
+    Khác với ``rest_framework.pagination.CursorPagination`` (chỉ dùng trường
+    ordering đầu tiên làm vị trí), cursor ở đây mã hoá đủ cả ba cột nên mỗi
+    trang là một range scan trên index (owner, is_done, -created_at), không có
+    COUNT(*) và không có OFFSET. Cursor ổn định khi có task mới được thêm vào.
+    Chỉ hỗ trợ đi tiếp (next), phù hợp với kiểu cuộn vô hạn trên mobile.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = ('is_done', '-created_at', '-id')
+    invalid_cursor_message = 'Cursor không hợp lệ'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, page_size = self._page_queryset(queryset, request)
+        return self._set_page(list(queryset), page_size)
+
+    async def apaginate_queryset(self, queryset, request):
+        """Bản async (request Django thường, không phải request DRF), xem tasks/async_api_views.py."""
+        queryset, page_size = self._page_queryset(queryset, request)
+        return self._set_page([row async for row in queryset], page_size)
+
+    def _page_queryset(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        encoded = request.GET.get(self.cursor_query_param)
+        if encoded:
+            is_done, created_at, pk = self.decode_cursor(encoded)
+            queryset = queryset.filter(
+                Q(is_done__gt=is_done)
+                | Q(is_done=is_done, created_at__lt=created_at)
+                | Q(is_done=is_done, created_at=created_at, id__lt=pk)
+            )
+
+        # Lấy dư một dòng để biết còn trang sau hay không
+        return queryset[:page_size + 1], page_size
+
+    def _set_page(self, rows, page_size):
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.GET[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ])
+
+    def encode_cursor(self, task):
+        row = task if isinstance(task, dict) else task.__dict__
+        position = [int(row['is_done']), row['created_at'].isoformat(), row['id']]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, encoded):
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            is_done, created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            created_at = parse_datetime(created_at)
+            if created_at is None:
+                raise ValueError
+            return bool(is_done), created_at, int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
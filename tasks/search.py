@@ -0,0 +1,85 @@
+"""
+Tìm kiếm full-text cho Task.
+
+- PostgreSQL: cột ``search_vector`` (tsvector, được trigger cập nhật khi ghi
+  title/note) + GIN index, xếp hạng bằng ``ts_rank``.
+- SQLite: bảng ảo FTS5 ``tasks_task_fts`` (external content) được đồng bộ bằng
+  trigger, xếp hạng bằng ``bm25``.
+- Backend khác (hoặc ``TASK_SEARCH_BACKEND = 'icontains'``): quay về
+  ``title__icontains | note__icontains`` như trước.
+
+Cả hai bảng/cột đều do migration 0003_task_search tạo ra.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'tasks_task_fts'
+MAX_TERMS = 8
+
+_TERM_RE = re.compile(r'\w+')
+_backend_cache = {}
+
+
+def search_terms(query):
+    return _TERM_RE.findall(query)[:MAX_TERMS]
+
+
+def get_backend(using='default'):
+    """Backend tìm kiếm cho connection ``using``: 'postgres', 'sqlite' hoặc 'icontains'."""
+    backend = getattr(settings, 'TASK_SEARCH_BACKEND', 'auto')
+    if backend != 'auto':
+        return backend
+    if using not in _backend_cache:
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            _backend_cache[using] = 'postgres'
+        elif connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+            _backend_cache[using] = 'sqlite'
+        else:
+            _backend_cache[using] = 'icontains'
+    return _backend_cache[using]
+
+
+def search_tasks(queryset, query):
+    """
+    Lọc ``queryset`` theo ``query``. Với backend full-text, queryset được
+    annotate ``search_rank`` (càng lớn càng liên quan) và sắp xếp theo đó.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+
+    terms = search_terms(query)
+    backend = get_backend(queryset.db) if terms else 'icontains'
+
+    if backend == 'postgres':
+        # Mỗi từ khoá khớp theo tiền tố, các từ khoá nối bằng AND
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        column = f'"{queryset.model._meta.db_table}"."search_vector"'
+        queryset = queryset.filter(
+            RawSQL(f"{column} @@ to_tsquery('simple', %s)", [tsquery], output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(f"ts_rank({column}, to_tsquery('simple', %s))", [tsquery], output_field=FloatField())
+        )
+    elif backend == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        table = queryset.model._meta.db_table
+        queryset = queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        ).annotate(
+            # bm25 trả về số âm, càng nhỏ càng liên quan -> đổi dấu
+            search_rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = "{table}"."id"',
+                [match],
+                output_field=FloatField(),
+            )
+        )
+    else:
+        return queryset.filter(Q(title__icontains=query) | Q(note__icontains=query))
+
+    return queryset.order_by('-search_rank', 'is_done', '-created_at')
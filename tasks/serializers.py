@@ -1,5 +1,8 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from .models import Task
 
 User = get_user_model()
@@ -13,6 +16,15 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'date_joined']
 
 
+class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """JWT login trả kèm thông tin user, dùng lại user đã xác thực khi kiểm tra mật khẩu"""
+    
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        data['user'] = UserSerializer(self.user).data
+        return data
+
+
 class TaskSerializer(serializers.ModelSerializer):
     """Serializer cho Task model"""
     owner = UserSerializer(read_only=True)
@@ -28,6 +40,76 @@ class TaskSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class FastTaskSerializer:
+    """
+    Serializer viết tay cho đường đọc nóng (list/detail task).
+
+    Cho ra cùng JSON với TaskSerializer nhưng không đi qua field introspection
+    của DRF. Nhận model instance hoặc dict (từ ``.values()``). Owner lấy từ
+    ``context['owner']`` (request.user — mọi task trong list đều thuộc user
+    này) nên không cần join hay tra bảng user cho từng task; với
+    ``context['compact']`` owner chỉ còn là id.
+    """
+    fields = ('id', 'title', 'note', 'is_done', 'due_at', 'created_at', 'updated_at')
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @property
+    def data(self):
+        compact = self.context.get('compact', False)
+        owner = self.context.get('owner')
+        owner_data = None
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        if owner is not None:
+            owner_data = owner.pk if compact else _user_to_representation(owner, tz)
+
+        if self.many:
+            return [self._to_representation(item, owner_data, compact, tz) for item in self.instance]
+        return self._to_representation(self.instance, owner_data, compact, tz)
+
+    def _to_representation(self, task, owner_data, compact, tz):
+        row = task if isinstance(task, dict) else task.__dict__
+        if owner_data is None:
+            owner_data = row['owner_id'] if compact else _user_to_representation(task.owner, tz)
+        return {
+            'id': row['id'],
+            'title': row['title'],
+            'note': row['note'],
+            'is_done': row['is_done'],
+            'due_at': _datetime_to_representation(row['due_at'], tz),
+            'created_at': _datetime_to_representation(row['created_at'], tz),
+            'updated_at': _datetime_to_representation(row['updated_at'], tz),
+            'owner': owner_data,
+        }
+
+
+def _user_to_representation(user, tz):
+    """Giống UserSerializer(user).data"""
+    return {
+        'id': user.pk,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'date_joined': _datetime_to_representation(user.date_joined, tz),
+    }
+
+
+def _datetime_to_representation(value, tz):
+    """Giống serializers.DateTimeField.to_representation (ISO 8601, múi giờ hiện tại)."""
+    if not value:
+        return None
+    if tz is not None and value.tzinfo is not None:
+        value = value.astimezone(tz)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
 class TaskCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer cho việc tạo và cập nhật Task (không bao gồm owner info)"""
     
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_cached_user
+from .models import TaskStats
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    """User thay đổi (mật khẩu, is_active, ...) thì bỏ bản cache dùng cho CachedJWTAuthentication"""
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def touch_task_stats(sender, instance, created=False, update_fields=None, **kwargs):
+    """
+    Response task có kèm thông tin owner (UserSerializer): profile đổi thì tăng
+    ``TaskStats.version`` (ETag/Last-Modified mới) và bỏ cache response.
+    """
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    TaskStats.objects.record_change(instance.pk)
@@ -0,0 +1,100 @@
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import Task, TaskStats
+
+
+def end_of_today(now):
+    """Nửa đêm sắp tới theo TIME_ZONE hiện tại."""
+    tomorrow = timezone.localtime(now).date() + timedelta(days=1)
+    return timezone.make_aware(datetime.combine(tomorrow, time.min))
+
+
+def get_task_stats(user, now=None):
+    """
+    Thống kê task của ``user``.
+
+    Với ``TASK_STATS_BACKEND = 'counter'`` (mặc định) đọc từ bảng TaskStats:
+    thường chỉ là một lần tra theo khoá chính; snapshot quá hạn/đến hạn được
+    tính lại (một truy vấn trên index task chưa xong) khi đã hết hiệu lực.
+    Với ``'aggregate'`` dùng một truy vấn aggregate có điều kiện trên bảng Task.
+    """
+    now = now or timezone.now()
+    if getattr(settings, 'TASK_STATS_BACKEND', 'counter') == 'aggregate':
+        return _aggregate_stats(user, now)
+
+    stats = TaskStats.objects.filter(pk=user.pk).first()
+    if stats is None:
+        TaskStats.objects.rebuild([user.pk])
+        stats = TaskStats.objects.get(pk=user.pk)
+    if stats.snapshot_expires_at is None or stats.snapshot_expires_at <= now:
+        _refresh_snapshot(stats, now)
+    return _as_dict(stats)
+
+
+async def aget_task_stats(user, now=None):
+    """
+    Bản async của ``get_task_stats``: đường thường gặp (tra TaskStats theo khoá
+    chính) dùng ORM async; rebuild/tính lại snapshot (hiếm) chạy trong thread.
+    """
+    now = now or timezone.now()
+    if getattr(settings, 'TASK_STATS_BACKEND', 'counter') == 'aggregate':
+        return await sync_to_async(_aggregate_stats)(user, now)
+
+    stats = await TaskStats.objects.filter(pk=user.pk).afirst()
+    if stats is None:
+        await sync_to_async(TaskStats.objects.rebuild)([user.pk])
+        stats = await TaskStats.objects.aget(pk=user.pk)
+    if stats.snapshot_expires_at is None or stats.snapshot_expires_at <= now:
+        await sync_to_async(_refresh_snapshot)(stats, now)
+    return _as_dict(stats)
+
+
+def _as_dict(stats):
+    return {
+        'total': stats.total,
+        'completed': stats.done,
+        'pending': stats.pending,
+        'overdue': stats.overdue,
+        'due_today': stats.due_today,
+    }
+
+
+def _refresh_snapshot(stats, now):
+    eod = end_of_today(now)
+    snapshot = Task.objects.filter(owner_id=stats.user_id, is_done=False, due_at__lt=eod).aggregate(
+        overdue=Count('id', filter=Q(due_at__lt=now)),
+        due_today=Count('id', filter=Q(due_at__gte=now)),
+        next_due=Min('due_at', filter=Q(due_at__gt=now)),
+    )
+    stats.overdue = snapshot['overdue']
+    stats.due_today = snapshot['due_today']
+    # Snapshot đúng cho tới khi task kế tiếp quá hạn hoặc sang ngày mới
+    stats.snapshot_expires_at = min(snapshot['next_due'] or eod, eod)
+    # Chỉ ghi nếu không có thay đổi task nào chen vào giữa chừng
+    TaskStats.objects.filter(pk=stats.pk, version=stats.version).update(
+        overdue=stats.overdue,
+        due_today=stats.due_today,
+        snapshot_expires_at=stats.snapshot_expires_at,
+    )
+
+
+def _aggregate_stats(user, now):
+    open_tasks = Q(is_done=False)
+    result = Task.objects.filter(owner=user).order_by().aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(is_done=True)),
+        overdue=Count('id', filter=open_tasks & Q(due_at__lt=now)),
+        due_today=Count('id', filter=open_tasks & Q(due_at__gte=now, due_at__lt=end_of_today(now))),
+    )
+    return {
+        'total': result['total'],
+        'completed': result['completed'],
+        'pending': result['total'] - result['completed'],
+        'overdue': result['overdue'],
+        'due_today': result['due_today'],
+    }
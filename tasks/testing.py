@@ -0,0 +1,92 @@
+"""
+Tiện ích cho test hiệu năng: chốt số truy vấn của mỗi endpoint, và (tuỳ chọn)
+so sánh thời gian chạy với baseline.
+
+``PerfTestMixin.assertRequestQueries(fn, queries)`` chạy ``fn`` trong
+``assertNumQueries(queries)``: số truy vấn phải khớp chính xác, tăng (N+1,
+``exists()`` thừa...) hay giảm đều làm test fail để con số được cập nhật có
+chủ đích.
+
+Thời gian chỉ được đo khi bật ``PERF_TIMING`` (biến môi trường), vì nó phụ
+thuộc máy chạy:
+
+- ``PERF_TIMING=record``: đo trung vị ``PERF_REPEAT`` lần chạy của mỗi lời
+  gọi và ghi vào ``PERF_BASELINE_FILE`` (chạy không ``--parallel``, trên máy
+  sẽ dùng để kiểm tra, rồi commit file nếu muốn);
+- ``PERF_TIMING=check``: đo như trên và fail nếu chậm hơn baseline quá
+  ``PERF_TOLERANCE`` (tỉ lệ) cộng ``PERF_SLACK_MS``, hoặc nếu chưa có baseline.
+
+Mặc định (``off``) không đo gì, không ghi file nào.
+"""
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def clear_caches():
+    """Xoá mọi cache alias để đo đường chạy lạnh (cache miss)."""
+    for cache in caches.all():
+        cache.clear()
+
+
+def load_baselines(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, name, median_ms):
+    # Đọc lại trước khi ghi: nhiều TestCase cùng ghi vào một file
+    baselines = load_baselines(path)
+    baselines[name] = round(median_ms, 3)
+    Path(path).write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n', encoding='utf-8')
+
+
+class PerfTestMixin:
+    """Mixin cho django.test.TestCase, xem docstring của module."""
+
+    def assertRequestQueries(self, fn, queries, setup=clear_caches):
+        """
+        ``fn`` trả về response; ``setup`` chạy (không tính giờ) trước mỗi lần
+        gọi, mặc định xoá cache để đi đường cache miss.
+        """
+        setup()
+        with self.assertNumQueries(queries):
+            response = fn()
+        self.assertLess(response.status_code, 400, getattr(response, 'content', b'')[:500])
+
+        mode = getattr(settings, 'PERF_TIMING', 'off')
+        if mode in ('record', 'check'):
+            self._check_timing(mode, fn, setup)
+        return response
+
+    def _check_timing(self, mode, fn, setup):
+        # Tên baseline: id của test, thêm số thứ tự nếu một test đo nhiều lần
+        self._perf_calls = getattr(self, '_perf_calls', 0) + 1
+        name = self.id() if self._perf_calls == 1 else f'{self.id()}#{self._perf_calls}'
+
+        timings = []
+        for _ in range(getattr(settings, 'PERF_REPEAT', 7)):
+            setup()
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        median_ms = statistics.median(timings)
+
+        path = settings.PERF_BASELINE_FILE
+        if mode == 'record':
+            save_baseline(path, name, median_ms)
+            return
+        baseline = load_baselines(path).get(name)
+        self.assertIsNotNone(baseline, f'{name}: chưa có baseline trong {path}, chạy với PERF_TIMING=record trước')
+        limit = baseline * (1 + getattr(settings, 'PERF_TOLERANCE', 0.5)) + getattr(settings, 'PERF_SLACK_MS', 2)
+        self.assertLessEqual(
+            median_ms, limit,
+            f'{name}: {median_ms:.2f} ms, chậm hơn baseline {baseline:.2f} ms (giới hạn {limit:.2f} ms)',
+        )
@@ -1,3 +1,588 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .api_views import TaskListCreateView, task_stats
+from .authentication import user_cache_key
+from .batch import TaskBatch
+from .models import Task, TaskStats
+from .stats import get_task_stats
+from .testing import PerfTestMixin, clear_caches
+from .tokens import SingleUseRefreshToken
+
+User = get_user_model()
+
+TASKS_PER_USER = 150
+
+
+def seed_tasks(user, count=TASKS_PER_USER):
+    """Dữ liệu gần thực tế: 1/3 đã xong, một phần có hạn (quá hạn, hôm nay, sắp tới)."""
+    now = timezone.now()
+    due = [None, None, now - timedelta(days=2), now + timedelta(hours=1), now + timedelta(days=7)]
+    Task.objects.bulk_create(
+        Task(
+            owner=user,
+            title=f'Task {i} học Django',
+            note=f'Ghi chú cho task {i}' if i % 2 else '',
+            is_done=i % 3 == 0,
+            due_at=due[i % len(due)],
+        )
+        for i in range(count)
+    )
+
+
+class TaskViewPerformanceTests(PerfTestMixin, TestCase):
+    """
+    Số truy vấn của mỗi endpoint task là hằng số, không phụ thuộc số task
+    (user có 150 task, trang 20 task: một truy vấn cho mỗi task sẽ làm test fail).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('perf', 'perf@example.com', 'testpassword123')
+        other = User.objects.create_user('other', 'other@example.com', 'testpassword123')
+        seed_tasks(cls.user)
+        seed_tasks(other, 30)
+        TaskStats.objects.rebuild()
+        cls.task = Task.objects.filter(owner=cls.user).order_by('pk').first()
+
+    def setUp(self):
+        clear_caches()
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    def test_web_task_list(self):
+        self.client.force_login(self.user)
+        response = self.assertRequestQueries(lambda: self.client.get(reverse('tasks:list')), queries=5)
+        self.assertEqual(len(response.context['tasks']), 10)
+
+    def test_api_task_list(self):
+        url = reverse('tasks_api:task_list_create')
+        response = self.assertRequestQueries(lambda: self.client.get(url, **self.auth), queries=4)
+        self.assertEqual(len(response.json()['results']), 20)
+
+    def test_api_task_list_cursor(self):
+        url = reverse('tasks_api:task_list_create') + '?pagination=cursor'
+        self.assertRequestQueries(lambda: self.client.get(url, **self.auth), queries=3)
+
+    def test_api_task_list_not_modified(self):
+        url = reverse('tasks_api:task_list_create')
+        etag = self.client.get(url, **self.auth)['ETag']
+        response = self.assertRequestQueries(
+            lambda: self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth), queries=2,
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_api_task_create(self):
+        url = reverse('tasks_api:task_list_create')
+        data = {'title': 'Task mới', 'note': 'Ghi chú', 'is_done': False}
+        self.assertRequestQueries(
+            lambda: self.client.post(url, data, content_type='application/json', **self.auth), queries=5,
+        )
+
+    def test_api_task_detail(self):
+        url = reverse('tasks_api:task_detail', args=[self.task.pk])
+        self.assertRequestQueries(lambda: self.client.get(url, **self.auth), queries=3)
+
+    def test_api_task_update(self):
+        url = reverse('tasks_api:task_detail', args=[self.task.pk])
+        self.assertRequestQueries(
+            lambda: self.client.patch(url, {'title': 'Đã sửa'}, content_type='application/json', **self.auth),
+            queries=7,
+        )
+
+    def test_api_task_toggle(self):
+        url = reverse('tasks_api:task_toggle', args=[self.task.pk])
+        # Gồm SELECT ... FOR UPDATE đọc is_done hiện tại để tính delta TaskStats
+        self.assertRequestQueries(lambda: self.client.patch(url, **self.auth), queries=7)
+
+    def test_api_task_stats(self):
+        url = reverse('tasks_api:task_stats')
+        get_task_stats(self.user)  # snapshot quá hạn/đến hạn còn hiệu lực: chỉ tra TaskStats
+        response = self.assertRequestQueries(lambda: self.client.get(url, **self.auth), queries=2)
+        self.assertEqual(response.json()['total'], TASKS_PER_USER)
+
+    def test_api_task_stats_stale_snapshot(self):
+        url = reverse('tasks_api:task_stats')
+
+        def expire_snapshot():
+            clear_caches()
+            TaskStats.objects.update(snapshot_expires_at=None)
+        self.assertRequestQueries(
+            lambda: self.client.get(url, **self.auth), queries=4, setup=expire_snapshot,
+        )
+
+
+@override_settings(JWT_USER_CACHE_TIMEOUT=60, TASK_RESPONSE_CACHE_TIMEOUT=0)
+class CachedJWTAuthenticationTests(TestCase):
+    """User đã xác thực được cache: mỗi request đọc task bớt một truy vấn bảng user."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('jwtcache', 'jwtcache@example.com', 'testpassword123')
+        seed_tasks(cls.user, 30)
+        TaskStats.objects.rebuild([cls.user.pk])
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    def count_queries(self, url):
+        self.client.get(url, **self.auth)  # lần đầu nạp user vào cache
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def test_one_query_less_than_jwt_authentication(self):
+        for view, url in (
+            (TaskListCreateView, reverse('tasks_api:task_list_create')),
+            (task_stats.cls, reverse('tasks_api:task_stats')),
+        ):
+            with self.subTest(url=url):
+                cached = self.count_queries(url)
+                with mock.patch.object(view, 'authentication_classes', [JWTAuthentication]):
+                    plain = self.count_queries(url)
+                self.assertEqual(plain - cached, 1)
+
+    def test_deactivated_user_is_rejected(self):
+        url = reverse('tasks_api:task_stats')
+        self.assertEqual(self.client.get(url, **self.auth).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(url, **self.auth).status_code, 401)
+
+    def test_password_change_evicts_cached_user(self):
+        url = reverse('tasks_api:task_stats')
+        self.client.get(url, **self.auth)
+        self.assertIsNotNone(cache.get(user_cache_key(self.user.pk)))
+        self.user.set_password('matkhaumoi123')
+        self.user.save()
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        self.client.get(url, **self.auth)
+        self.assertEqual(cache.get(user_cache_key(self.user.pk)).password, self.user.password)
+
+
+class TaskSearchTests(TestCase):
+    """Tìm kiếm qua API (FTS5 trên SQLite, tsvector trên PostgreSQL), index được đồng bộ khi ghi."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('search', 'search@example.com', 'testpassword123')
+        other = User.objects.create_user('other', 'other@example.com', 'testpassword123')
+        cls.orm = Task.objects.create(owner=cls.user, title='Tối ưu Django ORM')
+        cls.signals = Task.objects.create(owner=cls.user, title='Đọc tài liệu', note='django signals và cache')
+        Task.objects.create(owner=cls.user, title='Đi chợ')
+        Task.objects.create(owner=other, title='Django của người khác')
+
+    def setUp(self):
+        clear_caches()
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    def search(self, query):
+        response = self.client.get(reverse('tasks_api:task_list_create'), {'search': query}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return {task['id'] for task in response.json()['results']}
+
+    def test_matches_title_and_note_by_prefix(self):
+        self.assertEqual(self.search('djan'), {self.orm.pk, self.signals.pk})
+        self.assertEqual(self.search('DJANGO orm'), {self.orm.pk})
+        self.assertEqual(self.search('không có'), set())
+
+    def test_index_follows_writes(self):
+        self.orm.title = 'Viết test'
+        self.orm.save()
+        self.assertEqual(self.search('django'), {self.signals.pk})
+        self.assertEqual(self.search('viết'), {self.orm.pk})
+        self.signals.delete()
+        self.assertEqual(self.search('django'), set())
+
+
+class TaskCursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cursor', 'cursor@example.com', 'testpassword123')
+        seed_tasks(cls.user, 23)
+        # Nhiều task cùng created_at: thứ tự phải dựa vào id để không lặp/bỏ sót
+        Task.objects.filter(owner=cls.user, pk__in=Task.objects.filter(owner=cls.user).values('pk')[:10]).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    def walk(self, url):
+        ids = []
+        while url:
+            body = self.client.get(url, **self.auth).json()
+            ids += [task['id'] for task in body['results']]
+            url = body['next']
+        return ids
+
+    def test_visits_every_task_once_in_order(self):
+        expected = list(
+            Task.objects.filter(owner=self.user).order_by('is_done', '-created_at', '-id').values_list('pk', flat=True)
+        )
+        url = reverse('tasks_api:task_list_create') + '?pagination=cursor&page_size=4'
+        self.assertEqual(self.walk(url), expected)
+
+    def test_new_task_does_not_shift_pages(self):
+        url = reverse('tasks_api:task_list_create') + '?pagination=cursor&page_size=5'
+        first = self.client.get(url, **self.auth).json()
+        Task.objects.create(owner=self.user, title='Task mới nhất')
+        rest = self.walk(first['next'])
+        seen = [task['id'] for task in first['results']] + rest
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), 23)
+
+    def test_invalid_cursor(self):
+        url = reverse('tasks_api:task_list_create') + '?cursor=không-hợp-lệ'
+        self.assertEqual(self.client.get(url, **self.auth).status_code, 404)
+
+    def test_search_with_cursor_is_rejected(self):
+        for name in ('tasks_api:task_list_create', 'tasks_api:task_list_create_async'):
+            for query in ('?pagination=cursor&search=Task', '?cursor=abc&q=Task'):
+                with self.subTest(name=name, query=query):
+                    response = self.client.get(reverse(name) + query, **self.auth)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('search', response.json())
+
+
+class TaskResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cache', 'cache@example.com', 'testpassword123', first_name='Old')
+        seed_tasks(cls.user, 5)
+        TaskStats.objects.rebuild()
+
+    def setUp(self):
+        clear_caches()
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        self.url = reverse('tasks_api:task_list_create')
+
+    def test_task_write_invalidates(self):
+        self.assertEqual(self.client.get(self.url, **self.auth)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.url, **self.auth)['X-Cache'], 'HIT')
+        self.client.post(self.url, {'title': 'Task mới'}, content_type='application/json', **self.auth)
+        response = self.client.get(self.url, **self.auth)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['count'], 6)
+
+    def test_profile_update_invalidates(self):
+        self.client.get(self.url, **self.auth)
+        self.client.patch(
+            reverse('tasks_api:user_profile'), {'first_name': 'New'}, content_type='application/json', **self.auth,
+        )
+        response = self.client.get(self.url, **self.auth)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['owner']['first_name'], 'New')
+
+    def test_not_modified_until_write(self):
+        etag = self.client.get(self.url, **self.auth)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag, **self.auth).status_code, 304)
+
+        self.client.post(self.url, {'title': 'Task mới'}, content_type='application/json', **self.auth)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        self.client.patch(
+            reverse('tasks_api:user_profile'), {'first_name': 'New'}, content_type='application/json', **self.auth,
+        )
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag, **self.auth).status_code, 200)
+
+
+class TaskStatsCounterTests(TestCase):
+    """Bộ đếm TaskStats tính từ dòng trong DB, không từ instance đã nạp có thể đã cũ."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('stats', 'stats@example.com', 'testpassword123')
+        cls.task = Task.objects.create(owner=cls.user, title='Task')
+        Task.objects.create(owner=cls.user, title='Task khác')
+
+    def assertStats(self, total, done):
+        stats = TaskStats.objects.get(pk=self.user.pk)
+        self.assertEqual((stats.total, stats.done), (total, done))
+
+    def test_double_toggle_from_stale_instances(self):
+        first, second = Task.objects.get(pk=self.task.pk), Task.objects.get(pk=self.task.pk)
+        for task in (first, second):
+            task.is_done = not task.is_done
+            task.save(update_fields=['is_done', 'updated_at'])
+        self.assertStats(total=2, done=1)
+
+    def test_double_delete(self):
+        first, second = Task.objects.get(pk=self.task.pk), Task.objects.get(pk=self.task.pk)
+        first.delete()
+        self.assertEqual(second.delete(), (0, {}))
+        self.assertStats(total=1, done=0)
+
+    def test_delete_after_concurrent_toggle(self):
+        task = Task.objects.get(pk=self.task.pk)
+        other = Task.objects.get(pk=self.task.pk)
+        other.is_done = True
+        other.save()
+        task.delete()
+        self.assertStats(total=1, done=0)
+
+
+class TokenRevocationTests(TestCase):
+    """Token bị thu hồi bị từ chối ngay ở mọi worker; token cũ chỉ refresh được một lần."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('revoke', 'revoke@example.com', 'testpassword123')
+
+    def setUp(self):
+        self.url = reverse('tasks_api:token_refresh')
+
+    def refresh(self, token):
+        return self.client.post(self.url, {'refresh': str(token)}, content_type='application/json')
+
+    def test_blacklisted_by_another_worker(self):
+        token = RefreshToken.for_user(self.user)
+        RefreshToken(str(token)).blacklist()
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_revocation_check_is_one_query(self):
+        token = SingleUseRefreshToken(str(RefreshToken.for_user(self.user)))
+        with self.assertNumQueries(1):
+            token.check_blacklist()
+
+    def test_rotated_token_cannot_be_replayed(self):
+        token = RefreshToken.for_user(self.user)
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('refresh', response.json())
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_concurrent_replay_gets_one_new_token(self):
+        raw = str(RefreshToken.for_user(self.user))
+        first, second = SingleUseRefreshToken(raw), SingleUseRefreshToken(raw)  # cả hai đã qua check_blacklist
+        first.blacklist()
+        with self.assertRaises(TokenError):
+            second.blacklist()
+
+
+class AsyncTaskAPITests(PerfTestMixin, TestCase):
+    """API async (/api/async/...) trả về cùng JSON với bản sync, số truy vấn cũng được chốt."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('async', 'async@example.com', 'testpassword123')
+        seed_tasks(cls.user)
+        TaskStats.objects.rebuild()
+        cls.task = Task.objects.filter(owner=cls.user).order_by('pk').first()
+
+    def setUp(self):
+        clear_caches()
+        self.headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    def get(self, name, *args, query=''):
+        return async_to_sync(self.async_client.get)(reverse(name, args=args) + query, headers=self.headers)
+
+    def assertSameAsSync(self, name, *args, query=''):
+        expected = self.client.get(reverse(name.removesuffix('_async'), args=args) + query, headers=self.headers)
+        clear_caches()
+        response = self.get(name, *args, query=query)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(
+            json.dumps(response.json(), sort_keys=True).replace('/api/async/', '/api/'),
+            json.dumps(expected.json(), sort_keys=True),
+        )
+
+    def test_same_json_as_sync(self):
+        self.assertSameAsSync('tasks_api:task_list_create_async')
+        self.assertSameAsSync('tasks_api:task_list_create_async', query='?page=2&status=pending')
+        self.assertSameAsSync('tasks_api:task_list_create_async', query='?pagination=cursor&compact=1')
+        self.assertSameAsSync('tasks_api:task_detail_async', self.task.pk)
+        self.assertSameAsSync('tasks_api:task_detail_async', 999999)
+        self.assertSameAsSync('tasks_api:task_stats_async')
+
+    def test_api_task_list(self):
+        response = self.assertRequestQueries(
+            lambda: self.get('tasks_api:task_list_create_async'), queries=4,
+        )
+        self.assertEqual(len(response.json()['results']), 20)
+
+    def test_api_task_detail(self):
+        self.assertRequestQueries(
+            lambda: self.get('tasks_api:task_detail_async', self.task.pk), queries=3,
+        )
+
+    def test_api_task_toggle(self):
+        url = reverse('tasks_api:task_toggle_async', args=[self.task.pk])
+        response = async_to_sync(self.async_client.patch)(url, headers=self.headers)
+        self.assertEqual(response.json()['task']['is_done'], not self.task.is_done)
+        self.assertEqual(Task.objects.get(pk=self.task.pk).is_done, not self.task.is_done)
+
+    def test_requires_authentication(self):
+        response = async_to_sync(self.async_client.get)(reverse('tasks_api:task_list_create_async'))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+
+
+@override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    MESSAGE_STORAGE='django.contrib.messages.storage.cookie.CookieStorage',
+)
+class LowWriteSessionTests(TestCase):
+    """SESSION_LOW_WRITE: thao tác web và trang danh sách sau redirect không truy vấn django_session."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('session', 'session@example.com', 'testpassword123')
+        cls.task = Task.objects.create(owner=cls.user, title='Task')
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_login(self.user)
+
+    def assertNoSessionQueries(self, request, message):
+        with CaptureQueriesContext(connection) as captured:
+            response = request()
+            self.assertEqual(response.status_code, 302)
+            page = self.client.get(response.url)
+        self.assertContains(page, message)
+        self.assertEqual([q['sql'] for q in captured.captured_queries if 'django_session' in q['sql']], [])
+
+    def test_mutations(self):
+        self.assertNoSessionQueries(lambda: self.client.post(reverse('tasks:create'), {'title': 'Mới'}), 'Đã tạo công việc.')
+        self.assertNoSessionQueries(
+            lambda: self.client.post(reverse('tasks:update', args=[self.task.pk]), {'title': 'Sửa'}), 'Đã cập nhật.',
+        )
+        self.assertNoSessionQueries(
+            lambda: self.client.get(reverse('tasks:toggle', args=[self.task.pk])), 'Đã cập nhật trạng thái.',
+        )
+        self.assertNoSessionQueries(lambda: self.client.post(reverse('tasks:delete', args=[self.task.pk])), 'Đã xoá.')
+
+
+class TaskBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('batch', 'batch@example.com', 'testpassword123')
+        cls.other = User.objects.create_user('other', 'other@example.com', 'testpassword123')
+        cls.t1, cls.t2, cls.t3 = Task.objects.bulk_create(
+            Task(owner=cls.user, title=f'Task {i}', is_done=i == 2) for i in range(3)
+        )
+        cls.foreign = Task.objects.create(owner=cls.other, title='Của người khác')
+        TaskStats.objects.rebuild()
+
+    def setUp(self):
+        clear_caches()
+        self.url = reverse('tasks_api:task_batch')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    def post(self, operations):
+        return self.client.post(self.url, {'operations': operations}, content_type='application/json', **self.auth)
+
+    def assertStats(self, total, done):
+        stats = TaskStats.objects.get(pk=self.user.pk)
+        self.assertEqual((stats.total, stats.done), (total, done))
+        self.assertEqual(Task.objects.filter(owner=self.user).count(), total)
+        self.assertEqual(Task.objects.filter(owner=self.user, is_done=True).count(), done)
+
+    def test_applies_all_operations(self):
+        response = self.post([
+            {'op': 'create', 'data': {'title': 'Mới', 'is_done': True}},
+            {'op': 'update', 'id': self.t1.pk, 'data': {'title': 'Đã sửa'}},
+            {'op': 'toggle', 'id': self.t2.pk},
+            {'op': 'delete', 'id': self.t3.pk},
+        ])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertTrue(body['applied'])
+        self.assertEqual([r['status'] for r in body['results']], ['ok'] * 4)
+        self.assertEqual(Task.objects.get(pk=self.t1.pk).title, 'Đã sửa')
+        self.assertTrue(Task.objects.get(pk=self.t2.pk).is_done)
+        self.assertFalse(Task.objects.filter(pk=self.t3.pk).exists())
+        self.assertStats(total=3, done=2)
+
+    def test_invalid_operation_applies_nothing(self):
+        response = self.post([
+            {'op': 'toggle', 'id': self.t1.pk},
+            {'op': 'delete', 'id': [1]},
+            {'op': 'update', 'id': self.foreign.pk, 'data': {'title': 'x'}},
+            {'op': 'delete', 'id': True},
+        ])
+        self.assertEqual(response.status_code, 400)
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], ['not_applied', 'error', 'error', 'error'])
+        self.assertIn('id', results[1]['errors'])
+        self.assertFalse(Task.objects.get(pk=self.t1.pk).is_done)
+        self.assertEqual(Task.objects.get(pk=self.foreign.pk).title, 'Của người khác')
+        self.assertStats(total=3, done=1)
+
+    def test_delete_then_update_is_rejected(self):
+        response = self.post([
+            {'op': 'delete', 'id': self.t1.pk},
+            {'op': 'update', 'id': self.t1.pk, 'data': {'title': 'x'}},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Task.objects.filter(pk=self.t1.pk).exists())
+
+    def test_concurrent_change_is_not_overwritten(self):
+        batch = TaskBatch(self.user, [
+            {'op': 'update', 'id': self.t1.pk, 'data': {'title': 'Đã sửa'}},
+            {'op': 'toggle', 'id': self.t2.pk},
+        ])
+        self.assertTrue(batch.is_valid())
+        # Request khác sửa task giữa lúc kiểm tra và lúc áp dụng lô
+        Task.objects.filter(pk=self.t2.pk).update(title='Sửa đồng thời', is_done=True)
+        Task.objects.filter(pk=self.t1.pk).update(note='Ghi chú đồng thời')
+        TaskStats.objects.rebuild([self.user.pk])
+        batch.apply()
+
+        t1, t2 = Task.objects.get(pk=self.t1.pk), Task.objects.get(pk=self.t2.pk)
+        self.assertEqual((t1.title, t1.note), ('Đã sửa', 'Ghi chú đồng thời'))
+        self.assertEqual((t2.title, t2.is_done), ('Sửa đồng thời', False))
+        self.assertStats(total=3, done=1)
+
+    def test_task_deleted_before_apply(self):
+        batch = TaskBatch(self.user, [{'op': 'toggle', 'id': self.t1.pk}, {'op': 'toggle', 'id': self.t2.pk}])
+        self.assertTrue(batch.is_valid())
+        Task.objects.filter(pk=self.t1.pk).delete()
+        batch.apply()
+        self.assertTrue(batch.errors)
+        self.assertEqual([r['status'] for r in batch.results], ['error', 'not_applied'])
+        self.assertFalse(Task.objects.get(pk=self.t2.pk).is_done)
+
+
+@override_settings(METRICS_TOKEN='', METRICS_ALLOWED_IPS=[])
+class MetricsViewTests(TestCase):
+    def test_closed_by_default_even_with_debug(self):
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    @override_settings(METRICS_TOKEN='metrics-secret')
+    def test_bearer_token(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url, headers={'Authorization': 'Bearer sai'}).status_code, 403)
+        self.assertEqual(self.client.get(url, headers={'Authorization': 'Bearer metrics-secret'}).status_code, 200)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_allowed_ips(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.5').status_code, 200)
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.6').status_code, 403)
 
-# Create your tests here.
+    def test_staff(self):
+        user = User.objects.create_user('metrics', 'metrics@example.com', 'testpassword123')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        User.objects.filter(pk=user.pk).update(is_staff=True)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
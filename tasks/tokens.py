@@ -0,0 +1,32 @@
+"""
+Refresh token chỉ dùng được một lần.
+
+Kiểm tra blacklist vẫn là truy vấn của simplejwt
+(``BlacklistedToken.objects.filter(token__jti=jti).exists()``, chạy trên index
+unique của ``OutstandingToken.jti``): hầu hết token được kiểm tra đều còn hiệu
+lực nên một cache trong process không bớt được truy vấn nào.
+
+``SingleUseRefreshToken.blacklist`` báo lỗi nếu token đã bị blacklist trước đó
+(dòng ``BlacklistedToken`` không phải do lần gọi này tạo): hai request cùng
+refresh một token (replay sau khi rotate) thì chỉ một request nhận token mới.
+"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+class SingleUseRefreshToken(RefreshToken):
+    """RefreshToken mà ``blacklist()`` chỉ thành công cho request thu hồi đầu tiên"""
+
+    def blacklist(self):
+        blacklisted, created = super().blacklist()
+        if not created:
+            # Request khác (có thể ở worker khác) đã thu hồi token này sau lần
+            # check_blacklist của request hiện tại
+            raise TokenError(_('Token is blacklisted'))
+        return blacklisted, created
+
+
+class SingleUseTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = SingleUseRefreshToken
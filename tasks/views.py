@@ -1,13 +1,16 @@
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import login
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, RedirectView, FormView
 from .models import Task
+from . import cache as task_cache
+from .conditional import conditional_task_get
 from .forms import TaskForm
+from .search import search_tasks
 
 class SignUpView(FormView):
     template_name = "registration/signup.html"
@@ -32,19 +35,48 @@ class TaskListView(OwnerQuerysetMixin, ListView):
     template_name = "tasks/task_list.html"
     context_object_name = "tasks"
     paginate_by = 10
+
+    def get(self, request, *args, **kwargs):
+        # Còn flash message chưa hiển thị thì phải render lại trang
+        if len(messages.get_messages(request)):
+            return super().get(request, *args, **kwargs)
+        # Trang có CSRF token nên ETag phải đổi theo cookie CSRF
+        csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")
+        return conditional_task_get(request, lambda: super(TaskListView, self).get(request, *args, **kwargs), csrf_cookie)
+
     # Tìm kiếm & lọc (tuỳ chọn—đã kèm luôn):
     def get_queryset(self):
         qs = super().get_queryset()
-        q = self.request.GET.get("q", "").strip()
+        q = (self.request.GET.get("q") or self.request.GET.get("search") or "").strip()
         status = self.request.GET.get("status", "").strip()  # "", "open", "done"
-        if q:
-            qs = qs.filter(Q(title__icontains=q) | Q(note__icontains=q))
         if status == "open":
             qs = qs.filter(is_done=False)
         elif status == "done":
             qs = qs.filter(is_done=True)
+        if q:
+            qs = search_tasks(qs, q)  # full-text, xếp theo độ liên quan
         return qs
 
+    # Cache từng trang (danh sách task + tổng số) theo user/bộ lọc/trang, xem tasks/cache.py
+    def paginate_queryset(self, queryset, page_size):
+        params = self.request.GET
+        cache_parts = ("web-list", params.get("q", ""), params.get("search", ""),
+                       params.get("status", ""), params.get(self.page_kwarg, ""))
+        self.cached_page = task_cache.get_cached(self.request.user.pk, cache_parts)
+        paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+        if self.cached_page is None:
+            page.object_list = list(page.object_list)
+            task_cache.set_cached(self.request.user.pk, cache_parts, (page.object_list, paginator.count))
+        else:
+            page.object_list = self.cached_page[0]
+        return paginator, page, page.object_list, is_paginated
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        paginator = super().get_paginator(queryset, per_page, **kwargs)
+        if getattr(self, "cached_page", None) is not None:
+            paginator.count = self.cached_page[1]  # bỏ qua COUNT(*)
+        return paginator
+
 class TaskCreateView(OwnerQuerysetMixin, CreateView):
     model = Task
     form_class = TaskForm
@@ -68,9 +100,10 @@ class TaskDeleteView(OwnerQuerysetMixin, OwnerOnlyMixin, DeleteView):
     model = Task
     template_name = "tasks/task_confirm_delete.html"
     success_url = reverse_lazy("tasks:list")
-    def delete(self, request, *args, **kwargs):
+    # Từ Django 4.0 DeleteView xoá qua form_valid(), delete() không còn được gọi khi POST
+    def form_valid(self, form):
         messages.success(self.request, "Đã xoá.")
-        return super().delete(request, *args, **kwargs)
+        return super().form_valid(form)
 
 class TaskToggleDoneView(OwnerQuerysetMixin, OwnerOnlyMixin, RedirectView):
     pattern_name = "tasks:list"
@@ -81,7 +114,7 @@ class TaskToggleDoneView(OwnerQuerysetMixin, OwnerOnlyMixin, RedirectView):
     def get_redirect_url(self, *args, **kwargs):
         task = self.get_object()
         task.is_done = not task.is_done
-        task.save(update_fields=["is_done"])
+        task.save(update_fields=["is_done", "updated_at"])
         messages.success(self.request, "Đã cập nhật trạng thái.")
         kwargs.pop("pk", None)            # <— loại bỏ 'pk'
         return super().get_redirect_url(*args, **kwargs)
@@ -0,0 +1,36 @@
+from django.db.migrations.operations import AddIndex
+
+
+class AddIndexConcurrently(AddIndex):
+    """
+    Tạo index bằng CREATE INDEX CONCURRENTLY trên PostgreSQL (không khoá ghi
+    bảng trong lúc build), và tạo index bình thường trên các backend khác.
+
+    Khác với bản trong django.contrib.postgres, operation này không cần psycopg
+    khi chạy trên SQLite. Migration dùng nó phải khai báo ``atomic = False``.
+    """
+
+    atomic = False
+
+    def describe(self):
+        return "Concurrently create index %s on field(s) %s of model %s" % (
+            self.index.name,
+            ", ".join(self.index.fields),
+            self.model_name,
+        )
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, **_concurrently(schema_editor))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, **_concurrently(schema_editor))
+
+
+def _concurrently(schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        return {"concurrently": True}
+    return {}
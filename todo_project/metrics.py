@@ -0,0 +1,278 @@
+"""
+Đo thời gian theo từng request và endpoint ``/metrics`` (định dạng text của Prometheus).
+
+``RequestMetricsMiddleware`` (đặt đầu ``MIDDLEWARE``) đo cho mỗi request:
+
+- ``total``: toàn bộ thời gian xử lý (tới khi có response, không tính phần
+  body của StreamingHttpResponse);
+- ``db``: số truy vấn và tổng thời gian chạy SQL (execute wrapper trên mọi
+  connection, kể cả connection trong thread của ``sync_to_async``);
+- ``serialize``: render response DRF (JSONRenderer, ...);
+- ``template``: render TemplateResponse (các view class-based);
+- ``gemini``: thời gian chờ Gemini, do chatbot/gemini.py ghi qua ``timed()``.
+
+Kết quả được gửi trong header ``Server-Timing`` (``REQUEST_METRICS_SERVER_TIMING``)
+và cộng vào histogram trong process theo view. ``REQUEST_METRICS_ENABLED = False``
+thì middleware tự gỡ khỏi chuỗi middleware (``MiddlewareNotUsed``) và
+``timed()`` chỉ còn là một lần đọc ContextVar.
+
+Histogram nằm trong bộ nhớ của từng process: chạy nhiều worker thì Prometheus
+scrape từng worker (hoặc cộng lại theo label instance).
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PHASES = ('db', 'serialize', 'template', 'gemini')
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Thời gian (giây) theo phase và số truy vấn của một request."""
+
+    __slots__ = ('durations', 'queries')
+
+    def __init__(self):
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+
+    def add(self, phase, seconds):
+        self.durations[phase] = self.durations.get(phase, 0.0) + seconds
+
+    def server_timing(self, total):
+        parts = [f'total;dur={total * 1000:.1f}']
+        for phase, seconds in self.durations.items():
+            if phase == 'db':
+                parts.append(f'db;dur={seconds * 1000:.1f};desc="{self.queries} queries"')
+            elif seconds:
+                parts.append(f'{phase};dur={seconds * 1000:.1f}')
+        return ', '.join(parts)
+
+
+@contextmanager
+def timed(phase):
+    """Cộng thời gian chạy khối lệnh vào ``phase`` của request hiện tại (nếu đang đo)."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - start)
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.durations['db'] += time.perf_counter() - start
+        timings.queries += 1
+
+
+def _install_db_wrapper(connection, **kwargs):
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """Histogram theo (view, phase) và bộ đếm request/truy vấn, dùng chung mọi thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.requests = {}
+        self.queries = {}
+
+    def record(self, view, method, status, total, timings):
+        with self._lock:
+            key = (view, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.queries[view] = self.queries.get(view, 0) + timings.queries
+            self._observe(view, 'total', total)
+            for phase, seconds in timings.durations.items():
+                if seconds or phase == 'db':
+                    self._observe(view, phase, seconds)
+
+    def _observe(self, view, phase, seconds):
+        histogram = self.histograms.get((view, phase))
+        if histogram is None:
+            histogram = self.histograms[(view, phase)] = Histogram()
+        histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.requests.clear()
+            self.queries.clear()
+
+    def render(self):
+        with self._lock:
+            lines = [
+                '# HELP todo_request_phase_seconds Thời gian xử lý request theo view và phase',
+                '# TYPE todo_request_phase_seconds histogram',
+            ]
+            for (view, phase), histogram in sorted(self.histograms.items()):
+                labels = f'view="{_escape(view)}",phase="{phase}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'todo_request_phase_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                cumulative += histogram.counts[-1]
+                lines.append(f'todo_request_phase_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+                lines.append(f'todo_request_phase_seconds_sum{{{labels}}} {histogram.sum:.6f}')
+                lines.append(f'todo_request_phase_seconds_count{{{labels}}} {cumulative}')
+
+            lines += ['# HELP todo_requests_total Số request theo view, method, status', '# TYPE todo_requests_total counter']
+            for (view, method, status), count in sorted(self.requests.items()):
+                lines.append(f'todo_requests_total{{view="{_escape(view)}",method="{method}",status="{status}"}} {count}')
+
+            lines += ['# HELP todo_db_queries_total Số truy vấn SQL theo view', '# TYPE todo_db_queries_total counter']
+            for view, count in sorted(self.queries.items()):
+                lines.append(f'todo_db_queries_total{{view="{_escape(view)}"}} {count}')
+        return lines
+
+
+registry = Registry()
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', True)
+        connection_created.connect(_install_db_wrapper, dispatch_uid='request_metrics_db_wrapper')
+        for connection in connections.all(initialized_only=True):
+            _install_db_wrapper(connection)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, time.perf_counter() - start)
+
+    def process_template_response(self, request, response):
+        # Render ngay tại đây để tách thời gian render khỏi thời gian của view;
+        # Django thấy response đã render thì không render lại
+        phase = 'serialize' if hasattr(response, 'accepted_renderer') else 'template'
+        with timed(phase):
+            response.render()
+        return response
+
+    def _finish(self, request, response, timings, total):
+        registry.record(_view_name(request), request.method, response.status_code, total, timings)
+        if self.server_timing:
+            response['Server-Timing'] = timings.server_timing(total)
+        return response
+
+
+def _gauge(lines, name, help_text, value, kind='gauge'):
+    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}']
+
+
+def collect():
+    """Toàn bộ metric dạng text: histogram request và các bộ đếm sẵn có của app."""
+    from chatbot import cache as reply_cache
+    from chatbot.breaker import breaker
+    from chatbot.limits import chat_limiter
+    from tasks import cache as task_cache
+
+    lines = registry.render()
+
+    responses = task_cache.stats.snapshot()
+    _gauge(lines, 'todo_task_cache_hits_total', 'Cache response task: hit', responses['hits'], 'counter')
+    _gauge(lines, 'todo_task_cache_misses_total', 'Cache response task: miss', responses['misses'], 'counter')
+
+    replies = reply_cache.stats.snapshot()
+    _gauge(lines, 'todo_chat_cache_hits_total', 'Cache câu trả lời chatbot: hit', replies['hits'], 'counter')
+    _gauge(lines, 'todo_chat_cache_misses_total', 'Cache câu trả lời chatbot: miss', replies['misses'], 'counter')
+    _gauge(lines, 'todo_chat_cache_saved_seconds_total', 'Thời gian upstream tiết kiệm nhờ cache',
+           f"{replies['saved_seconds']:.6f}", 'counter')
+
+    circuit = breaker.snapshot()
+    lines += ['# HELP todo_gemini_breaker_state Trạng thái circuit breaker Gemini (1 = đang ở trạng thái đó)',
+              '# TYPE todo_gemini_breaker_state gauge']
+    for state in ('closed', 'open', 'half_open'):
+        lines.append(f'todo_gemini_breaker_state{{state="{state}"}} {int(circuit["state"] == state)}')
+    _gauge(lines, 'todo_gemini_breaker_failures', 'Số lỗi liên tiếp hiện tại', circuit['failures'])
+
+    limiter = chat_limiter.snapshot()
+    _gauge(lines, 'todo_chat_active', 'Số lời gọi chatbot đang chạy', limiter['active'])
+    _gauge(lines, 'todo_chat_queued', 'Số lời gọi chatbot đang chờ slot', limiter['queued'])
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    ``GET /metrics``: cho phép khi có header ``Authorization: Bearer <METRICS_TOKEN>``,
+    khi request tới từ một địa chỉ trong ``METRICS_ALLOWED_IPS`` (``REMOTE_ADDR``),
+    hoặc khi user là staff. Không phụ thuộc DEBUG.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', [])
+    if not (
+        (token and request.headers.get('Authorization') == f'Bearer {token}')
+        or request.META.get('REMOTE_ADDR') in allowed_ips
+        or request.user.is_staff
+    ):
+        raise PermissionDenied
+    return HttpResponse(collect(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -13,7 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
     # Third party apps
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'allauth',
     'allauth.account',
     'allauth.socialaccount',
@@ -56,6 +57,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Đặt đầu tiên để đo cả thời gian của các middleware khác, xem todo_project/metrics.py
+    'todo_project.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -68,6 +71,14 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'todo_project.urls'
 
+# Đo thời gian theo request (DB, serialize, template, Gemini): header Server-Timing và
+# histogram ở /metrics. /metrics chỉ mở cho token Bearer METRICS_TOKEN, các IP trong
+# METRICS_ALLOWED_IPS (vd. "127.0.0.1,10.0.0.5" cho Prometheus) hoặc staff
+REQUEST_METRICS_ENABLED = config('REQUEST_METRICS_ENABLED', default=True, cast=bool)
+REQUEST_METRICS_SERVER_TIMING = config('REQUEST_METRICS_SERVER_TIMING', default=True, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='', cast=Csv())
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -89,16 +100,107 @@ WSGI_APPLICATION = 'todo_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'django_todo',
-        'USER': 'postgres',
-        'PASSWORD': '123',
-        'HOST': 'localhost',
-        'PORT': '5432',
+# DB_ENGINE chọn profile: 'postgresql' (mặc định) hoặc 'sqlite' (chạy local, edge).
+# So sánh chi phí kết nối mỗi request giữa các profile:
+#   python manage.py bench_db_connections
+
+DB_ENGINE = config('DB_ENGINE', default='postgresql')
+
+if DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            # Giữ kết nối để không chạy lại các PRAGMA bên dưới ở mỗi request
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'OPTIONS': {},
+        }
+    }
+    # Chạy mỗi lần mở kết nối: WAL cho đọc song song với ghi, synchronous=NORMAL
+    # (WAL vẫn an toàn khi crash, chỉ có thể mất giao dịch cuối nếu mất điện),
+    # đọc file qua mmap, chờ khoá tối đa DB_SQLITE_BUSY_TIMEOUT ms thay vì lỗi
+    # "database is locked". IMMEDIATE lấy khoá ghi ngay khi BEGIN để busy_timeout
+    # có hiệu lực cả với transaction đọc rồi mới ghi.
+    if config('DB_SQLITE_TUNED', default=True, cast=bool):
+        DATABASES['default']['OPTIONS'] = {
+            'init_command': ';'.join([
+                'PRAGMA journal_mode=WAL',
+                'PRAGMA synchronous=NORMAL',
+                f"PRAGMA mmap_size={config('DB_SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int)}",
+                f"PRAGMA busy_timeout={config('DB_SQLITE_BUSY_TIMEOUT', default=5000, cast=int)}",
+                'PRAGMA temp_store=MEMORY',
+            ]),
+            'transaction_mode': 'IMMEDIATE',
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='django_todo'),
+            'USER': config('DB_USER', default='postgres'),
+            'PASSWORD': config('DB_PASSWORD', default='123'),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            # Giữ kết nối giữa các request (giây, 0 = mở/đóng mỗi request);
+            # health check chạy SELECT 1 ở đầu request để bỏ kết nối đã chết
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+            'OPTIONS': {},
+        }
     }
+    # Pool của psycopg 3 (cần psycopg[pool]): nên dùng khi chạy ASGI, vì mỗi
+    # request async có thread riêng nên CONN_MAX_AGE gần như không tái dùng được
+    # kết nối. Django yêu cầu CONN_MAX_AGE = 0 khi bật pool.
+    if config('DB_POOL', default=False, cast=bool):
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+        }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# LocMemCache chỉ dùng được khi chạy một process; nhiều worker thì cần backend
+# dùng chung (Redis, Memcached, ...) để việc huỷ cache có hiệu lực ở mọi worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='todo-default'),
+    },
+    # Cache câu trả lời chatbot, xem chatbot/cache.py
+    'chatbot': {
+        'BACKEND': config('CHATBOT_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CHATBOT_CACHE_LOCATION', default='todo-chatbot'),
+    },
 }
+# LocMemCache evict theo LRU khi vượt MAX_ENTRIES; Redis/Memcached tự giới hạn theo bộ nhớ
+if CACHES['chatbot']['BACKEND'].endswith('LocMemCache'):
+    CACHES['chatbot']['OPTIONS'] = {'MAX_ENTRIES': config('CHATBOT_CACHE_MAX_ENTRIES', default=1000, cast=int)}
+
+# Cache response đọc task theo user (giây, 0 = tắt), xem tasks/cache.py
+TASK_RESPONSE_CACHE_TIMEOUT = config('TASK_RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Session và flash message
+# Mặc định: session trong bảng django_session (một SELECT mỗi request đã đăng
+# nhập), message trong cookie, tràn cookie thì ghi vào session (FallbackStorage).
+# SESSION_LOW_WRITE = True: session đọc từ cache, chỉ ghi database khi session
+# đổi (đăng nhập, đăng xuất); message chỉ dùng cookie nên không bao giờ ghi
+# session. Session vẫn lưu cả database nên mất cache không làm user bị đăng xuất.
+# Cần CACHE_BACKEND dùng chung khi chạy nhiều worker: với LocMemCache, đăng xuất
+# ở một worker không xoá session đã cache ở worker khác.
+# So sánh: python manage.py bench_web_session
+SESSION_LOW_WRITE = config('SESSION_LOW_WRITE', default=False, cast=bool)
+if SESSION_LOW_WRITE:
+    SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+    MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+else:
+    SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.db')
+    MESSAGE_STORAGE = 'django.contrib.messages.storage.fallback.FallbackStorage'
+# Chỉ lưu session khi bị thay đổi (mặc định của Django, ghi rõ để không bị bật nhầm)
+SESSION_SAVE_EVERY_REQUEST = False
 
 
 # Password validation
@@ -136,6 +238,15 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Tìm kiếm task: 'auto' (PostgreSQL tsvector / SQLite FTS5 tuỳ database) hoặc 'icontains'
+TASK_SEARCH_BACKEND = config('TASK_SEARCH_BACKEND', default='auto')
+
+# Thống kê task: 'counter' (bảng TaskStats) hoặc 'aggregate' (một truy vấn aggregate)
+TASK_STATS_BACKEND = config('TASK_STATS_BACKEND', default='counter')
+
+# Số thao tác tối đa mỗi request /api/tasks/batch/
+TASK_BATCH_MAX_OPERATIONS = config('TASK_BATCH_MAX_OPERATIONS', default=1000, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -160,6 +271,12 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20
 }
 
+# Thời gian (giây) cache user đã xác thực bằng JWT cho các endpoint đọc task,
+# xem tasks/authentication.py. 0 = luôn truy vấn user từ database.
+JWT_USER_CACHE_TIMEOUT = config('JWT_USER_CACHE_TIMEOUT', default=60, cast=int)
+
+# Dọn token hết hạn khỏi bảng outstanding/blacklist: python manage.py prune_tokens
+
 # Simple JWT
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -235,3 +352,44 @@ SOCIALACCOUNT_PROVIDERS['google']['APP'] = {
 
 # Gemini API Settings
 GEMINI_API_KEY = config('GEMINI_API_KEY', default='')
+GEMINI_API_URL = config('GEMINI_API_URL', default='https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash')
+# Deadline (giây) cho mỗi lần gọi Gemini và số kết nối tối đa của client async, xem chatbot/gemini.py
+GEMINI_TIMEOUT = config('GEMINI_TIMEOUT', default=30, cast=float)
+GEMINI_MAX_CONNECTIONS = config('GEMINI_MAX_CONNECTIONS', default=100, cast=int)
+# Thử lại lỗi tạm thời (backoff có jitter, giây) và hedged request cho bản async (giây, 0 = tắt)
+GEMINI_RETRIES = config('GEMINI_RETRIES', default=2, cast=int)
+GEMINI_RETRY_BACKOFF = config('GEMINI_RETRY_BACKOFF', default=0.3, cast=float)
+GEMINI_HEDGE_DELAY = config('GEMINI_HEDGE_DELAY', default=0, cast=float)
+# Circuit breaker: số lỗi liên tiếp để mở, thời gian mở (giây), số probe khi half-open, xem chatbot/breaker.py
+GEMINI_BREAKER_FAILURES = config('GEMINI_BREAKER_FAILURES', default=5, cast=int)
+GEMINI_BREAKER_RESET_TIMEOUT = config('GEMINI_BREAKER_RESET_TIMEOUT', default=30, cast=float)
+GEMINI_BREAKER_HALF_OPEN_PROBES = config('GEMINI_BREAKER_HALF_OPEN_PROBES', default=1, cast=int)
+# TTL (giây) cache câu trả lời chatbot, 0 = tắt
+CHATBOT_CACHE_TIMEOUT = config('CHATBOT_CACHE_TIMEOUT', default=3600, cast=int)
+# Ngữ cảnh chatbot: token cho các lượt nguyên văn (tối đa N lượt) và cho bản tóm tắt, xem chatbot/context.py
+CHATBOT_CONTEXT_TOKEN_BUDGET = config('CHATBOT_CONTEXT_TOKEN_BUDGET', default=1500, cast=int)
+CHATBOT_CONTEXT_MAX_MESSAGES = config('CHATBOT_CONTEXT_MAX_MESSAGES', default=10, cast=int)
+CHATBOT_SUMMARY_TOKEN_BUDGET = config('CHATBOT_SUMMARY_TOKEN_BUDGET', default=400, cast=int)
+# Giới hạn lời gọi chatbot đồng thời trong mỗi process (theo user / toàn bộ), số request
+# được chờ và thời gian chờ tối đa (giây) trước khi trả 429, xem chatbot/limits.py
+CHATBOT_MAX_CONCURRENT_PER_USER = config('CHATBOT_MAX_CONCURRENT_PER_USER', default=2, cast=int)
+CHATBOT_MAX_CONCURRENT = config('CHATBOT_MAX_CONCURRENT', default=20, cast=int)
+CHATBOT_MAX_QUEUED = config('CHATBOT_MAX_QUEUED', default=50, cast=int)
+CHATBOT_QUEUE_TIMEOUT = config('CHATBOT_QUEUE_TIMEOUT', default=10, cast=float)
+# Số tin nhắn mặc định mỗi trang /chatbot/history/ (?limit= tối đa 100)
+CHATBOT_HISTORY_PAGE_SIZE = config('CHATBOT_HISTORY_PAGE_SIZE', default=5, cast=int)
+# Số ngày giữ tin nhắn chat trong ChatMessage; cũ hơn và đã gộp vào ChatSummary thì
+# python manage.py archive_chat_messages chuyển sang ChatMessageArchive
+CHATBOT_RETENTION_DAYS = config('CHATBOT_RETENTION_DAYS', default=90, cast=int)
+# True khi chạy qua ASGI (todo_project/asgi.py): /chatbot/message/ dùng view async
+CHATBOT_ASYNC = config('CHATBOT_ASYNC', default=False, cast=bool)
+# True khi chạy qua ASGI: /api/tasks/... dùng view async (tasks/async_api_views.py)
+TASKS_API_ASYNC = config('TASKS_API_ASYNC', default=False, cast=bool)
+
+# Test hiệu năng (python manage.py test), xem tasks/testing.py: số truy vấn luôn được
+# kiểm tra; thời gian chỉ khi PERF_TIMING=record (ghi baseline) hoặc check (so với baseline)
+PERF_TIMING = config('PERF_TIMING', default='off')
+PERF_BASELINE_FILE = config('PERF_BASELINE_FILE', default=str(BASE_DIR / 'perf_baselines.json'))
+PERF_REPEAT = config('PERF_REPEAT', default=7, cast=int)
+PERF_TOLERANCE = config('PERF_TOLERANCE', default=0.5, cast=float)
+PERF_SLACK_MS = config('PERF_SLACK_MS', default=2, cast=float)
@@ -1,11 +1,14 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("accounts/", include("allauth.urls")),  # allauth URLs (bao gồm Google OAuth)
     path("auth/", include("django.contrib.auth.urls")),  # Django auth URLs
     path("api/", include("tasks.api_urls")),  # API endpoints
     path("chatbot/", include("chatbot.urls")),  # Chatbot endpoints
+    path("metrics", metrics_view, name="metrics"),  # Prometheus, xem todo_project/metrics.py
     path("", include("tasks.urls")),  # Web routes của tasks
 ]